@@ -0,0 +1,343 @@
+# analysis/alerts.py - Price and volume alert engine for watchlists
+import os
+import time
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+from config import PROCESSED_DATA_DIR
+
+ALERTS_DB = os.path.join(PROCESSED_DATA_DIR, "alerts.db")
+
+PRICE_ABOVE = "Price Above"
+PRICE_BELOW = "Price Below"
+VOLUME_SPIKE = "Volume > 2x avg"
+ALERT_TYPES = [PRICE_ABOVE, PRICE_BELOW, VOLUME_SPIKE]
+
+VOLUME_MULTIPLIER = 2.0
+VOLUME_LOOKBACK_DAYS = 20
+DEFAULT_COOLDOWN = 15 * 60  # Seconds before a repeating alert may fire again
+MAX_EVENTS_PER_USER = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    alert_type TEXT NOT NULL,
+    threshold REAL NOT NULL,
+    repeat INTEGER NOT NULL DEFAULT 0,
+    cooldown REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'active',
+    created_at REAL NOT NULL,
+    last_triggered_at REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS alerts_active_unique
+    ON alerts (user_id, symbol, alert_type, threshold) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS alerts_status ON alerts (status);
+"""
+
+
+class ThresholdBook:
+    """Thresholds of one symbol and direction kept sorted for range lookups.
+
+    A move from ``old`` to ``new`` crosses exactly the thresholds between the
+    two values, which two binary searches locate in O(log n); only those k
+    alerts are visited. Adding or removing an alert shifts the lists in O(n),
+    which is small next to the database write that goes with it.
+    """
+
+    def __init__(self):
+        self.thresholds = []
+        self.alert_ids = []
+
+    def __len__(self):
+        return len(self.thresholds)
+
+    def add(self, threshold, alert_id):
+        i = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(i, threshold)
+        self.alert_ids.insert(i, alert_id)
+
+    def remove(self, threshold, alert_id):
+        i = bisect_left(self.thresholds, threshold)
+        while i < len(self.thresholds) and self.thresholds[i] == threshold:
+            if self.alert_ids[i] == alert_id:
+                del self.thresholds[i]
+                del self.alert_ids[i]
+                return True
+            i += 1
+        return False
+
+    def crossed_up(self, old, new):
+        """Alerts with old < threshold <= new"""
+        return self.alert_ids[bisect_right(self.thresholds, old):bisect_right(self.thresholds, new)]
+
+    def crossed_down(self, old, new):
+        """Alerts with new <= threshold < old"""
+        return self.alert_ids[bisect_left(self.thresholds, new):bisect_left(self.thresholds, old)]
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        book = cls()
+        pairs = sorted(pairs)
+        book.thresholds = [threshold for threshold, _ in pairs]
+        book.alert_ids = [alert_id for _, alert_id in pairs]
+        return book
+
+
+class VolumeTracker:
+    """Rolling average of completed daily volumes, maintained with a running sum"""
+
+    def __init__(self, lookback=VOLUME_LOOKBACK_DAYS):
+        self.lookback = lookback
+        self.history = deque()
+        self.total = 0.0
+        self.day = None
+        self.today_volume = 0.0
+
+    def seed(self, daily_volumes):
+        for volume in list(daily_volumes)[-self.lookback:]:
+            self._push(volume)
+
+    def _push(self, volume):
+        self.history.append(volume)
+        self.total += volume
+        if len(self.history) > self.lookback:
+            self.total -= self.history.popleft()
+
+    @property
+    def average(self):
+        return self.total / len(self.history) if self.history else 0.0
+
+    def ratio(self):
+        average = self.average
+        return self.today_volume / average if average > 0 else 0.0
+
+    def update(self, day, cumulative_volume):
+        """Record today's cumulative volume, rolling the previous day into the average"""
+        if self.day is not None and day != self.day:
+            self._push(self.today_volume)
+            self.today_volume = 0.0
+        self.day = day
+        self.today_volume = cumulative_volume
+
+
+class AlertEngine:
+    """Stores watchlist alerts and evaluates them against incoming ticks.
+
+    Active alerts are loaded once into per-symbol ThresholdBooks, so a tick only
+    touches the alerts it crosses instead of scanning every alert. Identical
+    active alerts are deduplicated by the database, and repeating alerts are
+    silenced for their cooldown after firing. With a price store, a symbol's
+    first tick is compared with its stored last close and volume average.
+    """
+
+    def __init__(self, db_path=ALERTS_DB, store=None):
+        self.db_path = db_path
+        self.store = store
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+        self.alerts = {}
+        self.user_index = defaultdict(set)
+        self.books = defaultdict(dict)
+        self.last_price = {}
+        self.last_ratio = {}
+        self.volume = defaultdict(VolumeTracker)
+        self._seeded = set()
+        self.events = defaultdict(lambda: deque(maxlen=MAX_EVENTS_PER_USER))
+        self._load()
+
+    def _load(self):
+        rows = self._conn.execute(
+            "SELECT id, user_id, symbol, alert_type, threshold, repeat, cooldown, last_triggered_at "
+            "FROM alerts WHERE status = 'active'"
+        ).fetchall()
+
+        pairs = defaultdict(list)
+        for alert_id, user_id, symbol, alert_type, threshold, repeat, cooldown, last_triggered_at in rows:
+            self.alerts[alert_id] = {
+                "id": alert_id, "user_id": user_id, "symbol": symbol, "alert_type": alert_type,
+                "threshold": threshold, "repeat": bool(repeat), "cooldown": cooldown,
+                "last_triggered_at": last_triggered_at
+            }
+            self.user_index[user_id].add(alert_id)
+            pairs[(symbol, alert_type)].append((threshold, alert_id))
+
+        for (symbol, alert_type), symbol_pairs in pairs.items():
+            self.books[symbol][alert_type] = ThresholdBook.from_pairs(symbol_pairs)
+
+    def add_alert(self, user_id, symbol, alert_type, threshold=None, repeat=False, cooldown=DEFAULT_COOLDOWN):
+        """Create an alert and return its id; an identical active alert is reused.
+
+        An alert whose condition already holds at the symbol's last known price
+        (or volume ratio) fires at once, since no later move would cross it.
+        """
+        if alert_type not in ALERT_TYPES:
+            raise ValueError(f"Unknown alert type : {alert_type}")
+        if alert_type == VOLUME_SPIKE:
+            threshold = VOLUME_MULTIPLIER
+        elif threshold is None or threshold <= 0:
+            raise ValueError("Price alerts need a positive threshold")
+        symbol = symbol.upper()
+        threshold = float(threshold)
+
+        with self._lock:
+            existing = self._conn.execute(
+                "SELECT id FROM alerts WHERE user_id = ? AND symbol = ? AND alert_type = ? "
+                "AND threshold = ? AND status = 'active'",
+                (user_id, symbol, alert_type, threshold)
+            ).fetchone()
+            if existing:
+                return existing[0]
+
+            with self._conn:
+                cursor = self._conn.execute(
+                    "INSERT INTO alerts (user_id, symbol, alert_type, threshold, repeat, cooldown, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (user_id, symbol, alert_type, threshold, int(repeat), cooldown, time.time())
+                )
+            alert_id = cursor.lastrowid
+            self.alerts[alert_id] = {
+                "id": alert_id, "user_id": user_id, "symbol": symbol, "alert_type": alert_type,
+                "threshold": threshold, "repeat": repeat, "cooldown": cooldown, "last_triggered_at": None
+            }
+            self.user_index[user_id].add(alert_id)
+            self.books[symbol].setdefault(alert_type, ThresholdBook()).add(threshold, alert_id)
+
+            if symbol not in self._seeded:
+                self._seed(symbol)
+            price = self.last_price.get(symbol)
+            if alert_type == VOLUME_SPIKE:
+                holds = self.last_ratio.get(symbol, 0.0) >= threshold
+            else:
+                holds = price is not None and (price >= threshold if alert_type == PRICE_ABOVE else price <= threshold)
+            if holds:
+                self._fire([alert_id], symbol, price, time.time())
+            return alert_id
+
+    def remove_alert(self, alert_id, status="cancelled"):
+        with self._lock:
+            alert = self.alerts.pop(alert_id, None)
+            if alert is None:
+                return False
+            self.user_index[alert["user_id"]].discard(alert_id)
+            self.books[alert["symbol"]][alert["alert_type"]].remove(alert["threshold"], alert_id)
+            with self._conn:
+                self._conn.execute("UPDATE alerts SET status = ? WHERE id = ?", (status, alert_id))
+            return True
+
+    def user_alerts(self, user_id):
+        """Return the active alerts of a user"""
+        with self._lock:
+            return sorted((dict(self.alerts[alert_id]) for alert_id in self.user_index.get(user_id, ())),
+                          key=lambda alert: (alert["symbol"], alert["alert_type"], alert["threshold"]))
+
+    def recent_events(self, user_id):
+        return list(self.events[user_id])
+
+    def seed_volume(self, symbol, daily_volumes):
+        """Initialise the rolling average volume from stored daily history"""
+        with self._lock:
+            self.volume[symbol.upper()].seed(daily_volumes)
+
+    def _seed(self, symbol):
+        """Start a symbol from its stored last close and average daily volume"""
+        self._seeded.add(symbol)
+        if self.store is None or not self.store.has(symbol):
+            return
+        latest = self.store.latest([symbol], lookback=VOLUME_LOOKBACK_DAYS)
+        if latest.empty:
+            return
+        self.last_price.setdefault(symbol, float(latest.loc[symbol, 'Close']))
+        if latest.loc[symbol, 'Avg Volume'] > 0:
+            self.seed_volume(symbol, [float(latest.loc[symbol, 'Avg Volume'])] * VOLUME_LOOKBACK_DAYS)
+
+    def on_tick(self, symbol, price, volume=None, timestamp=None):
+        """Evaluate a tick and return the alerts it triggered.
+
+        Args:
+            symbol (str): Ticker symbol
+            price (float): Last traded price
+            volume (float): Cumulative volume for the trading day, if known
+            timestamp (float): Tick time in seconds since the epoch
+
+        Returns:
+            list: Triggered alert events
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        symbol = symbol.upper()
+
+        with self._lock:
+            if symbol not in self._seeded:
+                self._seed(symbol)
+            books = self.books.get(symbol, {})
+            crossed = []
+
+            old_price = self.last_price.get(symbol)
+            self.last_price[symbol] = price
+            if old_price is not None and price != old_price:
+                if price > old_price and PRICE_ABOVE in books:
+                    crossed += books[PRICE_ABOVE].crossed_up(old_price, price)
+                elif price < old_price and PRICE_BELOW in books:
+                    crossed += books[PRICE_BELOW].crossed_down(old_price, price)
+
+            if volume is not None:
+                tracker = self.volume[symbol]
+                tracker.update(time.strftime("%Y-%m-%d", time.localtime(timestamp)), volume)
+                ratio = tracker.ratio()
+                old_ratio = self.last_ratio.get(symbol, 0.0)
+                self.last_ratio[symbol] = ratio
+                if ratio > old_ratio and VOLUME_SPIKE in books:
+                    crossed += books[VOLUME_SPIKE].crossed_up(old_ratio, ratio)
+
+            return self._fire(crossed, symbol, price, timestamp)
+
+    def _fire(self, alert_ids, symbol, price, timestamp):
+        events = []
+        finished = []
+        for alert_id in alert_ids:
+            alert = self.alerts[alert_id]
+            last = alert["last_triggered_at"]
+            if last is not None and timestamp - last < alert["cooldown"]:
+                continue
+            alert["last_triggered_at"] = timestamp
+            event = {
+                "alert_id": alert_id,
+                "user_id": alert["user_id"],
+                "symbol": symbol,
+                "alert_type": alert["alert_type"],
+                "threshold": alert["threshold"],
+                "price": price,
+                "timestamp": timestamp
+            }
+            events.append(event)
+            self.events[alert["user_id"]].appendleft(event)
+            if not alert["repeat"]:
+                finished.append(alert_id)
+
+        if events:
+            with self._conn:
+                self._conn.executemany("UPDATE alerts SET last_triggered_at = ? WHERE id = ?",
+                                       [(event["timestamp"], event["alert_id"]) for event in events])
+        # One-shot alerts leave the books once they have fired
+        for alert_id in finished:
+            self.remove_alert(alert_id, status="triggered")
+        return events
+
+
+_shared_engine = None
+_shared_engine_lock = threading.Lock()
+
+
+def get_alert_engine():
+    """Return the process-wide alert engine shared by every session"""
+    from data.price_store import get_price_store
+
+    global _shared_engine
+    with _shared_engine_lock:
+        if _shared_engine is None:
+            _shared_engine = AlertEngine(store=get_price_store())
+        return _shared_engine
@@ -0,0 +1,271 @@
+# analysis/backtesting.py - Vectorized portfolio backtests and parallel parameter sweeps
+import os
+import shutil
+import tempfile
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+
+# Pandas period codes accepted for rebalancing and contribution schedules
+FREQUENCIES = {"D": "D", "W": "W", "M": "M", "Q": "Q", "Y": "Y"}
+
+_worker_prices = None
+_worker_dates = None
+
+
+def schedule_mask(dates, freq):
+    """Return a boolean mask that is True on the first trading day of each period"""
+    dates = pd.DatetimeIndex(dates)
+    mask = np.zeros(len(dates), dtype=bool)
+    if len(dates) == 0:
+        return mask
+    mask[0] = True
+    if freq is None:
+        return mask
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Unknown frequency : {freq}")
+    periods = dates.to_period(FREQUENCIES[freq]).asi8
+    mask[1:] = periods[1:] != periods[:-1]
+    return mask
+
+
+def run_backtest(prices, dates, weights, rebalance="M", initial_capital=10000.0,
+                 contribution=0.0, contribution_freq="M", fee_bps=5.0, slippage_bps=5.0, lag=1):
+    """Simulate a portfolio that trades to target weights on a schedule.
+
+    Holdings are constant between trade dates, so each segment's value is one
+    matrix product over the time x asset block; the Python loop only runs once
+    per trade date rather than once per day.
+
+    Args:
+        prices (ndarray): T x N close prices, NaN before an asset is listed
+        dates (array): T trading dates
+        weights (ndarray): T x N target weights, or N static weights
+        rebalance (str): Rebalancing frequency ("D", "W", "M", "Q", "Y") or None for buy and hold
+        initial_capital (float): Starting cash
+        contribution (float): Amount added on each contribution date (dollar-cost averaging)
+        contribution_freq (str): Contribution frequency
+        fee_bps (float): Commission per traded notional, in basis points
+        slippage_bps (float): Execution slippage per traded notional, in basis points
+        lag (int): Days between computing a target and trading it, avoiding look-ahead
+
+    Returns:
+        dict: Portfolio values, time-weighted returns and summary metrics
+    """
+    prices = np.asarray(prices, dtype=float)
+    T, N = prices.shape
+    weights = np.broadcast_to(np.asarray(weights, dtype=float), (T, N)).copy()
+
+    if lag:
+        weights[lag:] = weights[:-lag].copy()
+        weights[:lag] = 0.0
+
+    # Unlisted assets cannot be held; their weight stays in cash
+    listed = ~np.isnan(prices)
+    weights = np.where(listed, np.nan_to_num(weights), 0.0)
+    filled = np.where(listed, prices, 1.0)
+
+    rebalance_mask = schedule_mask(dates, rebalance)
+    # The first trade happens as soon as the first lagged target is known
+    rebalance_mask[min(lag, T - 1)] = True
+    contributions = np.where(schedule_mask(dates, contribution_freq), contribution, 0.0) if contribution else np.zeros(T)
+    contributions[0] = 0.0
+    cost_rate = (fee_bps + slippage_bps) / 10000.0
+
+    trade_days = np.flatnonzero(rebalance_mask | (contributions > 0))
+    segment_ends = np.append(trade_days[1:], T)
+
+    shares = np.zeros(N)
+    cash = float(initial_capital)
+    values = np.empty(T)
+    total_cost = 0.0
+
+    for start, end in zip(trade_days, segment_ends):
+        price = filled[start]
+        cash += contributions[start]
+        value = cash + shares @ price
+
+        if rebalance_mask[start]:
+            target = value * weights[start] / price
+            cost = np.abs(target - shares) @ price * cost_rate
+            net_value = value - cost
+            shares = net_value * weights[start] / price
+            cash = net_value - shares @ price
+        else:
+            # New money is invested at the current targets without rebalancing
+            invested = contributions[start] * weights[start]
+            cost = invested.sum() * cost_rate
+            shares = shares + invested * (1 - cost_rate) / price
+            cash -= invested.sum()
+        total_cost += cost
+
+        values[start:end] = filled[start:end] @ shares + cash
+
+    returns = np.empty(T)
+    returns[0] = 0.0
+    returns[1:] = (values[1:] - contributions[1:]) / values[:-1] - 1
+
+    return {
+        "dates": pd.DatetimeIndex(dates),
+        "values": values,
+        "returns": returns,
+        "metrics": performance_metrics(returns, values, total_cost,
+                                       initial_capital + contributions.sum())
+    }
+
+
+def performance_metrics(returns, values, total_cost=0.0, invested=None):
+    """Summary statistics from daily time-weighted returns"""
+    growth = np.cumprod(1 + returns)
+    years = max(len(returns) - 1, 1) / TRADING_DAYS
+    volatility = returns[1:].std() * np.sqrt(TRADING_DAYS) if len(returns) > 2 else 0.0
+    drawdown = growth / np.maximum.accumulate(growth) - 1
+
+    return {
+        "CAGR (%)": (growth[-1] ** (1 / years) - 1) * 100,
+        "Volatility (%)": volatility * 100,
+        "Sharpe": returns[1:].mean() * TRADING_DAYS / volatility if volatility > 0 else 0.0,
+        "Max Drawdown (%)": drawdown.min() * 100,
+        "Final Value": values[-1],
+        "Invested": invested if invested is not None else values[0],
+        "Costs": total_cost
+    }
+
+
+# Strategies turn a price matrix into a T x N matrix of target weights
+
+def fixed_weights(prices, dates, allocation):
+    """Constant allocation, e.g. a 60/40 stock/bond split"""
+    allocation = np.asarray(allocation, dtype=float)
+    return np.broadcast_to(allocation / allocation.sum(), prices.shape)
+
+
+def moving_average_crossover(prices, dates, fast=50, slow=200, allocation=None):
+    """Hold each asset while its fast moving average is above the slow one"""
+    T, N = prices.shape
+    allocation = np.full(N, 1.0 / N) if allocation is None else np.asarray(allocation, dtype=float)
+    filled = pd.DataFrame(prices).ffill().to_numpy()
+    signal = _rolling_mean(filled, fast) > _rolling_mean(filled, slow)
+    return signal * allocation
+
+
+def momentum(prices, dates, lookback=126, top_n=3):
+    """Equal-weight the top_n assets by trailing return"""
+    filled = pd.DataFrame(prices).ffill().to_numpy()
+    trailing = np.full(filled.shape, -np.inf)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        trailing[lookback:] = filled[lookback:] / filled[:-lookback] - 1
+    trailing = np.where(np.isnan(trailing), -np.inf, trailing)
+
+    top_n = min(top_n, filled.shape[1])
+    top = np.argpartition(-trailing, top_n - 1, axis=1)[:, :top_n]
+    weights = np.zeros(filled.shape)
+    np.put_along_axis(weights, top, 1.0 / top_n, axis=1)
+    return np.where(np.isfinite(trailing), weights, 0.0)
+
+
+def dividend_tilt(prices, dates, dividend_yields, tilt=1.0):
+    """Weight assets by dividend yield, blended with equal weight by tilt"""
+    yields = np.asarray(dividend_yields, dtype=float)
+    equal = np.full(len(yields), 1.0 / len(yields))
+    by_yield = yields / yields.sum() if yields.sum() > 0 else equal
+    return np.broadcast_to((1 - tilt) * equal + tilt * by_yield, prices.shape)
+
+
+STRATEGIES = {
+    "fixed_weights": fixed_weights,
+    "moving_average_crossover": moving_average_crossover,
+    "momentum": momentum,
+    "dividend_tilt": dividend_tilt
+}
+
+
+def _rolling_mean(values, window):
+    """Trailing mean over the time axis via cumulative sums, NaN until the window fills"""
+    cumulative = np.cumsum(np.nan_to_num(values), axis=0)
+    means = np.full(values.shape, np.nan)
+    means[window - 1] = cumulative[window - 1] / window
+    means[window:] = (cumulative[window:] - cumulative[:-window]) / window
+    return means
+
+
+def parameter_grid(grid):
+    """Expand {"param": [values]} into a list of parameter dicts"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def _init_worker(prices_path, dates_path):
+    global _worker_prices, _worker_dates
+    # Every worker maps the same file, so the OS page cache holds one copy
+    _worker_prices = np.load(prices_path, mmap_mode="r")
+    _worker_dates = np.load(dates_path)
+
+
+def _run_config(task):
+    strategy_name, strategy_params, backtest_params = task
+    weights = STRATEGIES[strategy_name](_worker_prices, _worker_dates, **strategy_params)
+    result = run_backtest(_worker_prices, _worker_dates, weights, **backtest_params)
+    return {**strategy_params, **backtest_params, **result["metrics"]}
+
+
+def run_parameter_sweep(prices, dates, strategy, strategy_grid, backtest_grid=None, processes=None, chunksize=8):
+    """Backtest every parameter combination across a process pool.
+
+    The price matrix is written once to a temporary ``.npy`` file that every
+    worker memory-maps, instead of pickling a copy of it for each worker.
+
+    Args:
+        prices (ndarray or DataFrame): T x N close prices
+        dates (array): T trading dates
+        strategy (str): Name of a strategy in STRATEGIES
+        strategy_grid (dict): Strategy parameter values to sweep
+        backtest_grid (dict): run_backtest parameter values to sweep, e.g. costs or rebalancing
+        processes (int): Worker processes, defaults to the CPU count
+
+    Returns:
+        DataFrame: One row of parameters and metrics per configuration
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy : {strategy}")
+    tasks = [(strategy, strategy_params, backtest_params)
+             for strategy_params in parameter_grid(strategy_grid)
+             for backtest_params in parameter_grid(backtest_grid or {})]
+
+    workdir = tempfile.mkdtemp(prefix="backtest-")
+    try:
+        prices_path = os.path.join(workdir, "prices.npy")
+        dates_path = os.path.join(workdir, "dates.npy")
+        np.save(prices_path, np.ascontiguousarray(np.asarray(prices, dtype=float)))
+        np.save(dates_path, pd.DatetimeIndex(dates).to_numpy(dtype="datetime64[ns]"))
+
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(prices_path, dates_path)) as executor:
+            rows = list(executor.map(_run_config, tasks, chunksize=chunksize))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from data.price_store import generate_sample_history
+
+    symbols = ["AAPL", "MSFT", "JNJ", "XOM", "AGG"]
+    trading_dates = pd.bdate_range(end=pd.Timestamp.today(), periods=TRADING_DAYS * 20)
+    panel = np.column_stack([generate_sample_history(symbol, trading_dates)["Close"].to_numpy() for symbol in symbols])
+
+    started = time.perf_counter()
+    results = run_parameter_sweep(
+        panel, trading_dates, "moving_average_crossover",
+        {"fast": list(range(10, 110, 10)), "slow": list(range(120, 320, 20))},
+        {"rebalance": ["W", "M", "Q", "Y", None], "fee_bps": [0.0, 10.0]}
+    )
+    print(f"{len(results)} configurations in {time.perf_counter() - started:.1f}s")
+    print(results.sort_values("Sharpe", ascending=False).head())
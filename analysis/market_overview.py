@@ -0,0 +1,202 @@
+# analysis/market_overview.py - Shared market overview snapshot aggregated over the universe
+import threading
+import numpy as np
+import pandas as pd
+from data.universe import load_universe
+from data.price_store import get_price_store
+
+# Display name, price store symbol and sample starting level of each tracked index
+MARKET_INDICES = [
+    ("S&P 500", "^GSPC", 5872),
+    ("NASDAQ", "^IXIC", 19372),
+    ("DOW", "^DJI", 39432),
+    ("VIX", "^VIX", 12.45),
+    ("BIST 100", "XU100.IS", 9500),
+    ("USD/EUR", "EUR=X", 0.93),
+    ("Gold", "GC=F", 2318)
+]
+
+GROUPINGS = ["Sector", "Industry", "Exchange"]
+VOLUME_LOOKBACK = 20
+
+_shared_overview = None
+_shared_overview_lock = threading.Lock()
+
+
+class MarketOverview:
+    """Sector, industry and index level market statistics for the whole universe.
+
+    The snapshot is computed once from stored history with grouped bincount
+    aggregations. Streaming quotes then adjust the per-group running sums in
+    O(number of groupings), so the snapshot never has to be recomputed from
+    scratch while the market is open.
+    """
+
+    def __init__(self, universe=None, store=None, lookback=VOLUME_LOOKBACK):
+        self.universe = load_universe() if universe is None else universe.reset_index(drop=True)
+        self.store = store or get_price_store()
+        self.lookback = lookback
+        self._lock = threading.Lock()
+        self.rebuild()
+
+    def rebuild(self):
+        """Recompute all aggregates from the price store"""
+        with self._lock:
+            symbols = self.universe['Symbol'].tolist()
+            latest = self.store.latest(symbols, lookback=self.lookback).reindex(symbols)
+
+            self.position = {symbol: i for i, symbol in enumerate(symbols)}
+            self.prev_close = np.array(latest['Prev Close'], dtype=float)
+            self.last = np.array(latest['Close'], dtype=float)
+            self.volume = np.array(latest['Volume'].fillna(0), dtype=float)
+            self.avg_volume = np.array(latest['Avg Volume'].fillna(0), dtype=float)
+            self.weights = np.array(self.universe['Market Cap'].fillna(0), dtype=float)
+            self.as_of = latest['Date'].max() if latest['Date'].notna().any() else None
+
+            # Stocks without history take no part in the aggregates
+            self.weights = np.where(np.isnan(self.last), 0.0, self.weights)
+            returns = self._returns()
+
+            self.groups = {}
+            for grouping in GROUPINGS:
+                codes, labels = pd.factorize(self.universe[grouping].fillna("Other"))
+                size = len(labels)
+                self.groups[grouping] = {
+                    "codes": codes,
+                    "labels": labels,
+                    "weight": np.bincount(codes, weights=self.weights, minlength=size),
+                    "weighted_return": np.bincount(codes, weights=self.weights * returns, minlength=size),
+                    "advancers": np.bincount(codes, weights=(returns > 0) * 1.0, minlength=size),
+                    "decliners": np.bincount(codes, weights=(returns < 0) * 1.0, minlength=size),
+                    "volume": np.bincount(codes, weights=self.volume, minlength=size),
+                    "avg_volume": np.bincount(codes, weights=self.avg_volume, minlength=size),
+                    "count": np.bincount(codes, weights=(self.weights > 0) * 1.0, minlength=size)
+                }
+
+            index_latest = self.store.latest([symbol for _, symbol, _ in MARKET_INDICES], lookback=self.lookback)
+            self.indices = {}
+            for name, symbol, _ in MARKET_INDICES:
+                if symbol in index_latest.index:
+                    row = index_latest.loc[symbol]
+                    self.indices[name] = {"symbol": symbol, "value": row['Close'], "prev_close": row['Prev Close']}
+
+            self.built_on = pd.Timestamp.today().normalize()
+            # Versions keep increasing across rebuilds so caches keyed on them never go stale
+            self.version = getattr(self, "version", -1) + 1
+            self._snapshot = None
+
+    def _returns(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = self.last / self.prev_close - 1
+        return np.nan_to_num(returns)
+
+    def update_quote(self, symbol, price, volume=None):
+        """Apply a streaming quote by adjusting the running group sums"""
+        with self._lock:
+            for name, index in self.indices.items():
+                if index["symbol"] == symbol:
+                    index["value"] = price
+                    self.version += 1
+                    return
+
+            i = self.position.get(symbol)
+            if i is None or self.weights[i] == 0 or not self.prev_close[i]:
+                return
+
+            old_return = float(self.last[i] / self.prev_close[i] - 1)
+            new_return = float(price / self.prev_close[i] - 1)
+            volume_change = 0.0 if volume is None else volume - self.volume[i]
+            self.last[i] = price
+            if volume is not None:
+                self.volume[i] = volume
+
+            for group in self.groups.values():
+                g = group["codes"][i]
+                group["weighted_return"][g] += self.weights[i] * (new_return - old_return)
+                group["advancers"][g] += int(new_return > 0) - int(old_return > 0)
+                group["decliners"][g] += int(new_return < 0) - int(old_return < 0)
+                group["volume"][g] += volume_change
+            self.version += 1
+
+    def snapshot(self):
+        """Return the current snapshot, recomputing the tables only after changes.
+
+        The snapshot is shared by every caller and must be treated as read-only.
+        """
+        if pd.Timestamp.today().normalize() != self.built_on:
+            self.rebuild()
+
+        with self._lock:
+            if self._snapshot is not None and self._snapshot["version"] == self.version:
+                return self._snapshot
+
+            tables = {grouping: self._group_table(grouping) for grouping in GROUPINGS}
+            total = tables["Exchange"]
+            self._snapshot = {
+                "version": self.version,
+                "as_of": self.as_of,
+                "sample": self.store.sample,
+                "sectors": tables["Sector"],
+                "industries": tables["Industry"],
+                "exchanges": tables["Exchange"],
+                "breadth": {
+                    "advancers": int(total["Advancers"].sum()),
+                    "decliners": int(total["Decliners"].sum()),
+                    "unchanged": int(total["Count"].sum() - total["Advancers"].sum() - total["Decliners"].sum())
+                },
+                "indices": {
+                    name: {
+                        "value": index["value"],
+                        "change": (index["value"] / index["prev_close"] - 1) * 100 if index["prev_close"] else 0.0
+                    }
+                    for name, index in self.indices.items()
+                }
+            }
+            return self._snapshot
+
+    def _group_table(self, grouping):
+        group = self.groups[grouping]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.where(group["weight"] > 0, group["weighted_return"] / group["weight"], np.nan) * 100
+            volume_ratio = np.where(group["avg_volume"] > 0, group["volume"] / group["avg_volume"], np.nan)
+        table = pd.DataFrame({
+            grouping: group["labels"],
+            "Return (%)": returns,
+            "Advancers": group["advancers"].astype(int),
+            "Decliners": group["decliners"].astype(int),
+            "Volume Ratio": volume_ratio,
+            "Count": group["count"].astype(int)
+        })
+        return table[table["Count"] > 0].sort_values("Return (%)", ascending=False).reset_index(drop=True)
+
+
+def apply_quote(symbol, price, volume=None, timestamp=None):
+    """Feed a live quote to the alert engine, the FX service for FX pairs and, once it is built,
+    the shared market overview.
+
+    Returns:
+        list: Alert events the quote triggered
+    """
+    from analysis.alerts import get_alert_engine
+    from data.fx import fx_currency, get_fx_service
+
+    overview = _shared_overview
+    if overview is not None:
+        overview.update_quote(symbol, price, volume)
+    currency = fx_currency(symbol)
+    if currency is not None:
+        get_fx_service().tick(currency, price)
+    return get_alert_engine().on_tick(symbol, price, volume, timestamp)
+
+
+def get_market_overview():
+    """Return the process-wide market overview shared by every session.
+
+    It aggregates the shared price store, which holds sample history only in
+    development mode; without stored history the overview is empty.
+    """
+    global _shared_overview
+    with _shared_overview_lock:
+        if _shared_overview is None:
+            _shared_overview = MarketOverview(store=get_price_store())
+        return _shared_overview
@@ -0,0 +1,186 @@
+# analysis/profile_matching.py - Score the stock universe against investor profiles
+import numpy as np
+from data.universe import load_universe
+
+RISK_LEVELS = {
+    "Very Conservative": 1,
+    "Conservative": 3,
+    "Moderate": 5,
+    "Aggressive": 7,
+    "Very Aggressive": 9
+}
+
+TIMELINE_YEARS = {
+    "Less than 1 year": 0.5,
+    "1-3 years": 2,
+    "3-5 years": 4,
+    "5-10 years": 7.5,
+    "More than 10 years": 15
+}
+
+# Feature weights added for each investment goal
+GOAL_WEIGHTS = {
+    "Capital preservation": {"loss": -1.0, "dividend": 0.3},
+    "Income generation": {"dividend": 1.0},
+    "Long-term growth": {"growth": 0.7},
+    "Short-term gains": {"growth": 0.3, "risk": 0.3},
+    "Portfolio diversification": {"beta": -0.3},
+    "Retirement planning": {"dividend": 0.5, "loss": -0.5}
+}
+
+SECTOR_WEIGHT = 0.5
+RISK_FIT_WEIGHT = 2.0
+USER_BLOCK_SIZE = 1024
+
+
+def _zscore(values):
+    """Standardize a feature column, clipping outliers so one stock cannot dominate"""
+    std = values.std()
+    if std == 0:
+        return np.zeros_like(values)
+    return np.clip((values - values.mean()) / std, -2.0, 2.0)
+
+
+class ProfileMatcher:
+    """Scores every stock in the universe against a user profile with one matrix product.
+
+    Each stock is encoded once as a feature vector and each profile as a weight vector
+    over the same features, so the score of every stock is ``features @ weights``. The
+    squared distance between stock risk and user risk expands into a linear term on
+    ``risk`` and ``risk^2``, which keeps the whole score a single dot product.
+    """
+
+    def __init__(self, universe=None):
+        self.universe = load_universe() if universe is None else universe.reset_index(drop=True)
+        self.sectors = sorted(self.universe['Sector'].unique())
+
+        volatility = self.universe['Volatility'].to_numpy(dtype=float)
+        risk = np.clip(volatility / 60.0, 0.0, 1.0)
+
+        self.columns = ["risk", "risk_sq", "loss", "beta", "dividend", "growth"] + \
+                       [f"sector:{sector}" for sector in self.sectors]
+        self.column_index = {name: i for i, name in enumerate(self.columns)}
+
+        sector_onehot = (self.universe['Sector'].to_numpy()[:, None] ==
+                         np.array(self.sectors)[None, :]).astype(float)
+
+        self.features = np.column_stack([
+            risk,
+            risk ** 2,
+            np.clip(1.65 * volatility / 100.0, 0.0, 1.0),  # Bad-year loss estimate
+            _zscore(self.universe['Beta'].to_numpy(dtype=float)),
+            _zscore(self.universe['Dividend Yield'].to_numpy(dtype=float)),
+            _zscore(self.universe['Growth'].to_numpy(dtype=float)),
+            sector_onehot
+        ])
+
+    def profile_vector(self, profile):
+        """Convert a profile from the risk profile page into a feature weight vector"""
+        weights = np.zeros(len(self.columns))
+        index = self.column_index
+
+        risk_score = profile.get("risk_score")
+        if risk_score is None:
+            risk_score = RISK_LEVELS.get(profile.get("risk_profile"), 5)
+        user_risk = min(max(float(risk_score) / 10.0, 0.0), 1.0)
+
+        # -a * (risk - user_risk)^2 without the per-user constant
+        weights[index["risk"]] += 2 * RISK_FIT_WEIGHT * user_risk
+        weights[index["risk_sq"]] -= RISK_FIT_WEIGHT
+
+        loss_tolerance = profile.get("max_loss_tolerance", 15)
+        weights[index["loss"]] -= 1.0 - min(loss_tolerance, 50) / 50.0
+
+        horizon = min(TIMELINE_YEARS.get(profile.get("investment_timeline"), 5) / 10.0, 1.0)
+        weights[index["growth"]] += 0.5 * horizon
+        weights[index["loss"]] -= 0.5 * (1.0 - horizon)
+
+        goals = profile.get("investment_goals", [])
+        if isinstance(goals, str):
+            goals = [goal.strip() for goal in goals.split(",") if goal.strip()]
+        for goal in goals:
+            for feature, weight in GOAL_WEIGHTS.get(goal, {}).items():
+                weights[index[feature]] += weight
+
+        sector_weight = SECTOR_WEIGHT
+        if "Portfolio diversification" in goals:
+            sector_weight /= 2
+        for sector in profile.get("preferred_sectors", []):
+            column = index.get(f"sector:{sector}")
+            if column is not None:
+                weights[column] += sector_weight
+
+        return weights
+
+    def score(self, profile):
+        """Score every stock in the universe for a single profile"""
+        return self.features @ self.profile_vector(profile)
+
+    def top_k(self, profile, k=5):
+        """Return the k best matching stocks for a profile, best first"""
+        weights = self.profile_vector(profile)
+        scores = self.features @ weights
+        best = _top_k_indices(scores[None, :], k)[0]
+
+        matches = []
+        for i in best:
+            stock = self.universe.iloc[i]
+            matches.append({
+                "name": stock['Company'],
+                "symbol": stock['Symbol'],
+                "score": float(scores[i]),
+                "reason": self._reason(i, weights, profile)
+            })
+        return matches
+
+    def top_k_batch(self, profiles, k=5):
+        """Return the top k symbols for many profiles, e.g. for nightly emails.
+
+        Profiles are scored in blocks so the score matrix stays bounded in memory.
+        """
+        symbols = self.universe['Symbol'].to_numpy()
+        results = []
+        for start in range(0, len(profiles), USER_BLOCK_SIZE):
+            block = profiles[start:start + USER_BLOCK_SIZE]
+            weights = np.vstack([self.profile_vector(profile) for profile in block])
+            scores = weights @ self.features.T
+            for row in _top_k_indices(scores, k):
+                results.append(list(symbols[row]))
+        return results
+
+    def _reason(self, i, weights, profile):
+        """Describe the feature group that contributed most to a stock's score"""
+        stock = self.universe.iloc[i]
+        index = self.column_index
+        contributions = self.features[i] * weights
+        user_risk = weights[index["risk"]] / (2 * RISK_FIT_WEIGHT)
+        risk_gap = self.features[i, index["risk"]] - user_risk
+        groups = {
+            # Positive when the stock is within ~0.3 of the user's risk level
+            "risk": RISK_FIT_WEIGHT * (0.1 - risk_gap ** 2),
+            "loss": contributions[index["loss"]] + contributions[index["beta"]],
+            "dividend": contributions[index["dividend"]],
+            "growth": contributions[index["growth"]],
+            "sector": contributions[index[f"sector:{stock['Sector']}"]]
+        }
+        best = max(groups, key=groups.get)
+
+        if best == "dividend":
+            return f"{stock['Dividend Yield']:.1f}% dividend yield supports your income goals"
+        if best == "growth":
+            return f"{stock['Growth']:.0f}% expected growth fits your time horizon"
+        if best == "sector":
+            return f"Matches your preferred {stock['Sector']} sector"
+        if best == "loss":
+            return f"{stock['Volatility']:.0f}% volatility stays within your loss tolerance"
+        return f"Risk level fits your {profile.get('risk_profile', 'Moderate')} profile"
+
+
+def _top_k_indices(scores, k):
+    """Return the indices of the k highest scores in each row, sorted best first"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=int)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
@@ -0,0 +1,389 @@
+# analysis/sentiment.py - News and disclosure sentiment with decayed per-ticker and per-sector aggregates
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import Counter
+from config import PROCESSED_DATA_DIR, SENTIMENT_MODEL
+
+SENTIMENT_DB = os.path.join(PROCESSED_DATA_DIR, "sentiment.db")
+
+HALF_LIFE_DAYS = 3.0      # A document's weight halves every this many days
+BATCH_SIZE = 32
+MAX_LENGTH = 256          # Model tokens per document; titles and leads carry most of the tone
+NEUTRAL_BAND = 0.15       # Scores within this distance of zero read as neutral
+
+# Word roots, matched as prefixes of folded words so Turkish inflections count too
+POSITIVE_ROOTS = [
+    "yuksel", "artis", "artti", "artacak", "rekor", "karlil", "buyume", "buyudu", "olumlu", "guclu",
+    "toparlan", "temettu", "iyiles", "zirve", "tavan", "basari", "kazan",
+    "gain", "rise", "rose", "surge", "rall", "beat", "record", "growth", "profit", "upgrade", "strong",
+    "outperform", "bullish", "rebound", "dividend"
+]
+NEGATIVE_ROOTS = [
+    "dustu", "dusus", "duser", "dusuk", "geriled", "gerile", "zarar", "kayip", "olumsuz", "zayif", "endise",
+    "iflas", "ceza", "taban", "dava", "kriz", "belirsiz", "daral", "sorustur", "iptal", "temerrut",
+    "fall", "fell", "drop", "declin", "loss", "missed", "downgrade", "weak", "lawsuit", "bearish", "plung",
+    "slump", "concern", "bankrupt", "default", "probe"
+]
+NEGATIONS = {"not", "no", "never", "without"}   # Flip the first cue among the next two words
+POSTFIX_NEGATIONS = {"degil"}                   # Flips the word before it
+
+SENTIMENT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    model_id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (model_id, content_hash)
+);
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    score REAL NOT NULL,
+    observed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aggregates (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    score_sum REAL NOT NULL,
+    weight REAL NOT NULL,
+    reference REAL NOT NULL,
+    documents INTEGER NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+"""
+
+_shared_tracker = None
+_shared_tracker_lock = threading.Lock()
+
+
+def _connect(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SENTIMENT_SCHEMA)
+    return conn
+
+
+def document_hash(document):
+    text = f"{document.get('title') or ''}\n{document.get('text') or document.get('summary') or ''}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def document_time(document):
+    """Seconds since the epoch a document was published, fetched, or now"""
+    import numpy as np
+
+    published = document.get("published")
+    if published:
+        try:
+            return float(np.datetime64(str(published)[:19], "s").astype(np.int64))
+        except ValueError:
+            pass
+    return float(document.get("fetched_at") or time.time())
+
+
+def label(score):
+    if score > NEUTRAL_BAND:
+        return "Positive"
+    if score < -NEUTRAL_BAND:
+        return "Negative"
+    return "Neutral"
+
+
+class LexiconModel:
+    """Counts positive and negative word roots; needs no model download.
+
+    Scores are ``(positive - negative) / (positive + negative + 2)``, so a
+    document with a single cue leans only slightly.
+    """
+
+    model_id = "lexicon-1"
+
+    def __init__(self, positive=POSITIVE_ROOTS, negative=NEGATIVE_ROOTS):
+        self.roots = {**{root: 1 for root in positive}, **{root: -1 for root in negative}}
+        self.lengths = sorted({len(root) for root in self.roots})
+
+    def _polarity(self, word):
+        for length in self.lengths:
+            if length > len(word):
+                break
+            polarity = self.roots.get(word[:length])
+            if polarity:
+                return polarity
+        return 0
+
+    def score_one(self, text):
+        from data.symbol_search import fold
+
+        words = re.findall(r"\w+", fold(text))
+        polarities = [self._polarity(word) for word in words]
+        for i, word in enumerate(words):
+            if word in NEGATIONS:
+                for j in range(i + 1, min(i + 3, len(words))):
+                    if polarities[j]:
+                        polarities[j] = -polarities[j]
+                        break
+            elif word in POSTFIX_NEGATIONS and i > 0:
+                polarities[i - 1] = -polarities[i - 1]
+        positive = sum(1 for p in polarities if p > 0)
+        negative = sum(1 for p in polarities if p < 0)
+        return (positive - negative) / (positive + negative + 2)
+
+    def score(self, texts):
+        return [self.score_one(text) for text in texts]
+
+
+class TransformerSentimentModel:
+    """A text classification model (``SENTIMENT_MODEL``) on CPU, scored as P(positive) - P(negative).
+
+    The model is loaded on first use. Texts are sorted by length before
+    batching so each batch pads to similar lengths.
+    """
+
+    def __init__(self, model_name=SENTIMENT_MODEL, batch_size=BATCH_SIZE, max_length=MAX_LENGTH):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.model_id = f"{model_name}@{max_length}"
+        self._pipeline = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._pipeline is None:
+                from transformers import pipeline
+                self._pipeline = pipeline("text-classification", model=self.model_name, device=-1, top_k=None,
+                                          truncation=True, max_length=self.max_length)
+        return self._pipeline
+
+    def score(self, texts):
+        classify = self._load()
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        scores = [0.0] * len(texts)
+        results = classify([texts[i] for i in order], batch_size=self.batch_size)
+        for i, labels in zip(order, results):
+            probabilities = {item["label"].lower(): item["score"] for item in labels}
+            scores[i] = (sum(p for name, p in probabilities.items() if name.startswith("pos")) -
+                         sum(p for name, p in probabilities.items() if name.startswith("neg")))
+        return scores
+
+
+def default_model():
+    """The transformer model when transformers is installed, otherwise the lexicon"""
+    try:
+        import transformers  # noqa: F401
+    except ImportError:
+        print("transformers is not installed; scoring sentiment with the lexicon")
+        return LexiconModel()
+    return TransformerSentimentModel()
+
+
+class SentimentCache:
+    """Scores stored under (model id, document content hash)"""
+
+    def __init__(self, path=SENTIMENT_DB):
+        self.conn = _connect(path)
+        self._lock = threading.Lock()
+
+    def get_many(self, model_id, hashes):
+        found = {}
+        hashes = list(hashes)
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                part = hashes[start:start + 500]
+                found.update(self.conn.execute(
+                    f"SELECT content_hash, score FROM scores WHERE model_id = ? "
+                    f"AND content_hash IN ({','.join('?' * len(part))})", [model_id, *part]).fetchall())
+        return found
+
+    def put_many(self, model_id, scores):
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?)",
+                                  [(model_id, content_hash, score) for content_hash, score in scores.items()])
+
+
+class SentimentTracker:
+    """Exponentially decayed sentiment per ticker and per sector.
+
+    Reading needs nothing but SQLite, so pages can show sentiment without
+    loading the scoring stack.
+
+    Each aggregate keeps a decayed sum of scores and of weights relative to
+    the time of its newest document. A new document decays both by the time
+    elapsed and adds its score, so updates are O(1) and never revisit older
+    documents; a late (backfilled) document is simply added with less weight.
+    Reading an aggregate is a dictionary lookup: the score is the decayed
+    mean, and the weight, decayed to now, tells how much recent news it
+    rests on. The aggregates are read again whenever another connection,
+    such as the pipeline run in another process, has committed to the
+    database since.
+    """
+
+    def __init__(self, path=SENTIMENT_DB, half_life_days=HALF_LIFE_DAYS):
+        self.conn = _connect(path)
+        self.half_life = half_life_days * 86400
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        self._seen = None
+        # SQLite bumps data_version for this connection on every commit made by another one
+        self._data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        # (kind, key) -> [score sum, weight, reference time, documents]
+        self._aggregates = {(kind, key): [score_sum, weight, reference, documents] for
+                            kind, key, score_sum, weight, reference, documents in
+                            self.conn.execute("SELECT * FROM aggregates")}
+
+    def _refresh(self):
+        """Reload the aggregates if the database was written through another connection"""
+        if self.conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+            self._load()
+
+    def _decay(self, seconds):
+        return 0.5 ** (seconds / self.half_life)
+
+    def seen(self, document_id):
+        with self._lock:
+            self._refresh()
+            if self._seen is None:
+                self._seen = {row[0] for row in self.conn.execute("SELECT document_id FROM documents")}
+            return document_id in self._seen
+
+    def update(self, observations):
+        """Fold in scored documents.
+
+        Args:
+            observations (list): (document id, score, timestamp, tickers, sectors) tuples
+        """
+        with self._lock:
+            self._refresh()
+            if self._seen is None:
+                self._seen = {row[0] for row in self.conn.execute("SELECT document_id FROM documents")}
+            touched = set()
+            documents = []
+            for document_id, score, timestamp, tickers, sectors in observations:
+                if document_id in self._seen:
+                    continue
+                self._seen.add(document_id)
+                documents.append((document_id, score, timestamp))
+                keys = [("ticker", ticker) for ticker in tickers] + [("sector", sector) for sector in sectors]
+                for key in keys:
+                    aggregate = self._aggregates.setdefault(key, [0.0, 0.0, timestamp, 0])
+                    if timestamp >= aggregate[2]:
+                        factor = self._decay(timestamp - aggregate[2])
+                        aggregate[0] *= factor
+                        aggregate[1] *= factor
+                        aggregate[2] = timestamp
+                        weight = 1.0
+                    else:
+                        weight = self._decay(aggregate[2] - timestamp)
+                    aggregate[0] += weight * score
+                    aggregate[1] += weight
+                    aggregate[3] += 1
+                    touched.add(key)
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO documents VALUES (?, ?, ?)", documents)
+                self.conn.executemany("INSERT OR REPLACE INTO aggregates VALUES (?, ?, ?, ?, ?, ?)",
+                                      [(*key, *self._aggregates[key]) for key in touched])
+            return len(documents)
+
+    def get(self, key, kind="ticker", now=None):
+        """Current sentiment of a ticker (or sector), or None if no document mentioned it.
+
+        Returns:
+            dict: score (-1..1), label, weight (recent documents it rests on), documents, updated
+        """
+        with self._lock:
+            self._refresh()
+            aggregate = self._aggregates.get((kind, key))
+            if aggregate is None or aggregate[1] <= 0:
+                return None
+            score_sum, weight, reference, documents = aggregate
+        now = time.time() if now is None else now
+        return {"score": score_sum / weight, "label": label(score_sum / weight),
+                "weight": weight * self._decay(max(now - reference, 0.0)), "documents": documents,
+                "updated": reference}
+
+    def scores(self, kind="ticker"):
+        """{key: score} of every aggregate of a kind, e.g. for a screener column"""
+        with self._lock:
+            self._refresh()
+            return {key: values[0] / values[1] for (group, key), values in self._aggregates.items()
+                    if group == kind and values[1] > 0}
+
+
+class SentimentPipeline:
+    """Scores new documents in batches and folds them into the tracker.
+
+    Documents already folded in are skipped; scores are cached by content
+    hash and model, so re-running over the corpus, or scoring a republished
+    article, costs no model time.
+    """
+
+    def __init__(self, model=None, cache=None, tracker=None, linker=None, universe=None, batch_size=BATCH_SIZE):
+        self.model = model if model is not None else default_model()
+        self.cache = cache if cache is not None else SentimentCache()
+        self.tracker = tracker if tracker is not None else get_sentiment_tracker()
+        from data.entity_linker import get_entity_linker
+        from data.universe import load_universe
+
+        self.linker = linker if linker is not None else get_entity_linker()
+        universe = universe if universe is not None else load_universe()
+        self.sectors = dict(zip(universe['Symbol'], universe['Sector']))
+        self.batch_size = batch_size
+        self.stats = Counter()
+
+    def _score(self, batch):
+        hashes = [document_hash(document) for document in batch]
+        scores = self.cache.get_many(self.model.model_id, set(hashes))
+        missing = {h: document for h, document in zip(hashes, batch) if h not in scores}
+        if missing:
+            texts = [f"{d.get('title') or ''}. {d.get('text') or d.get('summary') or ''}" for d in missing.values()]
+            computed = dict(zip(missing, self.model.score(texts)))
+            self.cache.put_many(self.model.model_id, computed)
+            scores.update(computed)
+            self.stats["scored"] += len(missing)
+        self.stats["cached"] += len(batch) - len(missing)
+
+        observations = []
+        for document, content_hash in zip(batch, hashes):
+            tickers = list(self.linker.link_document(document))
+            sectors = sorted({self.sectors[ticker] for ticker in tickers if ticker in self.sectors})
+            observations.append((document["id"], scores[content_hash], document_time(document), tickers, sectors))
+        self.stats["documents"] += self.tracker.update(observations)
+
+    def run(self, documents):
+        """Score and aggregate documents from any iterable; returns statistics"""
+        started = time.perf_counter()
+        batch = []
+        for document in documents:
+            if self.tracker.seen(document["id"]):
+                continue
+            batch.append(document)
+            if len(batch) >= self.batch_size:
+                self._score(batch)
+                batch = []
+        if batch:
+            self._score(batch)
+        self.stats["seconds"] += time.perf_counter() - started
+        return dict(self.stats)
+
+
+def get_sentiment_tracker():
+    """Return the process-wide sentiment tracker"""
+    global _shared_tracker
+    with _shared_tracker_lock:
+        if _shared_tracker is None:
+            _shared_tracker = SentimentTracker()
+        return _shared_tracker
+
+
+if __name__ == "__main__":
+    # Run from the project root: python -m analysis.sentiment
+    from data.loaders.news_loader import iter_corpus
+
+    stats = SentimentPipeline().run(iter_corpus())
+    print(f"{stats.get('documents', 0)} documents added ({stats.get('scored', 0)} scored, "
+          f"{stats.get('cached', 0)} from cache) in {stats.get('seconds', 0):.1f}s")
@@ -0,0 +1,75 @@
+# analysis/valuation.py - Multi-currency valuation, P&L and NAV history in a reporting currency
+import numpy as np
+import pandas as pd
+from data.fx import PIVOT_CURRENCY, get_fx_service
+
+
+def value_positions(frame, reporting=PIVOT_CURRENCY, fx=None):
+    """Value positions held in different currencies in one reporting currency.
+
+    Args:
+        frame (DataFrame): Shares, Avg Cost and Current Price in each
+            position's native Currency
+        reporting (str): Currency of the returned amounts
+
+    Returns:
+        DataFrame: the frame plus Market Value, Cost, Gain/Loss and
+        Gain/Loss (%) in the reporting currency, and Priced, False for
+        positions whose currency has no rate; their amounts are NaN and
+        totals must say they are left out. Cost is translated at the
+        current rate, so Gain/Loss is the price gain in the position's own
+        currency, not the currency move since purchase.
+    """
+    if (frame['Currency'] == reporting).all():
+        multipliers = np.ones(len(frame))
+    else:
+        fx = fx if fx is not None else get_fx_service()
+        multipliers = fx.rates(reporting)[fx.codes(frame['Currency'])]
+    shares = frame['Shares'].to_numpy(dtype=float)
+    value = shares * frame['Current Price'].to_numpy(dtype=float) * multipliers
+    cost = shares * frame['Avg Cost'].to_numpy(dtype=float) * multipliers
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gain_pct = np.where(cost != 0, (value / cost - 1) * 100, 0.0)
+    return frame.assign(**{'Market Value': value, 'Cost': cost, 'Gain/Loss': value - cost, 'Gain/Loss (%)': gain_pct,
+                           'Priced': ~np.isnan(multipliers)})
+
+
+def positions_by_date(transactions, dates):
+    """Shares held of each symbol at the end of each date, replayed from transactions"""
+    trades = pd.DataFrame(transactions)
+    trades['Date'] = pd.to_datetime(trades['executed_at'], unit='s').dt.normalize()
+    trades['Change'] = np.where(trades['action'] == 'Buy', 1.0, -1.0) * trades['shares']
+    changes = trades.pivot_table(index='Date', columns='symbol', values='Change', aggfunc='sum')
+    held = changes.reindex(changes.index.union(dates)).fillna(0.0).cumsum().clip(lower=0.0)
+    return held.reindex(dates)
+
+
+def nav_history(transactions, reporting=PIVOT_CURRENCY, store=None, fx=None):
+    """Daily value of a portfolio in the reporting currency, from its transactions and stored closes.
+
+    Shares held are multiplied by native closes and by each date's FX rates
+    as whole date x symbol arrays. Each symbol is valued in the currency its
+    transactions were recorded in; symbols in a currency without rates are
+    left out (check ``FXService.has_rates``).
+
+    Returns:
+        Series: Portfolio value per date, empty if there is no stored history
+    """
+    from data.fx import native_currencies
+    from data.price_store import get_price_store
+
+    store = store if store is not None else get_price_store()
+    fx = fx if fx is not None else get_fx_service()
+    symbols = sorted({transaction['symbol'] for transaction in transactions})
+    closes = store.panel(symbols, "Close").ffill()
+    if closes.empty:
+        return pd.Series(dtype=float)
+
+    currencies = {transaction['symbol']: transaction.get('currency') for transaction in transactions}
+    first_trade = pd.to_datetime(min(transaction['executed_at'] for transaction in transactions), unit='s').normalize()
+    closes = closes[closes.index >= first_trade]
+    held = positions_by_date(transactions, closes.index).reindex(columns=closes.columns).fillna(0.0)
+    native = held * closes.fillna(0.0)
+    column_currencies = [currencies.get(symbol) or currency
+                         for symbol, currency in zip(native.columns, native_currencies(native.columns))]
+    return fx.convert_history(native, column_currencies, reporting).sum(axis=1)
@@ -1,24 +1,53 @@
 # config.py - Configuration settings for the financial assistant
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Environment-dependent settings and data directories are resolved on first
+# access through __getattr__ below, so importing config stays cheap: the .env
+# file is only read, and a directory only created, once something needs it.
 
 # Application settings
 APP_NAME = "Financial Investment Assistant"
-DEBUG = os.getenv("DEBUG", "False").lower() == "true"
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+_ENV_SETTINGS = {
+    "DEBUG": lambda: os.getenv("DEBUG", "False").lower() == "true",
+    "LOG_LEVEL": lambda: os.getenv("LOG_LEVEL", "INFO"),
+    "DEVICE": lambda: "cuda" if os.getenv("USE_GPU", "False").lower() == "true" else "cpu",
+    "OPENAI_API_KEY": lambda: os.getenv("OPENAI_API_KEY", ""),
+    "HUGGINGFACE_API_KEY": lambda: os.getenv("HUGGINGFACE_API_KEY", ""),
+    "EVDS_API_KEY": lambda: os.getenv("EVDS_API_KEY", "")
+}
 
 # Data settings
-DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
-VECTOR_DB_DIR = os.path.join(DATA_DIR, "vector_db")
-RAW_DATA_DIR = os.path.join(DATA_DIR, "raw")
-PROCESSED_DATA_DIR = os.path.join(DATA_DIR, "processed")
+_DATA_ROOT = os.path.join(os.path.dirname(__file__), "data")
+_DATA_DIRS = {
+    "DATA_DIR": _DATA_ROOT,
+    "VECTOR_DB_DIR": os.path.join(_DATA_ROOT, "vector_db"),
+    "RAW_DATA_DIR": os.path.join(_DATA_ROOT, "raw"),
+    "PROCESSED_DATA_DIR": os.path.join(_DATA_ROOT, "processed")
+}
+
+_env_loaded = False
+
+def load_environment():
+    """Load environment variables from the .env file, once"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
 
-# Create directories if they don't exist
-for directory in [DATA_DIR, VECTOR_DB_DIR, RAW_DATA_DIR, PROCESSED_DATA_DIR]:
-    os.makedirs(directory, exist_ok=True)
+def __getattr__(name):
+    if name in _ENV_SETTINGS:
+        load_environment()
+        value = _ENV_SETTINGS[name]()
+    elif name in _DATA_DIRS:
+        # Create the directory if it doesn't exist
+        value = _DATA_DIRS[name]
+        os.makedirs(value, exist_ok=True)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
 
 # Web scraping settings
 HEADERS = {
@@ -48,16 +77,15 @@ NEWS_SOURCES = [
 # Model settings
 EMBEDDING_MODEL = "dbmdz/bert-base-turkish-cased"
 LLM_MODEL = "meta-llama/Llama-3-8b-hf"  # Example model, adjust based on availability
-DEVICE = "cuda" if os.getenv("USE_GPU", "False").lower() == "true" else "cpu"
+SENTIMENT_MODEL = "savasy/bert-base-turkish-sentiment-cased"
 
 # RAG settings
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 TOP_K_RETRIEVAL = 5
+CONTEXT_TOKEN_BUDGET = 1500   # Tokens of chat history (summary and recent turns) sent with each question
 
-# API keys (stored in .env file)
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY", "")
+# API keys (OPENAI_API_KEY, HUGGINGFACE_API_KEY and EVDS_API_KEY are read from the .env file)
 ALPHA_VANTAGE_API_KEY = "your_key"
 FINNHUB_API_KEY = "your_key"
 # UI settings
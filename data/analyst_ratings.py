@@ -0,0 +1,293 @@
+# data/analyst_ratings.py - Analyst ratings and price targets with incrementally maintained consensus
+import os
+import zlib
+import sqlite3
+import threading
+from bisect import insort, bisect_left
+from collections import deque
+from datetime import date, timedelta
+from statistics import median
+import numpy as np
+from config import PROCESSED_DATA_DIR
+
+RATINGS_DB = os.path.join(PROCESSED_DATA_DIR, "analyst_ratings.db")
+RATINGS_SAMPLE_DB = os.path.join(PROCESSED_DATA_DIR, "analyst_ratings_sample.db")   # Never mixed with ingested ratings
+
+REVISION_WINDOW_DAYS = 90   # Upgrades, downgrades and target changes counted in momentum
+RATING_SCORES = {"Sell": -1, "Hold": 0, "Buy": 1}
+# Mean rating score from which each consensus label applies, best first
+CONSENSUS_LABELS = [(0.75, "Strong Buy"), (0.25, "Buy"), (-0.25, "Hold"), (-0.75, "Sell"), (-1.0, "Strong Sell")]
+
+SNAPSHOT_FIELDS = ["symbol", "as_of", "firms", "buy", "hold", "sell", "mean_score", "consensus", "mean_target",
+                   "median_target", "high_target", "low_target", "upgrades", "downgrades", "target_raises",
+                   "target_cuts", "momentum"]
+
+RATINGS_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS ratings (
+    symbol TEXT NOT NULL,
+    firm TEXT NOT NULL,
+    rated_at TEXT NOT NULL,
+    rating TEXT NOT NULL,
+    target REAL,
+    source TEXT,
+    PRIMARY KEY (symbol, firm, rated_at)
+);
+CREATE INDEX IF NOT EXISTS ratings_by_date ON ratings (symbol, rated_at);
+CREATE TABLE IF NOT EXISTS snapshots (
+    {', '.join(f'{field} {"TEXT" if field in ("symbol", "as_of", "consensus") else "REAL"}' for field in SNAPSHOT_FIELDS)},
+    PRIMARY KEY (symbol, as_of)
+);
+"""
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def consensus_label(mean_score):
+    for threshold, name in CONSENSUS_LABELS:
+        if mean_score >= threshold:
+            return name
+    return CONSENSUS_LABELS[-1][1]
+
+
+def _sign(value):
+    return (value > 0) - (value < 0)
+
+
+class Consensus:
+    """Running consensus of one ticker, built by applying its ratings in date order.
+
+    Each firm counts with its latest rating and target. Counts, the sorted
+    list of targets and the revisions inside the momentum window are updated
+    per rating, so applying one costs O(log firms) plus the pruning of
+    revisions that left the window.
+    """
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.firms = {}                    # Firm -> (rating score, target or None)
+        self.counts = {score: 0 for score in RATING_SCORES.values()}
+        self.targets = []                  # Sorted targets of the firms that gave one
+        self.revisions = deque()           # (date, rating direction, target direction)
+        self.as_of = None
+
+    def apply(self, firm, rated_at, rating, target=None):
+        score = RATING_SCORES[rating]
+        previous = self.firms.get(firm)
+        if previous is not None:
+            old_score, old_target = previous
+            self.counts[old_score] -= 1
+            if old_target is not None:
+                del self.targets[bisect_left(self.targets, old_target)]
+            rating_move = _sign(score - old_score)
+            target_move = _sign(target - old_target) if target is not None and old_target is not None else 0
+            if rating_move or target_move:
+                self.revisions.append((rated_at, rating_move, target_move))
+        self.firms[firm] = (score, target)
+        self.counts[score] += 1
+        if target is not None:
+            insort(self.targets, target)
+
+        self.as_of = rated_at
+        cutoff = (date.fromisoformat(rated_at) - timedelta(days=REVISION_WINDOW_DAYS)).isoformat()
+        while self.revisions and self.revisions[0][0] < cutoff:
+            self.revisions.popleft()
+
+    def snapshot(self):
+        firms = len(self.firms)
+        mean_score = sum(score * count for score, count in self.counts.items()) / firms if firms else 0.0
+        upgrades = sum(1 for _, move, _ in self.revisions if move > 0)
+        downgrades = sum(1 for _, move, _ in self.revisions if move < 0)
+        raises = sum(1 for _, _, move in self.revisions if move > 0)
+        cuts = sum(1 for _, _, move in self.revisions if move < 0)
+        targets = self.targets
+        return {
+            "symbol": self.symbol, "as_of": self.as_of, "firms": firms,
+            "buy": self.counts[1], "hold": self.counts[0], "sell": self.counts[-1],
+            "mean_score": mean_score, "consensus": consensus_label(mean_score),
+            "mean_target": sum(targets) / len(targets) if targets else None,
+            "median_target": median(targets) if targets else None,
+            "high_target": targets[-1] if targets else None, "low_target": targets[0] if targets else None,
+            "upgrades": upgrades, "downgrades": downgrades, "target_raises": raises, "target_cuts": cuts,
+            # Net revisions per covering firm over the window
+            "momentum": (upgrades - downgrades + raises - cuts) / firms if firms else 0.0
+        }
+
+
+class AnalystRatingsStore:
+    """Individual ratings in date order plus a consensus snapshot after each rating day.
+
+    The latest snapshot of every ticker is kept in memory, so detail pages and
+    screeners read consensus with a dictionary lookup. Snapshots are also
+    stored per (symbol, date), so "consensus as of date X" is a single seek
+    on that index, for backtests without lookahead. A rating older than the
+    ticker's latest one (a backfill) replays the ticker's history from that
+    day on.
+    """
+
+    def __init__(self, path=RATINGS_DB, sample=False):
+        self.path = path
+        self.sample = sample    # Holds generated ratings rather than ingested ones
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(RATINGS_SCHEMA)
+        self._states = {}       # Symbol -> Consensus, rebuilt on the first new rating of a session
+        self._latest = {}
+        for row in self.conn.execute(
+                f"SELECT {', '.join(SNAPSHOT_FIELDS)} FROM snapshots s "
+                f"WHERE as_of = (SELECT MAX(as_of) FROM snapshots WHERE symbol = s.symbol)"):
+            snapshot = dict(zip(SNAPSHOT_FIELDS, row))
+            self._latest[snapshot["symbol"]] = snapshot
+
+    def _replay(self, symbol, since=None):
+        """Rebuild a ticker's running consensus, rewriting its snapshots from ``since`` on"""
+        state = Consensus(symbol)
+        snapshots = []
+        rows = self.conn.execute("SELECT firm, rated_at, rating, target FROM ratings WHERE symbol = ? "
+                                 "ORDER BY rated_at, firm", (symbol,)).fetchall()
+        for i, (firm, rated_at, rating, target) in enumerate(rows):
+            state.apply(firm, rated_at, rating, target)
+            last_of_day = i + 1 == len(rows) or rows[i + 1][1] != rated_at
+            if since is not None and rated_at >= since and last_of_day:
+                snapshots.append(state.snapshot())
+        if since is not None:
+            self.conn.execute("DELETE FROM snapshots WHERE symbol = ? AND as_of >= ?", (symbol, since))
+            self._write_snapshots(snapshots)
+        self._states[symbol] = state
+        return state
+
+    def _write_snapshots(self, snapshots):
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO snapshots VALUES ({', '.join('?' * len(SNAPSHOT_FIELDS))})",
+            [tuple(snapshot[field] for field in SNAPSHOT_FIELDS) for snapshot in snapshots])
+
+    def add_ratings(self, ratings):
+        """Store ratings and bring each ticker's consensus up to date.
+
+        Args:
+            ratings (iterable): dicts with symbol, firm, rated_at (ISO date),
+                rating ("Buy", "Hold" or "Sell"), and optionally target and source
+
+        Returns:
+            int: Ratings that were new
+        """
+        by_symbol = {}
+        for rating in ratings:
+            by_symbol.setdefault(rating["symbol"], []).append(rating)
+
+        added = 0
+        with self._lock, self.conn:
+            for symbol, items in by_symbol.items():
+                items.sort(key=lambda item: (item["rated_at"], item["firm"]))
+                new = []
+                for item in items:
+                    cursor = self.conn.execute(
+                        "INSERT OR IGNORE INTO ratings VALUES (?, ?, ?, ?, ?, ?)",
+                        (symbol, item["firm"], item["rated_at"][:10], item["rating"], item.get("target"),
+                         item.get("source")))
+                    if cursor.rowcount:
+                        new.append(item)
+                if not new:
+                    continue
+                added += len(new)
+
+                state = self._states.get(symbol)
+                if state is None or (state.as_of is not None and new[0]["rated_at"][:10] <= state.as_of):
+                    # First update this session, or a backfill: replay from the earliest new day
+                    state = self._replay(symbol, since=new[0]["rated_at"][:10])
+                else:
+                    snapshots = []
+                    for i, item in enumerate(new):
+                        state.apply(item["firm"], item["rated_at"][:10], item["rating"], item.get("target"))
+                        if i + 1 == len(new) or new[i + 1]["rated_at"][:10] != item["rated_at"][:10]:
+                            snapshots.append(state.snapshot())
+                    self._write_snapshots(snapshots)
+                self._latest[symbol] = state.snapshot()
+        return added
+
+    def consensus(self, symbol):
+        """Latest consensus of a ticker, or None if no analyst rates it"""
+        return self._latest.get(symbol)
+
+    def consensus_table(self):
+        """Latest consensus of every rated ticker, e.g. for a screener"""
+        import pandas as pd
+        return pd.DataFrame(list(self._latest.values()), columns=SNAPSHOT_FIELDS).set_index("symbol")
+
+    def consensus_as_of(self, symbol, as_of):
+        """Consensus as it stood at the end of a date, using only ratings published by then"""
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT {', '.join(SNAPSHOT_FIELDS)} FROM snapshots WHERE symbol = ? AND as_of <= ? "
+                f"ORDER BY as_of DESC LIMIT 1", (symbol, str(as_of)[:10])).fetchone()
+        return dict(zip(SNAPSHOT_FIELDS, row)) if row else None
+
+    def history(self, symbol):
+        """Every consensus snapshot of a ticker, oldest first, for as-of joins"""
+        import pandas as pd
+        with self._lock:
+            rows = self.conn.execute(f"SELECT {', '.join(SNAPSHOT_FIELDS)} FROM snapshots WHERE symbol = ? "
+                                     f"ORDER BY as_of", (symbol,)).fetchall()
+        frame = pd.DataFrame(rows, columns=SNAPSHOT_FIELDS)
+        frame["as_of"] = pd.to_datetime(frame["as_of"])
+        return frame
+
+    def ratings(self, symbol, limit=20):
+        """A ticker's most recent individual ratings"""
+        with self._lock:
+            rows = self.conn.execute("SELECT firm, rated_at, rating, target, source FROM ratings WHERE symbol = ? "
+                                     "ORDER BY rated_at DESC LIMIT ?", (symbol, limit)).fetchall()
+        return [dict(zip(["firm", "rated_at", "rating", "target", "source"], row)) for row in rows]
+
+    def __len__(self):
+        return len(self._latest)
+
+    def close(self):
+        self.conn.close()
+
+
+def generate_sample_ratings(symbol, price, firms=8, days=365, seed=None):
+    """Random ratings and targets around a price, for development and tests"""
+    rng = np.random.default_rng(seed if seed is not None else zlib.crc32(symbol.encode()))
+    end = date.today()
+    bias = rng.normal(0.3, 0.4)
+    ratings = []
+    for firm in range(firms):
+        for _ in range(rng.integers(1, 4)):
+            score = int(np.clip(np.round(rng.normal(bias, 0.7)), -1, 1))
+            ratings.append({
+                "symbol": symbol, "firm": f"Broker {firm + 1}", "source": "sample",
+                "rated_at": (end - timedelta(days=int(rng.integers(0, days)))).isoformat(),
+                "rating": {-1: "Sell", 0: "Hold", 1: "Buy"}[score],
+                "target": round(float(price * (1 + 0.1 * score + rng.normal(0.05, 0.08))), 2)
+            })
+    return ratings
+
+
+def get_ratings_store():
+    """Return the process-wide ratings store.
+
+    In development mode (DEBUG), when no ratings have been ingested yet, this
+    is a separate store of sample ratings for the universe, flagged
+    ``sample`` so pages can label it; the ingested store is never seeded.
+    """
+    from config import DEBUG
+
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            store = AnalystRatingsStore()
+            if not len(store) and DEBUG:
+                store.close()
+                store = AnalystRatingsStore(RATINGS_SAMPLE_DB, sample=True)
+                if not len(store):
+                    from data.price_store import get_price_store
+                    from data.universe import load_universe
+                    symbols = load_universe()['Symbol'].tolist()
+                    latest = get_price_store().latest(symbols)['Close']
+                    store.add_ratings(rating for symbol in symbols for rating in
+                                      generate_sample_ratings(symbol, float(latest.get(symbol, 100.0))))
+            _shared_store = store
+        return _shared_store
@@ -0,0 +1,137 @@
+# data/cache.py - Process-wide computation cache shared by every user session
+import pickle
+import sys
+import threading
+from collections import OrderedDict, defaultdict
+import numpy as np
+import pandas as pd
+
+DEFAULT_BUDGET_BYTES = 256 * 1024 * 1024
+MAX_TRACKED_SESSIONS = 1000   # Sessions with hit statistics; the least recently active are forgotten
+
+
+def estimate_size(value):
+    """Approximate the memory held by a cached value, in bytes"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) \
+            else int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, (list, tuple)) and all(isinstance(item, (int, float, str)) for item in value):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+class SharedCache:
+    """LRU cache bounded by a memory budget and organised in namespaces.
+
+    Keys combine the namespace, the namespace's invalidation generation, an
+    optional input version (e.g. the last stored date) and the caller's key.
+    Invalidating a namespace bumps its generation so stale entries can no
+    longer be hit; they are also dropped right away to free their memory.
+    Concurrent misses on the same key compute the value only once.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_BUDGET_BYTES, max_sessions=MAX_TRACKED_SESSIONS):
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.bytes_used = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._generations = defaultdict(int)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.stats = OrderedDict(total={"hits": 0, "misses": 0})   # "total" plus sessions, least recent first
+
+    def get_or_compute(self, namespace, key, compute, version=None, session_id=None):
+        """Return the cached value for a key, computing and storing it on a miss"""
+        while True:
+            with self._lock:
+                full_key = (namespace, self._generations[namespace], version, key)
+                if full_key in self._entries:
+                    self._entries.move_to_end(full_key)
+                    self._record(session_id, hit=True)
+                    return self._entries[full_key]
+                pending = self._in_flight.get(full_key)
+                if pending is None:
+                    pending = self._in_flight[full_key] = threading.Event()
+                    self._record(session_id, hit=False)
+                    break
+            # Another session is computing the same value
+            pending.wait()
+            with self._lock:
+                if full_key in self._entries:
+                    self._entries.move_to_end(full_key)
+                    self._record(session_id, hit=True)
+                    return self._entries[full_key]
+
+        try:
+            value = compute()
+            self._store(full_key, value)
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(full_key, None)
+            pending.set()
+
+    def _store(self, full_key, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if full_key[1] != self._generations[full_key[0]]:
+                return  # Invalidated while computing
+            if full_key in self._entries:
+                self.bytes_used -= self._sizes[full_key]
+            self._entries[full_key] = value
+            self._sizes[full_key] = size
+            self.bytes_used += size
+            while self.bytes_used > self.max_bytes and self._entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self.bytes_used -= self._sizes.pop(evicted)
+
+    def invalidate(self, namespace):
+        """Drop every entry of a namespace, e.g. after its underlying data changed"""
+        with self._lock:
+            self._generations[namespace] += 1
+            for full_key in [key for key in self._entries if key[0] == namespace]:
+                del self._entries[full_key]
+                self.bytes_used -= self._sizes.pop(full_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.bytes_used = 0
+
+    def _record(self, session_id, hit):
+        field = "hits" if hit else "misses"
+        self.stats["total"][field] += 1
+        if session_id is None or session_id == "total":
+            return
+        if session_id not in self.stats:
+            self.stats[session_id] = {"hits": 0, "misses": 0}
+            # Guest sessions come and go; keep the statistics of recent ones only
+            if len(self.stats) > self.max_sessions + 1:
+                oldest = next(scope for scope in self.stats if scope != "total")
+                del self.stats[oldest]
+        self.stats.move_to_end(session_id)
+        self.stats[session_id][field] += 1
+
+    def session_stats(self, session_id="total"):
+        """Return hits, misses and hit rate for a session (or all sessions)"""
+        with self._lock:
+            stats = dict(self.stats.get(session_id, {"hits": 0, "misses": 0}))
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self.bytes_used
+            return stats
+
+
+shared_cache = SharedCache()
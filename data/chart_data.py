@@ -0,0 +1,161 @@
+# data/chart_data.py - Downsampled price series for charts
+import numpy as np
+import pandas as pd
+from data.cache import shared_cache
+from data.price_store import get_price_store
+
+# Charts never need more points than the plot is wide in pixels
+DEFAULT_RESOLUTION = 800
+MAX_RESOLUTION = 2000
+
+# Look-back windows offered by the range selectors, in calendar days
+CHART_RANGES = {"1M": 31, "3M": 92, "6M": 183, "1Y": 366, "5Y": 1827, "Max": None}
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of a line.
+
+    Keeps the first and last points and, from every bucket in between, the
+    point forming the largest triangle with the previously kept point and the
+    average of the next bucket, which preserves peaks and troughs.
+
+    Returns:
+        ndarray: Indices of the kept points
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    kept = np.empty(threshold, dtype=int)
+    kept[0] = 0
+    kept[-1] = n - 1
+
+    previous = 0
+    for b in range(threshold - 2):
+        start, end = edges[b], edges[b + 1]
+        next_end = edges[b + 2] if b + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous]) -
+                       (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        kept[b + 1] = previous
+    return kept
+
+
+def downsample_line(series, resolution=DEFAULT_RESOLUTION):
+    """Reduce a date-indexed Series to at most ``resolution`` points with LTTB"""
+    if len(series) <= resolution:
+        return series
+    x = series.index.asi8 if isinstance(series.index, pd.DatetimeIndex) else np.arange(len(series))
+    values = series.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    kept = lttb(x[valid], values[valid], resolution)
+    return series[valid].iloc[kept]
+
+
+def downsample_ohlc(frame, resolution=DEFAULT_RESOLUTION):
+    """Aggregate OHLC bars into at most ``resolution`` buckets.
+
+    Each bucket keeps the first open, highest high, lowest low, last close and
+    summed volume of its bars, stamped with the bucket's first date.
+    """
+    if len(frame) <= resolution:
+        return frame
+    starts = np.linspace(0, len(frame), resolution, endpoint=False).astype(int)
+    ends = np.append(starts[1:], len(frame)) - 1
+
+    reduced = {
+        "Open": frame["Open"].to_numpy()[starts],
+        "High": np.maximum.reduceat(frame["High"].to_numpy(), starts),
+        "Low": np.minimum.reduceat(frame["Low"].to_numpy(), starts),
+        "Close": frame["Close"].to_numpy()[ends]
+    }
+    if "Volume" in frame:
+        reduced["Volume"] = np.add.reduceat(frame["Volume"].to_numpy(), starts)
+    return pd.DataFrame(reduced, index=frame.index[starts])
+
+
+def range_start(end, range_label):
+    """Return the first date of a named chart range ending at ``end``"""
+    days = CHART_RANGES.get(range_label)
+    return None if days is None else pd.Timestamp(end) - pd.Timedelta(days=days)
+
+
+def load_price_history(symbol, store=None):
+    """Return the stored daily bars of a symbol, or None when it has no history"""
+    store = store or get_price_store()
+    if not store.has(symbol):
+        return None
+    return store.read(symbol)
+
+
+def content_version(data):
+    """Fingerprint of a frame or series' dates and values, so a rewritten bar changes it.
+
+    Hashing touches every row; stored histories are keyed on ``PriceStore.version`` instead.
+    """
+    hashes = pd.util.hash_pandas_object(data, index=True).to_numpy()
+    return len(data), int(np.bitwise_xor.reduce(hashes * np.arange(1, len(hashes) + 1, dtype=np.uint64)))
+
+
+def get_chart_candles(symbol, range_label="Max", resolution=DEFAULT_RESOLUTION, session_id=None, store=None,
+                      frame=None):
+    """Return cached candles for a symbol and range, reduced to the resolution.
+
+    The stored history is keyed on the store's version of the symbol and only
+    read on a cache miss, so a hit costs a single stat.
+
+    Args:
+        symbol (str): Ticker the bars belong to
+        range_label (str): One of CHART_RANGES
+        resolution (int): Maximum number of candles, i.e. the chart width in pixels
+        frame (DataFrame): OHLC bars to chart instead of stored ones, e.g. sample data
+
+    Returns:
+        DataFrame: At most ``resolution`` OHLC rows, or None without stored history or ``frame``
+    """
+    resolution = min(int(resolution), MAX_RESOLUTION)
+    if frame is None:
+        store = store or get_price_store()
+        version = store.version(symbol)
+        if version is None:
+            return None
+        key = (store.root, symbol, range_label, resolution)
+    else:
+        version = content_version(frame)
+        key = (None, symbol, range_label, resolution)
+
+    def compute():
+        bars = frame if frame is not None else store.read(symbol, mmap=False)
+        if bars.empty:
+            return bars
+        start = range_start(bars.index[-1], range_label)
+        return downsample_ohlc(bars if start is None else bars.loc[start:], resolution)
+
+    return shared_cache.get_or_compute("chart_ohlc", key, compute, version=version, session_id=session_id)
+
+
+def get_chart_line(name, series, range_label="Max", resolution=DEFAULT_RESOLUTION, session_id=None):
+    """Return a cached LTTB-reduced line for a named, derived series and range.
+
+    Keyed on the series' content; call it where the series itself is only
+    rebuilt on a miss of an enclosing cache.
+    """
+    resolution = min(int(resolution), MAX_RESOLUTION)
+    if series.empty:
+        return series
+    end = series.index[-1]
+    key = (name, range_label, resolution)
+
+    def compute():
+        start = range_start(end, range_label)
+        window = series if start is None else series.loc[start:]
+        return downsample_line(window, resolution)
+
+    return shared_cache.get_or_compute("chart_line", key, compute, version=content_version(series),
+                                       session_id=session_id)
@@ -0,0 +1,77 @@
+# data/document_store.py - Append-only store for scraped documents (news, disclosures)
+import os
+import json
+import threading
+from config import RAW_DATA_DIR
+
+DOCUMENTS_FILE = os.path.join(RAW_DATA_DIR, "documents.jsonl")
+
+
+class DocumentStore:
+    """Documents kept one JSON object per line, identified by their "id" field
+    and labelled with a "kind".
+
+    Writes are appended and flushed one document at a time, so producers can
+    stream records in without building batches, and adding a document whose
+    id is already stored does nothing, which makes re-running an interrupted
+    ingestion safe. Reading streams the file line by line.
+    """
+
+    def __init__(self, path=DOCUMENTS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ids = None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _load_ids(self):
+        if self._ids is None:
+            self._ids = {document["id"] for document in self.iter_documents()}
+            self._terminate_last_line()
+        return self._ids
+
+    def _terminate_last_line(self):
+        # After an interrupted append, start the next document on a fresh line
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, "rb+") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+
+    def has(self, document_id):
+        with self._lock:
+            return document_id in self._load_ids()
+
+    def add(self, document):
+        """Append a document unless one with the same id is stored; returns True if written"""
+        with self._lock:
+            ids = self._load_ids()
+            if document["id"] in ids:
+                return False
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(document, ensure_ascii=False) + "\n")
+            ids.add(document["id"])
+            return True
+
+    def add_many(self, documents):
+        """Append documents from any iterable; returns the number written"""
+        return sum(self.add(document) for document in documents)
+
+    def iter_documents(self, kind=None):
+        """Yield stored documents in insertion order, optionally of one kind ("news", "disclosure") only"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    document = json.loads(line)
+                except ValueError:
+                    # A write interrupted mid-line; the document is fetched again later
+                    continue
+                if kind is None or document.get("kind") == kind:
+                    yield document
+
+    def __len__(self):
+        with self._lock:
+            return len(self._load_ids())
@@ -0,0 +1,325 @@
+# data/entity_linker.py - Links news and disclosures to the companies they mention
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import Counter, deque
+from config import PROCESSED_DATA_DIR
+from data.symbol_search import TURKISH_FOLD, fold
+from data.universe import load_universe
+
+ENTITY_DB = os.path.join(PROCESSED_DATA_DIR, "entities.db")
+
+WORD = re.compile(r"\$?\w+")
+# Legal-form endings dropped from company names: "Apple Inc." is also written "Apple"
+LEGAL_SUFFIXES = [("inc",), ("corp",), ("corporation",), ("co",), ("ltd",), ("plc",),
+                  ("a", "s"), ("t", "a", "s"), ("as",), ("tas",)]
+MIN_NAME_LENGTH = 4       # Shorter single-word names and aliases are too ambiguous to link
+SHOUTING_RUN = 3          # Consecutive capitalized words in which a bare symbol is just emphasis
+SUMMARY_LENGTH = 240
+
+KIND_SYMBOL, KIND_NAME = 0, 1
+
+ENTITY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    kind TEXT,
+    source TEXT,
+    title TEXT,
+    url TEXT,
+    published TEXT,
+    summary TEXT,
+    linker_version TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    symbol TEXT NOT NULL,
+    document_id TEXT NOT NULL,
+    published TEXT,
+    mentions INTEGER NOT NULL,
+    PRIMARY KEY (symbol, document_id)
+);
+CREATE INDEX IF NOT EXISTS documents_by_date ON documents (published DESC);
+CREATE INDEX IF NOT EXISTS postings_by_date ON postings (symbol, published DESC);
+CREATE INDEX IF NOT EXISTS postings_by_document ON postings (document_id);
+"""
+
+_shared_linker = None
+_shared_linker_lock = threading.Lock()
+
+
+def fold_words(text):
+    """Split a text into (folded word, original word) pairs"""
+    words = []
+    for match in WORD.finditer(text):
+        word = match.group()
+        key = word.lstrip("$").translate(TURKISH_FOLD).lower()
+        words.append((key if key.isascii() else fold(key), word))
+    return words
+
+
+def name_patterns(name):
+    """Word sequences a company name is written as: in full and without its legal form"""
+    words = [key for key, _ in fold_words(name)]
+    patterns = [tuple(words)]
+    for suffix in LEGAL_SUFFIXES:
+        if len(words) > len(suffix) and tuple(words[-len(suffix):]) == suffix:
+            patterns.append(tuple(words[:-len(suffix)]))
+    return patterns
+
+
+class EntityLinker:
+    """Finds the companies a text mentions in one pass over its words.
+
+    Symbols, company names (with and without their legal form) and aliases are
+    compiled into a single Aho-Corasick automaton over folded words, so a
+    document is scanned once however many companies the universe holds.
+    Matching whole words means Turkish suffixes after an apostrophe
+    ("THY'nin", "Aselsan'ın") still link, and words inside other words never do.
+
+    Context rules keep ambiguous matches out:
+        - a bare symbol must be written in capitals ("KO", "CAT") and not
+          inside a run of capitalized words (headline shouting); a leading
+          "$" always links, and is required for one-letter symbols ("$V")
+        - single-word names and aliases ("Garanti", "Apple") must be
+          capitalized, and at least ``MIN_NAME_LENGTH`` letters long
+        - overlapping matches resolve to the longest, leftmost one
+    """
+
+    def __init__(self, universe=None):
+        if universe is None:
+            universe = load_universe()
+        self.symbols = universe['Symbol'].astype(str).tolist()
+        exchanges = universe['Exchange'].astype(str) if 'Exchange' in universe else [""] * len(self.symbols)
+        self.exchanges = dict(zip(self.symbols, exchanges))
+        self.goto = [{}]        # State -> {word: next state}
+        self.fail = [0]
+        self.output = [[]]      # State -> [(symbol id, pattern length, kind)] ending there
+
+        patterns = {}
+        for i, (symbol, company, aliases) in enumerate(zip(self.symbols, universe['Company'].astype(str),
+                                                           universe['Aliases'].fillna("").astype(str))):
+            patterns.setdefault(tuple(key for key, _ in fold_words(symbol)), set()).add((i, KIND_SYMBOL))
+            names = name_patterns(company)
+            for alias in aliases.split(";"):
+                if alias.strip().isupper():
+                    # Alternative tickers ("THY", "GOOG") follow the rules of symbols
+                    patterns.setdefault(tuple(key for key, _ in fold_words(alias)), set()).add((i, KIND_SYMBOL))
+                elif alias.strip():
+                    names.extend(name_patterns(alias))
+            for words in names:
+                if words and (len(words) > 1 or len(words[0]) >= MIN_NAME_LENGTH):
+                    patterns.setdefault(words, set()).add((i, KIND_NAME))
+        for words, targets in patterns.items():
+            self._insert(words, targets)
+        self._build_failure_links()
+        self.version = hashlib.sha1(repr(sorted(patterns.items())).encode("utf-8")).hexdigest()[:16]
+
+    def _insert(self, words, targets):
+        state = 0
+        for word in words:
+            if word not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][word] = len(self.goto) - 1
+            state = self.goto[state][word]
+        self.output[state].extend((i, len(words), kind) for i, kind in targets)
+
+    def _build_failure_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(word, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def _matches(self, words):
+        """Every (start, end, symbol id, kind) whose words pass the context rules"""
+        goto, fail, output = self.goto, self.fail, self.output
+        matches = []
+        state = 0
+        for position, (key, _) in enumerate(words):
+            while state and key not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(key, 0)
+            for i, length, kind in output[state]:
+                start = position + 1 - length
+                if self._accept(words, start, position + 1, kind):
+                    matches.append((start, position + 1, i))
+        return matches
+
+    @staticmethod
+    def _accept(words, start, end, kind):
+        originals = [original for _, original in words[start:end]]
+        if kind == KIND_SYMBOL:
+            if originals[0].startswith("$"):
+                return True
+            if not all(word.isupper() or word.isdigit() for word in originals) or len("".join(originals)) < 2:
+                return False
+            # A symbol in the middle of an all-capitals run is emphasis, not a ticker
+            run = end - start
+            left, right = start - 1, end
+            while left >= 0 and words[left][1].isupper() and len(words[left][1]) > 1:
+                run, left = run + 1, left - 1
+            while right < len(words) and words[right][1].isupper() and len(words[right][1]) > 1:
+                run, right = run + 1, right + 1
+            return run < SHOUTING_RUN
+        return end - start > 1 or originals[0][:1].isupper()
+
+    def link(self, text):
+        """Mentions per symbol in a text.
+
+        Returns:
+            Counter: symbol -> number of mentions
+        """
+        mentions = Counter()
+        span = (-1, 0)
+        # Leftmost first, and the longest of the matches starting at the same word
+        for start, end, i in sorted(set(self._matches(fold_words(text))), key=lambda match: (match[0], -match[1])):
+            if start >= span[1]:
+                span = (start, end)
+            if (start, end) == span:
+                mentions[self.symbols[i]] += 1
+        return mentions
+
+    def link_document(self, document):
+        """Mentions per symbol in a document's title and text, plus any symbols it already lists"""
+        mentions = self.link(f"{document.get('title') or ''}\n{document.get('text') or ''}")
+        for symbol in document.get("symbols") or []:
+            mentions[symbol] = max(mentions[symbol], 1)
+        return mentions
+
+    def tag(self, documents):
+        """Yield documents with "symbols" set to the companies they mention, most mentioned first"""
+        for document in documents:
+            mentions = self.link_document(document)
+            yield {**document, "symbols": [symbol for symbol, _ in mentions.most_common()]}
+
+
+class EntityPostings:
+    """Symbol -> document postings, with the fields a news feed shows.
+
+    Each linked document is recorded with the linker version that tagged it;
+    documents tagged by an older universe are linked again on the next run.
+    """
+
+    def __init__(self, path=ENTITY_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(ENTITY_SCHEMA)
+
+    def linked_ids(self, version):
+        with self._lock:
+            return {row[0] for row in self._conn.execute(
+                "SELECT document_id FROM documents WHERE linker_version = ?", (version,))}
+
+    def add(self, linked, version):
+        """Store (document, mentions) pairs, replacing earlier postings of the same documents"""
+        documents, postings = [], []
+        for document, mentions in linked:
+            text = " ".join((document.get("text") or document.get("summary") or "").split())
+            documents.append((document["id"], document.get("kind"), document.get("source"), document.get("title"),
+                              document.get("url"), document.get("published"), text[:SUMMARY_LENGTH], version))
+            postings.extend((symbol, document["id"], document.get("published"), count)
+                            for symbol, count in mentions.items())
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM postings WHERE document_id = ?", [(row[0],) for row in documents])
+            self._conn.executemany("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)", documents)
+            self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", postings)
+
+    def documents(self, symbols=None, kind=None, limit=20):
+        """Newest documents mentioning any of ``symbols`` (all documents if None)"""
+        query = "SELECT d.document_id, d.kind, d.source, d.title, d.url, d.published, d.summary FROM documents d"
+        params = []
+        conditions = []
+        if symbols is not None:
+            conditions.append(f"d.document_id IN (SELECT document_id FROM postings WHERE symbol IN "
+                              f"({','.join('?' * len(symbols))}))")
+            params.extend(symbols)
+        if kind is not None:
+            conditions.append("d.kind = ?")
+            params.append(kind)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY d.published DESC LIMIT ?"
+        params.append(limit)
+        columns = ["id", "kind", "source", "title", "url", "published", "summary"]
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        results = [dict(zip(columns, row)) for row in rows]
+        for result in results:
+            result["symbols"] = self.symbols_of(result["id"])
+        return results
+
+    def symbols_of(self, document_id):
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT symbol FROM postings WHERE document_id = ? ORDER BY mentions DESC", (document_id,))]
+
+    def counts(self, symbols=None):
+        """Number of linked documents per symbol"""
+        query = "SELECT symbol, COUNT(*) FROM postings"
+        params = list(symbols or [])
+        if symbols is not None:
+            query += f" WHERE symbol IN ({','.join('?' * len(params))})"
+        with self._lock:
+            return dict(self._conn.execute(query + " GROUP BY symbol", params).fetchall())
+
+    def close(self):
+        self._conn.close()
+
+
+def link_corpus(documents, linker=None, postings=None, batch_size=1000):
+    """Link documents not yet tagged by the current linker and store their postings.
+
+    Returns:
+        dict: documents seen, linked, mentions found and seconds spent
+    """
+    started = time.perf_counter()
+    linker = linker if linker is not None else get_entity_linker()
+    postings = postings if postings is not None else EntityPostings()
+    done = postings.linked_ids(linker.version)
+    stats = Counter()
+    batch = []
+    for document in documents:
+        stats["documents"] += 1
+        if document["id"] in done:
+            continue
+        mentions = linker.link_document(document)
+        stats["linked"] += 1
+        stats["mentions"] += sum(mentions.values())
+        batch.append((document, mentions))
+        if len(batch) >= batch_size:
+            postings.add(batch, linker.version)
+            batch = []
+    if batch:
+        postings.add(batch, linker.version)
+    stats["seconds"] = time.perf_counter() - started
+    return dict(stats)
+
+
+def get_entity_linker():
+    """Return the process-wide entity linker, built from the universe on first use"""
+    global _shared_linker
+    with _shared_linker_lock:
+        if _shared_linker is None:
+            _shared_linker = EntityLinker()
+        return _shared_linker
+
+
+if __name__ == "__main__":
+    # Run from the project root: python -m data.entity_linker
+    from data.loaders.news_loader import iter_corpus
+
+    stats = link_corpus(iter_corpus())
+    print(f"{stats.get('linked', 0)} of {stats.get('documents', 0)} documents linked, "
+          f"{stats.get('mentions', 0)} mentions in {stats['seconds']:.1f}s")
@@ -0,0 +1,180 @@
+# data/fx.py - Currency of each listing and a cached, time-indexed FX rate matrix
+import threading
+import numpy as np
+import pandas as pd
+from data.price_store import get_price_store
+
+PIVOT_CURRENCY = "USD"
+CURRENCIES = ["USD", "EUR", "TRY"]
+CURRENCY_SYMBOLS = {"USD": "$", "EUR": "€", "TRY": "₺"}
+
+# Price store symbols quoting units of a currency per US dollar
+FX_SYMBOLS = {"EUR": "EUR=X", "TRY": "TRY=X"}
+EXCHANGE_CURRENCIES = {"US": "USD", "BIST": "TRY"}
+SYMBOL_SUFFIX_CURRENCIES = {".IS": "TRY"}
+
+# Starting rates and volatilities (%) of the sample FX history used in development mode (DEBUG)
+SAMPLE_RATES = {"EUR=X": 0.93, "TRY=X": 32.0}
+SAMPLE_VOLATILITIES = {"EUR=X": 8.0, "TRY=X": 12.0}
+
+_shared_service = None
+_shared_service_lock = threading.Lock()
+
+
+def fx_currency(symbol):
+    """Currency whose units per US dollar a price store symbol quotes, or None for other symbols"""
+    return next((currency for currency, fx_symbol in FX_SYMBOLS.items() if fx_symbol == symbol), None)
+
+
+def native_currencies(symbols, universe=None):
+    """Trading currency of each symbol, from its exchange in the universe or its suffix; USD otherwise"""
+    from data.universe import load_universe
+
+    universe = load_universe() if universe is None else universe
+    exchanges = dict(zip(universe['Symbol'], universe['Exchange']))
+    currencies = []
+    for symbol in symbols:
+        currency = EXCHANGE_CURRENCIES.get(exchanges.get(symbol))
+        if currency is None:
+            currency = next((code for suffix, code in SYMBOL_SUFFIX_CURRENCIES.items() if symbol.endswith(suffix)),
+                            PIVOT_CURRENCY)
+        currencies.append(currency)
+    return currencies
+
+
+def native_currency(symbol, universe=None):
+    return native_currencies([symbol], universe)[0]
+
+
+def format_money(amount, currency):
+    """Amount with its currency sign, e.g. "$1,234.50" or "₺1,234.50" """
+    sign = "-" if amount < 0 else ""
+    return f"{sign}{CURRENCY_SYMBOLS.get(currency, currency + ' ')}{abs(amount):,.2f}"
+
+
+class FXService:
+    """Daily FX rates as a date x currency matrix of units per US dollar.
+
+    The matrix is built from the FX closes in the price store and rebuilt only
+    when one of them is rewritten. Live ticks override the latest row without
+    touching the history. Conversions take a vector of amounts with a vector
+    of currency codes and multiply by one gathered rate vector (or, for
+    histories, one date x column rate array), so revaluing any number of
+    positions after a tick is a single array operation.
+    """
+
+    def __init__(self, store=None, currencies=CURRENCIES):
+        self.store = store if store is not None else get_price_store()
+        self.currencies = list(currencies)
+        self._index = pd.Index(self.currencies)
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._matrix_version = None
+        self._live = {}
+        self._ticks = 0
+
+    def _symbols(self):
+        return {currency: FX_SYMBOLS[currency] for currency in self.currencies if currency in FX_SYMBOLS}
+
+    @property
+    def version(self):
+        """Token that changes when stored history is rewritten or a live rate ticks"""
+        return (tuple(self.store.version(symbol) for symbol in self._symbols().values()), self._ticks)
+
+    def matrix(self):
+        """Units of each currency per US dollar, one row per date with any stored FX close.
+
+        Gaps are carried forward; dates before a currency's first close take
+        that first close, which is fine for valuation but not for backtests.
+        """
+        symbols = self._symbols()
+        stored_version = self.version[0]
+        with self._lock:
+            if self._matrix is not None and self._matrix_version == stored_version:
+                return self._matrix
+        closes = self.store.panel(list(symbols.values()), "Close")
+        matrix = pd.DataFrame(index=closes.index, columns=self.currencies, dtype=float)
+        for currency in self.currencies:
+            matrix[currency] = closes[symbols[currency]] if currency in symbols else 1.0
+        matrix = matrix.ffill().bfill()
+        with self._lock:
+            self._matrix, self._matrix_version = matrix, stored_version
+        return matrix
+
+    def tick(self, currency, units_per_usd):
+        """Apply a live rate; it replaces the latest stored close until the history is rewritten"""
+        with self._lock:
+            self._live[currency] = float(units_per_usd)
+            self._ticks += 1
+
+    def has_rates(self, currency):
+        """Whether the currency has a stored close or a live tick to convert with"""
+        if currency == PIVOT_CURRENCY or currency in self._live:
+            return True
+        matrix = self.matrix()
+        return currency in matrix and bool(matrix[currency].notna().any())
+
+    def codes(self, currencies):
+        """Position of each currency in ``self.currencies``"""
+        codes = self._index.get_indexer(list(currencies))
+        if (codes < 0).any():
+            unknown = sorted({currency for currency, code in zip(currencies, codes) if code < 0})
+            raise ValueError(f"Unknown currency : {', '.join(unknown)}")
+        return codes
+
+    def _unpriced_row(self):
+        """Units per US dollar when nothing is stored: known for the dollar only"""
+        return np.where(self._index == PIVOT_CURRENCY, 1.0, np.nan)
+
+    def per_usd(self, at=None):
+        """Units per US dollar of every currency, latest (with live ticks) or as of a date.
+
+        Currencies without a stored close or live tick are NaN, never 1.0.
+        """
+        matrix = self.matrix()
+        if matrix.empty:
+            rates = self._unpriced_row()
+        else:
+            row = len(matrix) - 1 if at is None else max(
+                int(np.searchsorted(matrix.index.values, np.datetime64(pd.Timestamp(at)), side="right")) - 1, 0)
+            rates = matrix.to_numpy()[row].copy()
+        if at is None:
+            with self._lock:
+                for currency, rate in self._live.items():
+                    rates[self.currencies.index(currency)] = rate
+        return rates
+
+    def rates(self, to, at=None):
+        """Multiplier from each currency into ``to``; NaN where either side has no rate"""
+        per_usd = self.per_usd(at)
+        target = self.codes([to])[0]
+        rates = per_usd[target] / per_usd
+        rates[target] = 1.0
+        return rates
+
+    def convert(self, amounts, currencies, to, at=None):
+        """Convert amounts in their own currencies into ``to`` in one vectorized multiply"""
+        return np.asarray(amounts, dtype=float) * self.rates(to, at)[self.codes(currencies)]
+
+    def convert_history(self, frame, currencies, to):
+        """Convert a date x column frame of amounts, column i in currencies[i], at each date's rates.
+
+        Columns in a currency without rates come out NaN.
+        """
+        matrix = self.matrix()
+        if matrix.empty:
+            per_usd = np.tile(self._unpriced_row(), (len(frame), 1))
+        else:
+            per_usd = matrix.reindex(matrix.index.union(frame.index)).ffill().bfill().reindex(frame.index).to_numpy()
+        multipliers = per_usd[:, [self.codes([to])[0]]] / per_usd[:, self.codes(currencies)]
+        multipliers[:, np.asarray(currencies) == to] = 1.0
+        return frame * multipliers
+
+
+def get_fx_service():
+    """Return the process-wide FX service, reading rates from the shared price store"""
+    global _shared_service
+    with _shared_service_lock:
+        if _shared_service is None:
+            _shared_service = FXService()
+        return _shared_service
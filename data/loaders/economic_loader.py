@@ -0,0 +1,335 @@
+# data/loaders/economic_loader.py - Macro series with release times and point-in-time alignment to prices
+import io
+import os
+import zlib
+import threading
+import numpy as np
+import pandas as pd
+import requests
+from config import HEADERS, PROCESSED_DATA_DIR
+from data.price_store import PriceStore, get_price_store
+
+MACRO_STORE_DIR = os.path.join(PROCESSED_DATA_DIR, "macro")
+MACRO_SAMPLE_DIR = os.path.join(PROCESSED_DATA_DIR, "macro_sample")   # Kept apart so samples never enter real history
+MACRO_FIELDS = ["Value", "Period"]
+
+FRED_URL = "https://fred.stlouisfed.org/graph/fredgraph.csv?id={id}"
+EVDS_URL = "https://evds2.tcmb.gov.tr/service/evds/series={id}&startDate=01-01-2000&endDate={end}&type=json"
+REQUEST_TIMEOUT = 30
+
+# A daily bar is treated as known at this time (UTC) of its date; only releases
+# strictly before it are joined onto the bar
+BAR_CLOSE = pd.Timedelta(hours=21)
+
+# Name, source, series id at the source, frequency ("D" or "M"), unit, and the
+# delay from the end of an observation period to its release (UTC)
+MACRO_SERIES = {
+    "FED_RATE": {"name": "Fed funds target", "source": "fred", "id": "DFEDTARU", "frequency": "D",
+                 "unit": "%", "lag": "1 days"},
+    "US_CPI": {"name": "US CPI", "source": "fred", "id": "CPIAUCSL", "frequency": "M",
+               "unit": "index", "lag": "13 days 12:30:00"},
+    "TCMB_RATE": {"name": "TCMB funding rate", "source": "evds", "id": "TP.APIFON4", "frequency": "D",
+                  "unit": "%", "lag": "1 days"},
+    "TR_CPI": {"name": "TR CPI", "source": "evds", "id": "TP.FG.J0", "frequency": "M",
+               "unit": "index", "lag": "3 days 07:00:00"},
+    "USDTRY": {"name": "USD/TRY", "source": "yahoo_finance", "id": "TRY=X", "frequency": "D",
+               "unit": "fx", "lag": "1 days"},
+    "EURUSD": {"name": "EUR/USD", "source": "yahoo_finance", "id": "EURUSD=X", "frequency": "D",
+               "unit": "fx", "lag": "1 days"}
+}
+
+# Starting level, daily drift and daily volatility of the sample series used in development mode
+SAMPLE_SERIES = {"FED_RATE": (5.25, 0.0, 0.0), "US_CPI": (300.0, 0.0001, 0.0005), "TCMB_RATE": (45.0, 0.0, 0.0),
+                 "TR_CPI": (1800.0, 0.0015, 0.002), "USDTRY": (30.0, 0.0008, 0.004), "EURUSD": (1.08, 0.0, 0.004)}
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def release_times(periods, spec):
+    """First release time of each observation period of a series"""
+    periods = pd.DatetimeIndex(periods)
+    period_end = periods + pd.offsets.MonthEnd(0) if spec["frequency"] == "M" else periods
+    return period_end.normalize() + pd.Timedelta(spec["lag"])
+
+
+def _frontier(periods):
+    """Row of the newest period known after each release, preferring its latest vintage.
+
+    Rows are in release order; a revision of an older period does not move the
+    answer back to that period, a revision of the newest one does.
+    """
+    newest = np.maximum.accumulate(periods)
+    rows = np.where(periods == newest, np.arange(len(periods)), -1)
+    return np.maximum.accumulate(rows)
+
+
+class MacroStore:
+    """Macro releases kept in the columnar price store layout, one key per series.
+
+    Rows are keyed by release time, so a value only becomes visible from the
+    moment it was published. Later revisions of a period are added as new
+    rows at the time they were first seen instead of overwriting the first
+    print. Lookups at many times for many series cost one binary search per
+    series, with no per-ticker or per-date loop.
+    """
+
+    def __init__(self, root=MACRO_STORE_DIR, sample=False):
+        self.store = PriceStore(root, fields=MACRO_FIELDS, normalize=False)
+        self.sample = sample    # Holds generated series rather than real releases
+        self._arrays = {}
+        self._lock = threading.Lock()
+
+    def keys(self):
+        return self.store.symbols()
+
+    def has(self, key):
+        return self.store.has(key)
+
+    def series(self, key):
+        """All releases of a series: Value and Period indexed by release time"""
+        return self.store.read(key, mmap=False).rename_axis("Released")
+
+    def write(self, key, observations, seen_at=None):
+        """Store observations of a series.
+
+        Args:
+            key (str): Series key, e.g. "US_CPI"
+            observations (DataFrame): Value and Period columns, with a Released
+                column where the source gives release times
+            seen_at (Timestamp): When the observations were fetched; revised
+                values of periods already stored are released at this time
+
+        Returns:
+            int: Rows added
+        """
+        spec = MACRO_SERIES.get(key, {"frequency": "D", "lag": "0 days"})
+        observations = observations.dropna(subset=["Value"])
+        released = observations["Released"] if "Released" in observations else \
+            release_times(observations["Period"], spec)
+        frame = pd.DataFrame({"Value": observations["Value"].to_numpy(dtype=float),
+                              "Period": pd.DatetimeIndex(observations["Period"])},
+                             index=pd.DatetimeIndex(released))
+
+        if self.has(key):
+            stored = self.series(key)
+            latest = stored.groupby("Period")["Value"].last()
+            known = frame["Period"].map(latest)
+            revised = (known.notna() & ~np.isclose(frame["Value"], known)).to_numpy()
+            if revised.any():
+                # Rows are keyed by release time, so revisions seen together are a nanosecond apart
+                seen_at = pd.Timestamp(seen_at) if seen_at is not None else pd.Timestamp.now("UTC").tz_localize(None)
+                index = frame.index.to_numpy().copy()
+                index[revised] = seen_at.to_datetime64() + np.arange(revised.sum()).astype("timedelta64[ns]")
+                frame.index = pd.DatetimeIndex(index)
+            frame = frame[known.isna().to_numpy() | revised]
+        if frame.empty:
+            return 0
+        self.store.write(key, frame.sort_index())
+        return len(frame)
+
+    def _load(self, key):
+        """Release times, values and frontier rows of a series, cached per store version"""
+        version = self.store.version(key)
+        with self._lock:
+            cached = self._arrays.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        released = np.asarray(self.store.column(key, "Date", mmap=False))
+        periods = np.asarray(self.store.column(key, "Period", mmap=False)).astype("int64")
+        arrays = (released, np.asarray(self.store.column(key, "Value", mmap=False)), _frontier(periods))
+        with self._lock:
+            self._arrays[key] = (version, arrays)
+        return arrays
+
+    def asof(self, keys, times):
+        """Values of several series as known strictly before each time.
+
+        Args:
+            keys (list): Series keys
+            times (array-like): datetime64 times, in any order
+
+        Returns:
+            ndarray: len(times) x len(keys), NaN where nothing was released yet
+        """
+        times = np.asarray(times, dtype="datetime64[ns]")
+        values = np.full((len(times), len(keys)), np.nan)
+        for column, key in enumerate(keys):
+            if not self.has(key):
+                continue
+            released, series, frontier = self._load(key)
+            position = np.searchsorted(released, times, side="left") - 1
+            known = position >= 0
+            values[known, column] = series[frontier[position[known]]]
+        return values
+
+    def latest(self, key, now=None):
+        """Newest value of a series released by ``now``, with its period, release time and the period before's value"""
+        if not self.has(key):
+            return None
+        released, series, frontier = self._load(key)
+        now = pd.Timestamp(now) if now is not None else pd.Timestamp.now("UTC").tz_localize(None)
+        position = np.searchsorted(released, now.to_datetime64(), side="right") - 1
+        if position < 0:
+            return None
+        periods = np.asarray(self.store.column(key, "Period"))
+        row = frontier[position]
+        earlier = np.nonzero(periods[:position + 1] < periods[row])[0]
+        if len(earlier):
+            # Latest vintage of the newest earlier period
+            newest = periods[earlier].max()
+            previous = series[earlier[periods[earlier] == newest][-1]]
+        else:
+            previous = np.nan
+        return {"key": key, "value": float(series[row]), "previous": float(previous),
+                "period": pd.Timestamp(periods[row]), "released": pd.Timestamp(released[row])}
+
+
+def asof_join(frame, keys, macro=None, on="Date", bar_close=BAR_CLOSE):
+    """Add macro columns to a long frame of dated rows, without look-ahead.
+
+    Each row gets the value of every series as known strictly before its
+    bar close, in a single vectorized lookup per series whatever the number
+    of tickers or dates in the frame.
+    """
+    macro = macro if macro is not None else get_macro_store()
+    times = pd.DatetimeIndex(frame[on]).tz_localize(None).to_numpy(dtype="datetime64[ns]") + bar_close.to_timedelta64()
+    values = macro.asof(keys, times)
+    return frame.assign(**{key: values[:, column] for column, key in enumerate(keys)})
+
+
+def build_factor_panel(symbols, keys, store=None, macro=None, start=None, end=None, bar_close=BAR_CLOSE):
+    """Long panel of Date, Symbol, Close, Return and one column per macro series.
+
+    Macro values are looked up once per trading date and broadcast to every
+    ticker trading that day, so the cost is one pass over the panel.
+    """
+    store = store if store is not None else get_price_store()
+    closes = store.panel(symbols, "Close", start=start, end=end)
+    returns = closes.pct_change(fill_method=None)
+    dates = closes.index.to_numpy(dtype="datetime64[ns]")
+    macro_values = (macro if macro is not None else get_macro_store()).asof(keys, dates + bar_close.to_timedelta64())
+
+    date_rows, symbol_columns = np.nonzero(closes.notna().to_numpy())
+    panel = pd.DataFrame({
+        "Date": dates[date_rows],
+        "Symbol": closes.columns.to_numpy()[symbol_columns],
+        "Close": closes.to_numpy()[date_rows, symbol_columns],
+        "Return": returns.to_numpy()[date_rows, symbol_columns]
+    })
+    for column, key in enumerate(keys):
+        panel[key] = macro_values[date_rows, column]
+    return panel
+
+
+def _fetch_fred(spec):
+    response = requests.get(FRED_URL.format(id=spec["id"]), headers=HEADERS, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    data = pd.read_csv(io.StringIO(response.text))
+    return pd.DataFrame({"Period": pd.to_datetime(data.iloc[:, 0]),
+                         "Value": pd.to_numeric(data.iloc[:, 1], errors="coerce")})
+
+
+def _fetch_evds(spec):
+    from config import EVDS_API_KEY
+
+    if not EVDS_API_KEY:
+        raise ValueError("EVDS_API_KEY is not set")
+    url = EVDS_URL.format(id=spec["id"], end=pd.Timestamp.today().strftime("%d-%m-%Y"))
+    response = requests.get(url, headers={**HEADERS, "key": EVDS_API_KEY}, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    items = pd.DataFrame(response.json()["items"])
+    column = spec["id"].replace(".", "_")
+    periods = pd.to_datetime(items["Tarih"], format="%Y-%m" if spec["frequency"] == "M" else "%d-%m-%Y")
+    return pd.DataFrame({"Period": periods, "Value": pd.to_numeric(items[column], errors="coerce")})
+
+
+def _fetch_yahoo(spec):
+    from data.loaders.yahoo_finance_loader import YahooFinanceLoader
+
+    history = YahooFinanceLoader().get_historical_prices(spec["id"], period="max")
+    if history is None or history.empty:
+        raise ValueError(f"no history for {spec['id']}")
+    return pd.DataFrame({"Period": history.index.tz_localize(None).normalize(), "Value": history["Close"].to_numpy()})
+
+
+FETCHERS = {"fred": _fetch_fred, "evds": _fetch_evds, "yahoo_finance": _fetch_yahoo}
+
+
+def update_series(keys=None, macro=None):
+    """Fetch series from their sources and store new releases and revisions.
+
+    Returns:
+        dict: Rows added per series; series that failed to download are left out
+    """
+    macro = macro if macro is not None else MacroStore()
+    seen_at = pd.Timestamp.now("UTC").tz_localize(None)
+    added = {}
+    for key in keys or MACRO_SERIES:
+        spec = MACRO_SERIES[key]
+        try:
+            added[key] = macro.write(key, FETCHERS[spec["source"]](spec), seen_at=seen_at)
+        except Exception as e:
+            print(f"Error fetching {key} from {spec['source']}: {e}")
+    return added
+
+
+def generate_sample_series(key, start, end, seed=None):
+    """Random-walk observations of a series for development and tests"""
+    spec = MACRO_SERIES[key]
+    level, drift, volatility = SAMPLE_SERIES[key]
+    rng = np.random.default_rng(seed if seed is not None else zlib.crc32(key.encode()))
+    periods = pd.date_range(start, end, freq="MS" if spec["frequency"] == "M" else "B")
+    steps = len(periods)
+    if spec["unit"] == "%":
+        # Policy rates move in occasional 25 bp steps
+        moves = rng.choice([-0.25, 0.0, 0.25], size=steps, p=[0.01, 0.98, 0.01])
+        values = np.maximum(level + np.cumsum(moves), 0.0)
+    else:
+        daily = 21 if spec["frequency"] == "M" else 1
+        values = level * np.exp(np.cumsum(rng.standard_normal(steps) * volatility * np.sqrt(daily) + drift * daily))
+    return pd.DataFrame({"Period": periods, "Value": values})
+
+
+def format_release(release):
+    """Short text for a release, e.g. "US CPI +0.3% m/m (Mar 2024)" or "USD/TRY 32.4100" """
+    spec = MACRO_SERIES.get(release["key"], {"name": release["key"], "unit": "", "frequency": "D"})
+    if spec["unit"] == "%":
+        text = f"{spec['name']} {release['value']:.2f}%"
+    elif spec["unit"] == "index" and np.isfinite(release["previous"]) and release["previous"]:
+        text = f"{spec['name']} {(release['value'] / release['previous'] - 1) * 100:+.1f}% m/m"
+    else:
+        text = f"{spec['name']} {release['value']:.4f}"
+    return f"{text} ({release['period'].strftime('%b %Y' if spec['frequency'] == 'M' else '%b %d')})"
+
+
+def get_macro_store():
+    """Return the process-wide macro store.
+
+    In development mode (DEBUG), until real series have been loaded, this is
+    a separate store of sample series covering the sample price history; its
+    ``sample`` flag is set so pages can label it. The real store is never
+    seeded.
+    """
+    from config import DEBUG
+
+    global _shared_store
+    with _shared_store_lock:
+        # A sample store gives way as soon as real series appear
+        if _shared_store is None or _shared_store.sample:
+            real = MacroStore()
+            if real.keys() or not DEBUG:
+                _shared_store = real
+            elif _shared_store is None:
+                sample = MacroStore(MACRO_SAMPLE_DIR, sample=True)
+                if not sample.keys():
+                    end = pd.Timestamp.today().normalize()
+                    for key in MACRO_SERIES:
+                        sample.write(key, generate_sample_series(key, end - pd.DateOffset(years=3), end))
+                _shared_store = sample
+        return _shared_store
+
+
+if __name__ == "__main__":
+    for key, rows in update_series().items():
+        print(f"{key}: {rows} new releases")
@@ -1,5 +1,5 @@
 import finnhub as fb
-from base_stock_loader import BaseStockLoader
+from data.loaders.base_stock_loader import BaseStockLoader
 import time
 from config import FINNHUB_API_KEY
 
@@ -0,0 +1,19 @@
+# data/loaders/news_loader.py - Streams scraped news articles and KAP disclosures
+from data.document_store import DocumentStore
+
+def iter_news(store=None):
+    """Yield stored news articles one at a time"""
+    store = store if store is not None else DocumentStore()
+    yield from store.iter_documents("news")
+
+def iter_disclosures(store=None):
+    """Yield stored KAP disclosures one at a time"""
+    store = store if store is not None else DocumentStore()
+    yield from store.iter_documents("disclosure")
+
+def iter_corpus(store=None):
+    """Yield every news article and disclosure in a single pass over the store"""
+    store = store if store is not None else DocumentStore()
+    for document in store.iter_documents():
+        if document.get("kind") in ("news", "disclosure"):
+            yield document
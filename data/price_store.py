@@ -0,0 +1,225 @@
+# data/price_store.py - Columnar on-disk store for daily price history
+import os
+import shutil
+import tempfile
+import threading
+import zlib
+from urllib.parse import quote, unquote
+import numpy as np
+import pandas as pd
+from config import PROCESSED_DATA_DIR
+from data.cache import shared_cache
+
+PRICE_STORE_DIR = os.path.join(PROCESSED_DATA_DIR, "prices")
+PRICE_SAMPLE_DIR = os.path.join(PROCESSED_DATA_DIR, "prices_sample")   # Never mixed with real history
+PRICE_FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+# Starting prices for the sample history used in development mode
+SAMPLE_BASE_PRICES = {'AAPL': 178, 'MSFT': 338, 'GOOGL': 2820, 'AMZN': 176, 'META': 321}
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+class PriceStore:
+    """Daily OHLCV history stored column by column as ``.npy`` files.
+
+    Each symbol gets its own directory holding one file per field plus the dates,
+    so a single column can be memory-mapped without reading the rest of the
+    history. Writes replace the whole symbol directory atomically. Other
+    dated series (e.g. macro releases) reuse the layout with their own
+    ``fields``; ``normalize=False`` keeps intraday timestamps as the key.
+    """
+
+    def __init__(self, root=PRICE_STORE_DIR, fields=PRICE_FIELDS, normalize=True, sample=False):
+        self.root = root
+        self.sample = sample    # Holds generated history rather than loaded prices
+        self.fields = fields
+        self.normalize = normalize
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, symbol):
+        return os.path.join(self.root, quote(symbol, safe=""))
+
+    def symbols(self):
+        """Return every symbol with stored history"""
+        return sorted(unquote(name) for name in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, name)) and not name.startswith("."))
+
+    def has(self, symbol):
+        return os.path.exists(os.path.join(self._path(symbol), "Date.npy"))
+
+    def version(self, symbol):
+        """Return a token that changes whenever the symbol's history is rewritten"""
+        try:
+            # Every write creates new files, so the inode changes even within one clock tick
+            stat = os.stat(os.path.join(self._path(symbol), "Date.npy"))
+            return stat.st_mtime_ns, stat.st_ino
+        except OSError:
+            return None
+
+    def store_version(self):
+        """Return a token that changes whenever any symbol's history is written"""
+        try:
+            # Every write renames a directory into the root, which touches its mtime
+            return os.stat(self.root).st_mtime_ns
+        except OSError:
+            return None
+
+    def write(self, symbol, frame):
+        """Merge a DataFrame of daily bars indexed by date into the stored history.
+
+        Rows for dates that are already stored are replaced by the new values.
+        """
+        frame = frame[[field for field in self.fields if field in frame]].copy()
+        frame.index = pd.to_datetime(frame.index).tz_localize(None)
+        if self.normalize:
+            frame.index = frame.index.normalize()
+
+        with self._lock:
+            if self.has(symbol):
+                existing = self.read(symbol, mmap=False)
+                frame = pd.concat([existing[~existing.index.isin(frame.index)], frame])
+            frame = frame[~frame.index.duplicated(keep="last")].sort_index()
+
+            staging = tempfile.mkdtemp(dir=self.root, prefix=".tmp-")
+            np.save(os.path.join(staging, "Date.npy"), frame.index.to_numpy(dtype="datetime64[ns]"))
+            for field in frame.columns:
+                dtype = "datetime64[ns]" if pd.api.types.is_datetime64_any_dtype(frame[field]) else float
+                np.save(os.path.join(staging, f"{field}.npy"), frame[field].to_numpy(dtype=dtype))
+
+            target = self._path(symbol)
+            if os.path.exists(target):
+                retired = target + ".old"
+                os.replace(target, retired)
+                os.replace(staging, target)
+                shutil.rmtree(retired, ignore_errors=True)
+            else:
+                os.replace(staging, target)
+
+        # Drop page computations derived from the old history in this process
+        shared_cache.invalidate(f"prices:{symbol}")
+
+    def column(self, symbol, field, mmap=True):
+        """Return one stored column as a (memory-mapped) array"""
+        path = os.path.join(self._path(symbol), f"{field}.npy")
+        return np.load(path, mmap_mode="r" if mmap else None)
+
+    def read(self, symbol, start=None, end=None, fields=None, mmap=True):
+        """Read stored bars for a symbol as a DataFrame indexed by date"""
+        dates = self.column(symbol, "Date", mmap=mmap)
+        lo, hi = self._date_range(dates, start, end)
+        fields = fields or [field for field in self.fields
+                            if os.path.exists(os.path.join(self._path(symbol), f"{field}.npy"))]
+        data = {field: np.asarray(self.column(symbol, field, mmap=mmap)[lo:hi]) for field in fields}
+        return pd.DataFrame(data, index=pd.DatetimeIndex(np.asarray(dates[lo:hi]), name="Date"))
+
+    def panel(self, symbols, field="Close", start=None, end=None):
+        """Return one field for many symbols as a date x symbol DataFrame"""
+        series = {}
+        for symbol in symbols:
+            if self.has(symbol):
+                dates = self.column(symbol, "Date")
+                lo, hi = self._date_range(dates, start, end)
+                series[symbol] = pd.Series(np.asarray(self.column(symbol, field)[lo:hi]),
+                                           index=pd.DatetimeIndex(np.asarray(dates[lo:hi])))
+        if not series:
+            return pd.DataFrame(columns=list(symbols), dtype=float)
+        return pd.DataFrame(series).sort_index().reindex(columns=list(symbols))
+
+    def latest(self, symbols, lookback=20):
+        """Return the last close, previous close, last volume and average volume per symbol.
+
+        Only the tail of each memory-mapped column is touched.
+        """
+        rows = []
+        for symbol in symbols:
+            if not self.has(symbol):
+                continue
+            close = self.column(symbol, "Close")
+            if len(close) == 0:
+                continue
+            volume = self.column(symbol, "Volume") if os.path.exists(
+                os.path.join(self._path(symbol), "Volume.npy")) else np.zeros(len(close))
+            tail_volume = np.asarray(volume[-lookback - 1:-1] if len(volume) > 1 else volume[-1:])
+            rows.append({
+                "Symbol": symbol,
+                "Date": pd.Timestamp(self.column(symbol, "Date")[-1]),
+                "Close": float(close[-1]),
+                "Prev Close": float(close[-2]) if len(close) > 1 else float(close[-1]),
+                "Volume": float(volume[-1]),
+                "Avg Volume": float(tail_volume.mean()) if len(tail_volume) else 0.0
+            })
+        return pd.DataFrame(rows, columns=["Symbol", "Date", "Close", "Prev Close", "Volume", "Avg Volume"]).set_index("Symbol")
+
+    @staticmethod
+    def _date_range(dates, start, end):
+        lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side="left"))
+        hi = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), side="right"))
+        return lo, hi
+
+
+def generate_sample_history(symbol, dates, base_price=None, volatility=25.0, seed=None):
+    """Generate a random-walk OHLCV history for development and tests"""
+    base_price = base_price or SAMPLE_BASE_PRICES.get(symbol, 100)
+    rng = np.random.default_rng(seed if seed is not None else zlib.crc32(symbol.encode()))
+    daily_vol = volatility / 100 / np.sqrt(252)
+
+    returns = rng.standard_normal(len(dates)) * daily_vol + 0.0002
+    close = base_price * np.exp(np.cumsum(returns))
+    open_ = np.concatenate([[base_price], close[:-1]]) * (1 + rng.standard_normal(len(dates)) * daily_vol / 5)
+    high = np.maximum(open_, close) * (1 + np.abs(rng.standard_normal(len(dates))) * daily_vol / 2)
+    low = np.minimum(open_, close) * (1 - np.abs(rng.standard_normal(len(dates))) * daily_vol / 2)
+    volume = rng.lognormal(mean=15, sigma=0.4, size=len(dates)).round()
+
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+                        index=pd.DatetimeIndex(dates, name="Date"))
+
+
+def seed_sample_history(store, symbols, base_prices=None, volatilities=None, years=2):
+    """Fill the store with sample history for symbols that have none yet"""
+    base_prices = base_prices or {}
+    volatilities = volatilities or {}
+    end = pd.Timestamp.today().normalize()
+    dates = pd.bdate_range(end=end, periods=252 * years)
+    for symbol in symbols:
+        if not store.has(symbol):
+            store.write(symbol, generate_sample_history(
+                symbol, dates, base_prices.get(symbol), volatilities.get(symbol, 25.0)))
+
+
+def seed_development_history(store):
+    """Fill a store with sample history for the universe, the market indices and the FX pairs"""
+    from analysis.market_overview import MARKET_INDICES
+    from data.fx import FX_SYMBOLS, SAMPLE_RATES, SAMPLE_VOLATILITIES
+    from data.universe import load_universe
+
+    universe = load_universe()
+    seed_sample_history(store, list(FX_SYMBOLS.values()), base_prices=SAMPLE_RATES, volatilities=SAMPLE_VOLATILITIES)
+    seed_sample_history(store, universe['Symbol'], volatilities=dict(zip(universe['Symbol'], universe['Volatility'])))
+    seed_sample_history(store, [symbol for _, symbol, _ in MARKET_INDICES],
+                        base_prices={symbol: level for _, symbol, level in MARKET_INDICES},
+                        volatilities={"^VIX": 80.0})
+
+
+def get_price_store():
+    """Return the process-wide price store that pages and services read.
+
+    This is the store of real history. In development mode (DEBUG), while it
+    is still empty, a separate store of sample history is used instead,
+    flagged ``sample`` so pages can label it; sample prices never enter the
+    real store. The choice is made once per process, so every service reads
+    the same history.
+    """
+    from config import DEBUG
+
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            store = PriceStore()
+            if DEBUG and not store.symbols():
+                store = PriceStore(PRICE_SAMPLE_DIR, sample=True)
+                seed_development_history(store)
+            _shared_store = store
+        return _shared_store
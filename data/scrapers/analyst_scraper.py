@@ -0,0 +1,130 @@
+# data/scrapers/analyst_scraper.py - Ingestion of analyst ratings and price targets
+import os
+import csv
+import json
+from datetime import date, datetime
+from config import RAW_DATA_DIR
+from data.analyst_ratings import AnalystRatingsStore
+from data.scrapers.kap_scraper import PUBLISH_DATE_FORMATS
+from data.symbol_search import fold
+
+ANALYST_DIR = os.path.join(RAW_DATA_DIR, "analyst")
+RATING_DATE_FORMATS = PUBLISH_DATE_FORMATS + ["%d.%m.%Y", "%d/%m/%Y", "%Y-%m-%d"]
+
+# Broker rating labels, English and Turkish, folded to lower case
+RATING_LABELS = {
+    "Buy": ["buy", "strong buy", "outperform", "overweight", "accumulate", "add", "positive",
+            "al", "guclu al", "endeks uzeri", "endeksin uzerinde getiri", "ekle", "olumlu"],
+    "Hold": ["hold", "neutral", "market perform", "equal weight", "equal-weight", "sector perform", "in line",
+             "tut", "notr", "endekse paralel", "endeksle paralel getiri", "piyasa performansi"],
+    "Sell": ["sell", "strong sell", "underperform", "underweight", "reduce", "negative",
+             "sat", "azalt", "endeks alti", "endeksin altinda getiri", "olumsuz"]
+}
+_LABELS = {label: rating for rating, labels in RATING_LABELS.items() for label in labels}
+
+
+def normalize_rating(label):
+    """Map a broker's rating label to "Buy", "Hold" or "Sell", or None if it is unknown"""
+    return _LABELS.get(" ".join(fold(str(label or "")).lower().split()))
+
+
+def parse_rating_date(value):
+    """ISO date of a rating, or None if the value is in no known format"""
+    text = str(value).strip()
+    for date_format in RATING_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date().isoformat()
+        except ValueError:
+            continue
+    try:
+        return date.fromisoformat(text[:10]).isoformat()
+    except ValueError:
+        return None
+
+
+def parse_target(value):
+    """Price target as a float; accepts "1.234,50" style Turkish and "1,234.50" style English numbers"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().replace("TL", "").replace("$", "").replace("₺", "").strip()
+    if text.rfind(",") > text.rfind("."):
+        # The comma is the decimal separator
+        text = text.replace(".", "").replace(",", ".")
+    else:
+        text = text.replace(",", "")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_rating(item):
+    """Normalize one rating record, or return None if it lacks a symbol, firm, readable date or known rating.
+
+    Field names of the common feeds are accepted: symbol/ticker/hisse,
+    firm/broker/kurum, date/rated_at/tarih, rating/recommendation/tavsiye
+    and target/price_target/hedef_fiyat.
+    """
+    def first(*keys):
+        for key in keys:
+            if item.get(key) not in (None, ""):
+                return item[key]
+        return None
+
+    symbol = first("symbol", "ticker", "hisse")
+    firm = first("firm", "broker", "kurum")
+    rated_at = first("rated_at", "date", "tarih")
+    rating = normalize_rating(first("rating", "recommendation", "tavsiye"))
+    rated_at = parse_rating_date(rated_at) if rated_at else None
+    if not (symbol and firm and rated_at and rating):
+        return None
+    return {
+        "symbol": str(symbol).strip().upper().split(".")[0],
+        "firm": str(firm).strip(),
+        "rated_at": rated_at,
+        "rating": rating,
+        "target": parse_target(first("target", "price_target", "hedef_fiyat")),
+        "source": item.get("source") or "file"
+    }
+
+
+def read_rating_files(directory=ANALYST_DIR):
+    """Yield the raw records of every CSV and JSON lines file in a directory"""
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        try:
+            with open(path, encoding="utf-8") as f:
+                if name.endswith(".csv"):
+                    yield from csv.DictReader(f)
+                elif name.endswith(".jsonl"):
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+        except (OSError, ValueError) as e:
+            print(f"Error reading analyst ratings from {path}: {e}")
+
+
+def ingest_ratings(records, store=None):
+    """Normalize records and add them to the ratings store.
+
+    Returns:
+        tuple: (new ratings, records skipped as unparseable)
+    """
+    store = store if store is not None else AnalystRatingsStore()
+    ratings, skipped = [], 0
+    for record in records:
+        rating = parse_rating(record)
+        if rating is None:
+            skipped += 1
+        else:
+            ratings.append(rating)
+    return store.add_ratings(ratings), skipped
+
+
+if __name__ == "__main__":
+    added, skipped = ingest_ratings(read_rating_files())
+    print(f"Added {added} analyst ratings ({skipped} records skipped)")
@@ -0,0 +1,251 @@
+# data/scrapers/kap_scraper.py - Incremental ingestion of KAP (Public Disclosure Platform) filings
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+import requests
+from bs4 import BeautifulSoup
+from config import HEADERS, RAW_DATA_DIR
+from data.document_store import DocumentStore
+from data.scrapers.news_scraper import HostLimiter
+
+KAP_BASE_URL = "https://www.kap.org.tr"
+DISCLOSURES_PATH = "/tr/api/disclosures"          # Disclosures after ?afterDisclosureIndex=<n>
+DISCLOSURE_PAGE_PATH = "/tr/Bildirim/{index}"
+CONTENT_SELECTOR = ".disclosureContent"
+ATTACHMENT_SELECTOR = 'a[href*="/api/file/download"]'
+
+KAP_DIR = os.path.join(RAW_DATA_DIR, "kap")
+
+MAX_WORKERS = 4
+REQUEST_TIMEOUT = 30
+CURSOR_SAVE_EVERY = 20  # Records stored between cursor checkpoints
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+PUBLISH_DATE_FORMATS = ["%d.%m.%y %H:%M:%S", "%d.%m.%y %H:%M", "%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M", "%Y-%m-%dT%H:%M:%S"]
+
+
+def parse_publish_date(value):
+    """Convert a KAP publish date to ISO format, keeping unknown formats unchanged"""
+    for date_format in PUBLISH_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).isoformat()
+        except (TypeError, ValueError):
+            continue
+    return value
+
+
+def parse_disclosure(item):
+    """Normalize one item of the disclosure list API.
+
+    The API nests the fields under "basic"; flat items are accepted as well.
+    """
+    basic = item.get("basic", item)
+    codes = basic.get("stockCodes") or ""
+    return {
+        "index": int(basic["disclosureIndex"]),
+        "title": basic.get("title") or "",
+        "summary": basic.get("summary") or "",
+        "company": basic.get("companyName") or basic.get("companyTitle") or "",
+        "symbols": [code.strip() for code in codes.split(",") if code.strip()],
+        "category": basic.get("disclosureClass") or "",
+        "published": parse_publish_date(basic.get("publishDate"))
+    }
+
+
+def ordered_map(executor, func, items, window):
+    """Like executor.map, but never more than ``window`` results ahead of the consumer.
+
+    Items are pulled from the iterable lazily and results are yielded in input
+    order, so memory stays bounded however many items there are.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class KapScraper:
+    """Ingests KAP disclosures published after a persisted cursor.
+
+    The disclosure list is paged from the cursor onwards. Each disclosure's page
+    is fetched on a bounded thread pool and its attachments are downloaded
+    together on a second one, every request under the per-host limiter; parsed
+    records are streamed into the document store in disclosure order. The cursor only
+    advances past records that were stored, and the store ignores ids it
+    already holds, so an interrupted run can simply be started again.
+    """
+
+    def __init__(self, base_url=KAP_BASE_URL, data_dir=KAP_DIR, store=None, max_workers=MAX_WORKERS,
+                 limiter=None, fetch_attachments=True, timeout=REQUEST_TIMEOUT):
+        self.base_url = base_url
+        self.store = store if store is not None else DocumentStore()
+        self.max_workers = max_workers
+        self.limiter = limiter or HostLimiter(concurrency=max_workers)
+        self.fetch_attachments = fetch_attachments
+        self.timeout = timeout
+        self.cursor_path = os.path.join(data_dir, "cursor.json")
+        self.attachments_dir = os.path.join(data_dir, "attachments")
+        os.makedirs(self.attachments_dir, exist_ok=True)
+
+        self.cursor = self._load_cursor()
+        self.stats = {}
+        self._local = threading.local()
+        self._attachment_pool = None
+
+    def _load_cursor(self):
+        cursor = {"last_index": 0, "last_published": None, "updated_at": None}
+        if os.path.exists(self.cursor_path):
+            with open(self.cursor_path, encoding="utf-8") as f:
+                cursor.update(json.load(f))
+        return cursor
+
+    def _save_cursor(self):
+        self.cursor["updated_at"] = time.time()
+        temp_path = self.cursor_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.cursor, f)
+        os.replace(temp_path, self.cursor_path)
+
+    def _get(self, url, **kwargs):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update(HEADERS)
+        with self.limiter.slot(url):
+            response = session.get(url, timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def fetch_disclosures(self, after_index):
+        """Return the disclosures listed after an index, oldest first"""
+        response = self._get(urljoin(self.base_url, DISCLOSURES_PATH), params={"afterDisclosureIndex": after_index})
+        self.stats["list_requests"] = self.stats.get("list_requests", 0) + 1
+        disclosures = [parse_disclosure(item) for item in response.json()]
+        return sorted((d for d in disclosures if d["index"] > after_index), key=lambda d: d["index"])
+
+    def iter_new_disclosures(self):
+        """Page through every disclosure after the cursor, one list request at a time"""
+        after_index = self.cursor["last_index"]
+        while True:
+            batch = self.fetch_disclosures(after_index)
+            if not batch:
+                return
+            yield from batch
+            after_index = batch[-1]["index"]
+
+    def fetch_record(self, disclosure):
+        """Fetch a disclosure's page and attachments and build its document"""
+        url = urljoin(self.base_url, DISCLOSURE_PAGE_PATH.format(index=disclosure["index"]))
+        soup = BeautifulSoup(self._get(url).text, "html.parser")
+        for tag in soup(["script", "style"]):
+            tag.decompose()
+        content = soup.select_one(CONTENT_SELECTOR) or soup.body or soup
+        text = "\n".join(line.strip() for line in content.get_text("\n").splitlines() if line.strip())
+
+        attachments = []
+        if self.fetch_attachments:
+            links = soup.select(ATTACHMENT_SELECTOR)
+            # Outside run() there is no pool and attachments are downloaded one by one
+            pool_map = self._attachment_pool.map if self._attachment_pool is not None else map
+            attachments = list(pool_map(self._download, [disclosure["index"]] * len(links), range(len(links)),
+                                        [link.get_text(strip=True) for link in links],
+                                        [urljoin(url, link["href"]) for link in links]))
+
+        return {
+            "id": f"kap:{disclosure['index']}",
+            "kind": "disclosure",
+            "source": "KAP",
+            "url": url,
+            **disclosure,
+            "text": text,
+            "attachments": attachments,
+            "fetched_at": time.time()
+        }
+
+    def _download(self, index, n, name, url):
+        """Stream an attachment to disk, reusing a complete earlier download"""
+        path = os.path.join(self.attachments_dir, f"{index}_{n}")
+        meta_path = path + ".json"
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                return json.load(f)
+
+        digest = hashlib.sha1()
+        size = 0
+        response = self._get(url, stream=True)
+        with open(path + ".part", "wb") as f:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        os.replace(path + ".part", path)
+
+        attachment = {"name": name, "url": url, "path": path, "bytes": size, "sha1": digest.hexdigest(),
+                      "content_type": response.headers.get("Content-Type", "")}
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(attachment, f)
+        return attachment
+
+    def _try_fetch_record(self, disclosure):
+        try:
+            return disclosure, self.fetch_record(disclosure), None
+        except (requests.RequestException, OSError) as e:
+            return disclosure, None, e
+
+    def run(self):
+        """Ingest every disclosure published after the cursor.
+
+        Stops at the first disclosure that cannot be fetched, leaving the
+        cursor just before it so the next run retries from there.
+
+        Returns:
+            int: Number of new documents stored
+        """
+        self.stats = {"list_requests": 0, "fetched": 0, "stored": 0, "errors": 0}
+        since_save = 0
+        try:
+            # Record workers wait on their attachments, so those get a pool of their own
+            with ThreadPoolExecutor(max_workers=self.max_workers) as attachment_pool, \
+                    ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                self._attachment_pool = attachment_pool
+                results = ordered_map(executor, self._try_fetch_record, self.iter_new_disclosures(),
+                                      window=self.max_workers * 2)
+                for disclosure, record, error in results:
+                    if error is not None:
+                        print(f"Error fetching KAP disclosure {disclosure['index']}: {error}")
+                        self.stats["errors"] += 1
+                        break
+                    self.stats["fetched"] += 1
+                    self.stats["stored"] += self.store.add(record)
+                    self.cursor["last_index"] = disclosure["index"]
+                    self.cursor["last_published"] = disclosure["published"]
+                    since_save += 1
+                    if since_save >= CURSOR_SAVE_EVERY:
+                        self._save_cursor()
+                        since_save = 0
+                # Leaving the pool early must not wait for fetches past the failure
+                executor.shutdown(wait=False, cancel_futures=True)
+        except requests.RequestException as e:
+            print(f"Error listing KAP disclosures: {e}")
+            self.stats["errors"] += 1
+        finally:
+            self._attachment_pool = None
+            self._save_cursor()
+        return self.stats["stored"]
+
+
+if __name__ == "__main__":
+    # Run from the project root: python -m data.scrapers.kap_scraper
+    scraper = KapScraper()
+    stored = scraper.run()
+    print(f"{stored} new disclosures, cursor at {scraper.cursor['last_index']}")
+    for key, value in scraper.stats.items():
+        print(f"  {key}: {value}")
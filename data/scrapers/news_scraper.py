@@ -0,0 +1,287 @@
+# data/scrapers/news_scraper.py - Concurrent news crawler for the configured sources
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+import requests
+from bs4 import BeautifulSoup
+from config import HEADERS, NEWS_SOURCES, RAW_DATA_DIR
+from data.symbol_search import fold
+from data.document_store import DocumentStore
+
+NEWS_DIR = os.path.join(RAW_DATA_DIR, "news")
+
+MAX_WORKERS = 8
+PER_HOST_CONCURRENCY = 2
+PER_HOST_INTERVAL = 1.0  # Minimum seconds between two requests to the same host
+REQUEST_TIMEOUT = 15
+SEEN_LIMIT = 50000  # URLs and content hashes remembered across crawls
+
+DEFAULT_CONTENT_SELECTOR = "article p"
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid")
+
+
+def normalize_url(url):
+    """Canonical form of an article URL: no fragment, tracking parameters or trailing slash"""
+    parts = urlsplit(url.strip())
+    query = urlencode([(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                       if not key.lower().startswith(TRACKING_PARAMS)])
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
+
+
+def content_hash(title, text):
+    """Hash of an article's normalized title and body.
+
+    Text is folded like search keys (Turkish-aware lowercase ASCII) and stripped
+    of punctuation and extra whitespace, so the same story syndicated under
+    different URLs or layouts hashes equally.
+    """
+    normalized = " ".join(re.sub(r"[^\w\s]", " ", fold(f"{title}\n{text}")).split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def parse_listing(html, source, page_url):
+    """Extract article titles and links from a listing page with the source's CSS selectors"""
+    soup = BeautifulSoup(html, "html.parser")
+    items = []
+    for card in soup.select(source["article_selector"]):
+        link = card if card.name == "a" else card.select_one(source["url_selector"])
+        if link is None or not link.get("href"):
+            continue
+        title = card.select_one(source["title_selector"])
+        items.append({
+            "title": (title or link).get_text(" ", strip=True),
+            "url": normalize_url(urljoin(source.get("base_url") or page_url, link["href"]))
+        })
+    return items
+
+
+def parse_article(html, source):
+    """Extract the body text and publication time of an article page"""
+    soup = BeautifulSoup(html, "html.parser")
+    paragraphs = soup.select(source.get("content_selector", DEFAULT_CONTENT_SELECTOR)) or soup.select("p")
+    text = "\n".join(p.get_text(" ", strip=True) for p in paragraphs if p.get_text(strip=True))
+
+    published = soup.select_one('meta[property="article:published_time"]')
+    published = published.get("content") if published else None
+    if published is None:
+        stamp = soup.select_one("time[datetime]")
+        published = stamp["datetime"] if stamp else None
+    return {"text": text, "published": published}
+
+
+class HostLimiter:
+    """Politeness limits per host: bounded concurrency and a minimum request interval"""
+
+    def __init__(self, concurrency=PER_HOST_CONCURRENCY, interval=PER_HOST_INTERVAL):
+        self.concurrency = concurrency
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_start = {}
+
+    @contextmanager
+    def slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.Semaphore(self.concurrency))
+        with semaphore:
+            # Reserve the next start time for this host, then wait for it
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start.get(host, now))
+                self._next_start[host] = start + self.interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+class NewsScraper:
+    """Crawls the configured news sources and keeps the new, unique articles.
+
+    Listing pages and articles are fetched concurrently on a thread pool,
+    limited per host. Every response's ETag and Last-Modified are remembered
+    so the next crawl sends conditional requests: an unchanged listing answers
+    304 and none of its articles are requested again. Articles are deduplicated
+    by normalized URL and by content hash, and new ones are added to the
+    document store. Validators, seen URLs and hashes and the last crawl's
+    statistics are checkpointed to disk after every crawl.
+    """
+
+    def __init__(self, sources=None, data_dir=NEWS_DIR, store=None, max_workers=MAX_WORKERS, limiter=None,
+                 timeout=REQUEST_TIMEOUT):
+        self.sources = sources if sources is not None else NEWS_SOURCES
+        self.max_workers = max_workers
+        self.limiter = limiter or HostLimiter()
+        self.timeout = timeout
+        self.state_path = os.path.join(data_dir, "crawl_state.json")
+        self.store = store if store is not None else DocumentStore()
+        os.makedirs(data_dir, exist_ok=True)
+
+        self.state = self._load_state()
+        # Insertion-ordered so the oldest entries are forgotten first
+        self.seen_urls = dict.fromkeys(self.state["seen_urls"])
+        self.seen_hashes = dict.fromkeys(self.state["seen_hashes"])
+        self.stats = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _load_state(self):
+        state = {"validators": {}, "seen_urls": [], "seen_hashes": [], "pending": [], "last_crawl": None}
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, encoding="utf-8") as f:
+                    state.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable crawl checkpoint {self.state_path}: {e}")
+        return state
+
+    def _session(self):
+        # requests sessions are not thread-safe, so each worker keeps its own
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update(HEADERS)
+        return session
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + amount
+
+    def fetch(self, url, conditional=True):
+        """GET a page, conditionally on its stored validators for listing pages.
+
+        Returns:
+            str: Page HTML, or None when the server answered 304 Not Modified
+        """
+        validators = self.state["validators"].get(url, {}) if conditional else {}
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+        with self.limiter.slot(url):
+            response = self._session().get(url, headers=headers, timeout=self.timeout)
+        self._count("requests")
+        if response.status_code == 304:
+            self._count("not_modified")
+            return None
+        response.raise_for_status()
+        self._count("fetched")
+
+        if not conditional:
+            return response.text
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        with self._lock:
+            if etag or last_modified:
+                self.state["validators"][url] = {"etag": etag, "last_modified": last_modified}
+            else:
+                self.state["validators"].pop(url, None)
+        return response.text
+
+    def _crawl_source(self, source):
+        try:
+            html = self.fetch(source["url"])
+        except requests.RequestException as e:
+            print(f"Error fetching {source['name']} listing: {e}")
+            self._count("errors")
+            return []
+        return [] if html is None else parse_listing(html, source, source["url"])
+
+    def _fetch_article(self, task):
+        source, item = task
+        try:
+            # Articles are fetched once, so their validators are not worth keeping
+            html = self.fetch(item["url"], conditional=False)
+        except requests.RequestException as e:
+            print(f"Error fetching article {item['url']}: {e}")
+            self._count("errors")
+            return None
+        article = parse_article(html, source)
+        return {
+            "id": item["url"],
+            "kind": "news",
+            "url": item["url"],
+            "source": source["name"],
+            "title": item["title"],
+            "text": article["text"],
+            "published": article["published"],
+            "content_hash": content_hash(item["title"], article["text"]),
+            "fetched_at": time.time()
+        }
+
+    def crawl(self):
+        """Run one crawl cycle over every source.
+
+        Returns:
+            list: Articles not seen in any previous crawl
+        """
+        started = time.time()
+        self.stats = {"requests": 0, "not_modified": 0, "fetched": 0, "errors": 0,
+                      "duplicate_urls": 0, "duplicate_content": 0, "new_articles": 0}
+        sources = {source["name"]: source for source in self.sources}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            listings = list(executor.map(self._crawl_source, self.sources))
+
+            # Articles that failed last time are retried even if their listing is unchanged
+            candidates = [(sources[name], item) for name, item in self.state["pending"] if name in sources]
+            for source, items in zip(self.sources, listings):
+                candidates += [(source, item) for item in items]
+
+            tasks = []
+            queued = set()
+            for source, item in candidates:
+                if item["url"] in self.seen_urls or item["url"] in queued:
+                    self.stats["duplicate_urls"] += 1
+                    continue
+                queued.add(item["url"])
+                tasks.append((source, item))
+            fetched = list(executor.map(self._fetch_article, tasks))
+
+        new_articles = []
+        pending = []
+        for (source, item), article in zip(tasks, fetched):
+            if article is None:
+                pending.append([source["name"], item])
+                continue
+            self.seen_urls[item["url"]] = None
+            if article["content_hash"] in self.seen_hashes:
+                self.stats["duplicate_content"] += 1
+                continue
+            self.seen_hashes[article["content_hash"]] = None
+            new_articles.append(article)
+        self.stats["new_articles"] = len(new_articles)
+
+        self.store.add_many(new_articles)
+        self.state["pending"] = pending
+        self._checkpoint(started)
+        return new_articles
+
+    def _checkpoint(self, started):
+        """Atomically save validators, dedup sets and crawl statistics"""
+        self.state["seen_urls"] = list(self.seen_urls)[-SEEN_LIMIT:]
+        self.state["seen_hashes"] = list(self.seen_hashes)[-SEEN_LIMIT:]
+        self.state["last_crawl"] = {"started_at": started, "finished_at": time.time(), **self.stats}
+
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(temp_path, self.state_path)
+
+
+if __name__ == "__main__":
+    # Run from the project root: python -m data.scrapers.news_scraper
+    scraper = NewsScraper()
+    articles = scraper.crawl()
+    print(f"{len(articles)} new articles")
+    for key, value in scraper.stats.items():
+        print(f"  {key}: {value}")
@@ -0,0 +1,262 @@
+# data/symbol_search.py - Typeahead search index over symbols, company names and aliases
+import os
+import math
+import pickle
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from config import PROCESSED_DATA_DIR
+from data.universe import UNIVERSE_FILE, load_universe
+
+SEARCH_INDEX_FILE = os.path.join(PROCESSED_DATA_DIR, "search_index.pkl")
+INDEX_FORMAT_VERSION = 1
+
+# Turkish letters are folded explicitly; str.lower() turns "İ" into "i" + combining dot
+TURKISH_FOLD = str.maketrans({
+    "İ": "i", "I": "i", "ı": "i",
+    "Ş": "s", "ş": "s",
+    "Ğ": "g", "ğ": "g",
+    "Ü": "u", "ü": "u",
+    "Ö": "o", "ö": "o",
+    "Ç": "c", "ç": "c"
+})
+
+# Match kinds, best first; the value is the base score of a match of that kind
+KIND_SYMBOL, KIND_NAME, KIND_ALIAS, KIND_WORD = 0, 1, 2, 3
+KIND_SCORES = {KIND_SYMBOL: 80.0, KIND_NAME: 70.0, KIND_ALIAS: 65.0, KIND_WORD: 55.0}
+EXACT_BONUS = 20.0
+FUZZY_SCORE = 40.0
+POPULARITY_WEIGHT = 1.0     # Per log unit of market cap, breaks ties between similar matches
+
+NGRAM_SIZE = 3
+MIN_FUZZY_SIMILARITY = 0.3
+MAX_POSTING_LENGTH = 5000   # Grams more common than this carry no signal for fuzzy matching
+MAX_PREFIX_SCAN = 2000      # Matching keys scored per prefix before falling back to the precomputed top list
+TOP_PREFIX_LENGTH = 2       # Prefixes up to this length are answered from a precomputed table
+
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+
+def fold(text):
+    """Fold Turkish and accented characters to lowercase ASCII for matching"""
+    text = str(text).translate(TURKISH_FOLD).lower()
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in text if not unicodedata.combining(char)).strip()
+
+
+def ngrams(key, n=NGRAM_SIZE):
+    """Return the set of character n-grams of a folded key, padded at the edges"""
+    padded = f" {key} "
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+class SymbolSearchIndex:
+    """In-memory typeahead index over the instrument universe.
+
+    Prefix lookups use a flattened trie: every searchable key (symbol, full name,
+    name words and aliases) is folded and kept in one sorted list, so all keys
+    under a prefix form a contiguous range found with two binary searches. Very
+    short prefixes, whose ranges cover much of the universe, are answered from a
+    precomputed table of the most popular matches. Misspellings fall back to a
+    trigram inverted index scored by Jaccard similarity.
+    """
+
+    def __init__(self, symbols, companies, exchanges, popularity, keys, key_ids, key_kinds,
+                 top_prefixes, postings, key_grams):
+        self.symbols = symbols
+        self.companies = companies
+        self.exchanges = exchanges
+        self.popularity = popularity
+        self.keys = keys
+        self.key_ids = key_ids
+        self.key_kinds = key_kinds
+        self.top_prefixes = top_prefixes
+        self.postings = postings
+        self.key_grams = key_grams
+
+    @classmethod
+    def from_universe(cls, universe=None):
+        """Build the index from a universe DataFrame"""
+        if universe is None:
+            universe = load_universe()
+
+        symbols = universe['Symbol'].astype(str).tolist()
+        companies = universe['Company'].astype(str).tolist()
+        exchanges = universe['Exchange'].astype(str).tolist() if 'Exchange' in universe else [""] * len(symbols)
+        market_caps = universe['Market Cap'].fillna(0).tolist() if 'Market Cap' in universe else [0] * len(symbols)
+        popularity = [math.log1p(max(float(cap), 0.0)) for cap in market_caps]
+        aliases = universe['Aliases'].tolist() if 'Aliases' in universe else [""] * len(symbols)
+
+        entries = set()
+        for i, (symbol, company, alias_text) in enumerate(zip(symbols, companies, aliases)):
+            entries.add((fold(symbol), i, KIND_SYMBOL))
+            name = fold(company)
+            entries.add((name, i, KIND_NAME))
+            for word in name.replace(".", " ").replace(",", " ").split():
+                if len(word) > 1:
+                    entries.add((word, i, KIND_WORD))
+            for alias in str(alias_text).split(";"):
+                if alias.strip():
+                    entries.add((fold(alias), i, KIND_ALIAS))
+
+        # Keep only the best kind per (key, instrument) and sort by key
+        best_kind = {}
+        for key, i, kind in entries:
+            if key and kind < best_kind.get((key, i), len(KIND_SCORES)):
+                best_kind[(key, i)] = kind
+        ordered = sorted(best_kind.items())
+        keys = [key for (key, _), _ in ordered]
+        key_ids = [i for (_, i), _ in ordered]
+        key_kinds = [kind for _, kind in ordered]
+
+        # Most popular instruments for every short prefix
+        top_prefixes = {}
+        for key, i, kind in zip(keys, key_ids, key_kinds):
+            for length in range(1, min(TOP_PREFIX_LENGTH, len(key)) + 1):
+                candidates = top_prefixes.setdefault(key[:length], {})
+                candidates[i] = min(kind, candidates.get(i, kind))
+        for prefix, candidates in top_prefixes.items():
+            ranked = sorted(candidates.items(), key=lambda item: (item[1], -popularity[item[0]]))
+            top_prefixes[prefix] = ranked[:50]
+
+        postings = {}
+        key_grams = []
+        for position, key in enumerate(keys):
+            grams = ngrams(key)
+            key_grams.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+
+        return cls(symbols, companies, exchanges, popularity, keys, key_ids, key_kinds,
+                   top_prefixes, postings, key_grams)
+
+    def search(self, query, limit=10, within=None):
+        """Return ranked matches for a typeahead query.
+
+        Args:
+            query (str): Partial symbol, company name or alias
+            limit (int): Maximum number of results
+            within (set): Optional symbols to restrict results to, e.g. a user's holdings
+
+        Returns:
+            list: Dicts with symbol, company, exchange and score, best first
+        """
+        folded = fold(query)
+        if not folded or limit <= 0:
+            return []
+
+        scores = {}
+        self._prefix_matches(folded, scores, within)
+        if len(scores) < limit and len(folded) >= NGRAM_SIZE:
+            self._fuzzy_matches(folded, scores)
+            if within is not None:
+                scores = {i: score for i, score in scores.items() if self.symbols[i] in within}
+
+        ranked = sorted(
+            ((score + POPULARITY_WEIGHT * self.popularity[i], i) for i, score in scores.items()),
+            key=lambda item: (-item[0], self.symbols[item[1]])
+        )
+        return [{
+            "symbol": self.symbols[i],
+            "company": self.companies[i],
+            "exchange": self.exchanges[i],
+            "score": round(score, 2)
+        } for score, i in ranked[:limit]]
+
+    def search_symbols(self, query, limit=10, within=None):
+        """Return only the symbols of the best matches"""
+        return [match["symbol"] for match in self.search(query, limit=limit, within=within)]
+
+    def _prefix_matches(self, prefix, scores, within=None):
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + "￿", lo=start)
+
+        if end - start > MAX_PREFIX_SCAN and within is None and prefix in self.top_prefixes:
+            for i, kind in self.top_prefixes[prefix]:
+                self._add(scores, i, KIND_SCORES[kind])
+            return
+
+        # The scan cap counts only keys of allowed symbols, so a filter never hides its own matches
+        matched = 0
+        for position in range(start, end):
+            if within is not None and self.symbols[self.key_ids[position]] not in within:
+                continue
+            matched += 1
+            if matched > MAX_PREFIX_SCAN:
+                break
+            key = self.keys[position]
+            score = KIND_SCORES[self.key_kinds[position]]
+            if key == prefix:
+                score += EXACT_BONUS
+            else:
+                # Shorter completions of the prefix rank higher
+                score -= 5.0 * (1.0 - len(prefix) / len(key))
+            self._add(scores, self.key_ids[position], score)
+
+    def _fuzzy_matches(self, query, scores):
+        query_grams = ngrams(query)
+        hits = Counter()
+        for gram in query_grams:
+            posting = self.postings.get(gram)
+            if posting and len(posting) <= MAX_POSTING_LENGTH:
+                hits.update(posting)
+
+        for position, shared in hits.items():
+            similarity = shared / (len(query_grams) + self.key_grams[position] - shared)
+            if similarity >= MIN_FUZZY_SIMILARITY:
+                self._add(scores, self.key_ids[position], FUZZY_SCORE * similarity)
+
+    @staticmethod
+    def _add(scores, i, score):
+        if score > scores.get(i, 0.0):
+            scores[i] = score
+
+    def save(self, path=SEARCH_INDEX_FILE):
+        """Serialize the index so later processes can load it without rebuilding"""
+        with open(path, "wb") as f:
+            pickle.dump((INDEX_FORMAT_VERSION, self.__dict__), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path=SEARCH_INDEX_FILE):
+        """Load a serialized index, returning None if it is missing or outdated"""
+        try:
+            with open(path, "rb") as f:
+                version, state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        if version != INDEX_FORMAT_VERSION:
+            return None
+        index = cls.__new__(cls)
+        index.__dict__.update(state)
+        return index
+
+
+def get_search_index(path=SEARCH_INDEX_FILE):
+    """Return the process-wide search index shared by every session.
+
+    The index is loaded from its serialized file, or built from the universe
+    and saved on first use.
+    """
+    global _shared_index
+    with _shared_index_lock:
+        if _shared_index is None:
+            index = None
+            if not _is_stale(path):
+                index = SymbolSearchIndex.load(path)
+            if index is None:
+                index = SymbolSearchIndex.from_universe()
+                try:
+                    index.save(path)
+                except OSError as e:
+                    print(f"Error saving search index: {e}")
+            _shared_index = index
+        return _shared_index
+
+
+def _is_stale(path):
+    """Check whether the universe file changed after the index was serialized"""
+    if not os.path.exists(path):
+        return True
+    return os.path.exists(UNIVERSE_FILE) and os.path.getmtime(UNIVERSE_FILE) > os.path.getmtime(path)
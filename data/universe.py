@@ -0,0 +1,83 @@
+# data/universe.py - Investable stock universe shared by the analysis modules
+import os
+import pandas as pd
+from config import PROCESSED_DATA_DIR
+
+UNIVERSE_FILE = os.path.join(PROCESSED_DATA_DIR, "universe.csv")
+
+UNIVERSE_COLUMNS = ['Symbol', 'Company', 'Exchange', 'Sector', 'Industry', 'Beta', 'Volatility',
+                    'Dividend Yield', 'Growth', 'Market Cap']
+
+# Sample universe used until a processed universe file has been generated
+SAMPLE_UNIVERSE = [
+    # Symbol, Company, Exchange, Sector, Industry, Beta, Volatility (%), Dividend Yield (%), Growth (%), Market Cap ($B)
+    ('AAPL', 'Apple Inc.', 'US', 'Technology', 'Consumer Electronics', 1.20, 24.0, 0.55, 8.0, 2800),
+    ('MSFT', 'Microsoft Corp.', 'US', 'Technology', 'Software', 0.95, 22.0, 0.75, 12.0, 2500),
+    ('GOOGL', 'Alphabet Inc.', 'US', 'Technology', 'Internet Services', 1.05, 27.0, 0.00, 10.0, 1700),
+    ('AMZN', 'Amazon.com Inc.', 'US', 'Consumer Goods', 'Internet Retail', 1.15, 32.0, 0.00, 11.0, 1700),
+    ('META', 'Meta Platforms', 'US', 'Technology', 'Internet Services', 1.25, 38.0, 0.40, 15.0, 820),
+    ('NVDA', 'NVIDIA Corp.', 'US', 'Technology', 'Semiconductors', 1.70, 52.0, 0.03, 60.0, 1000),
+    ('TSLA', 'Tesla Inc.', 'US', 'Consumer Goods', 'Automobiles', 2.00, 58.0, 0.00, 18.0, 780),
+    ('PLTR', 'Palantir Technologies', 'US', 'Technology', 'Software', 2.30, 65.0, 0.00, 20.0, 50),
+    ('AMD', 'Advanced Micro Devices', 'US', 'Technology', 'Semiconductors', 1.80, 50.0, 0.00, 14.0, 240),
+    ('MSTR', 'MicroStrategy Inc.', 'US', 'Technology', 'Software', 3.00, 85.0, 0.00, 2.0, 25),
+    ('RBLX', 'Roblox Corp.', 'US', 'Services', 'Entertainment', 1.90, 60.0, 0.00, 22.0, 25),
+    ('JNJ', 'Johnson & Johnson', 'US', 'Healthcare', 'Pharmaceuticals', 0.55, 14.0, 3.00, 4.0, 385),
+    ('LLY', 'Eli Lilly', 'US', 'Healthcare', 'Pharmaceuticals', 0.40, 26.0, 0.70, 25.0, 500),
+    ('PFE', 'Pfizer Inc.', 'US', 'Healthcare', 'Pharmaceuticals', 0.65, 22.0, 5.50, -5.0, 160),
+    ('PG', 'Procter & Gamble', 'US', 'Consumer Goods', 'Household Products', 0.45, 15.0, 2.40, 4.0, 355),
+    ('KO', 'Coca-Cola', 'US', 'Consumer Goods', 'Beverages', 0.60, 15.0, 3.10, 5.0, 260),
+    ('BRK.B', 'Berkshire Hathaway', 'US', 'Finance', 'Insurance', 0.85, 18.0, 0.00, 7.0, 780),
+    ('V', 'Visa Inc.', 'US', 'Finance', 'Payments', 0.95, 20.0, 0.80, 10.0, 500),
+    ('JPM', 'JPMorgan Chase', 'US', 'Finance', 'Banks', 1.10, 23.0, 2.40, 6.0, 430),
+    ('XOM', 'Exxon Mobil', 'US', 'Energy', 'Oil & Gas', 0.90, 27.0, 3.30, 3.0, 420),
+    ('CVX', 'Chevron Corp.', 'US', 'Energy', 'Oil & Gas', 1.05, 26.0, 4.00, 2.0, 290),
+    ('CAT', 'Caterpillar Inc.', 'US', 'Manufacturing', 'Machinery', 1.05, 27.0, 1.70, 7.0, 150),
+    ('O', 'Realty Income', 'US', 'Real Estate', 'REITs', 0.80, 20.0, 5.60, 3.0, 45),
+    ('PLD', 'Prologis Inc.', 'US', 'Real Estate', 'REITs', 1.05, 26.0, 3.00, 6.0, 110),
+    ('THYAO', 'Türk Hava Yolları', 'BIST', 'Services', 'Airlines', 1.10, 42.0, 0.00, 15.0, 11),
+    ('GARAN', 'Türkiye Garanti Bankası', 'BIST', 'Finance', 'Banks', 1.25, 45.0, 3.50, 20.0, 12),
+    ('AKBNK', 'Akbank', 'BIST', 'Finance', 'Banks', 1.30, 46.0, 3.20, 18.0, 8),
+    ('ASELS', 'Aselsan Elektronik', 'BIST', 'Manufacturing', 'Aerospace & Defense', 1.00, 44.0, 0.40, 25.0, 10),
+    ('BIMAS', 'BİM Birleşik Mağazalar', 'BIST', 'Consumer Goods', 'Food Retail', 0.75, 35.0, 2.50, 12.0, 8),
+    ('KCHOL', 'Koç Holding', 'BIST', 'Finance', 'Conglomerates', 1.05, 40.0, 2.00, 14.0, 14),
+    ('TUPRS', 'Tüpraş', 'BIST', 'Energy', 'Oil & Gas', 0.95, 40.0, 8.00, 6.0, 9),
+    ('EREGL', 'Ereğli Demir ve Çelik Fabrikaları', 'BIST', 'Manufacturing', 'Steel', 1.00, 38.0, 4.50, 3.0, 5),
+    ('SISE', 'Türkiye Şişe ve Cam Fabrikaları', 'BIST', 'Manufacturing', 'Glass & Chemicals', 1.05, 41.0, 2.00, 8.0, 4),
+    ('FROTO', 'Ford Otosan', 'BIST', 'Manufacturing', 'Automobiles', 0.95, 39.0, 6.00, 10.0, 10),
+]
+
+# Alternative names users search for, e.g. brands, former names and ASCII spellings
+SAMPLE_ALIASES = {
+    'AAPL': ['Apple'],
+    'GOOGL': ['Google', 'GOOG'],
+    'META': ['Facebook'],
+    'BRK.B': ['Berkshire', 'BRK-B'],
+    'MSTR': ['Strategy'],
+    'THYAO': ['Turkish Airlines', 'THY'],
+    'GARAN': ['Garanti BBVA', 'Garanti'],
+    'BIMAS': ['BIM'],
+    'KCHOL': ['Koc Holding'],
+    'TUPRS': ['Tupras'],
+    'EREGL': ['Erdemir'],
+    'SISE': ['Şişecam'],
+}
+
+
+def load_universe(path=UNIVERSE_FILE):
+    """Load the stock universe, falling back to the built-in sample universe.
+
+    Aliases are stored as a single ``;``-separated column so the universe
+    round-trips through CSV unchanged.
+    """
+    if os.path.exists(path):
+        universe = pd.read_csv(path)
+    else:
+        universe = pd.DataFrame(SAMPLE_UNIVERSE, columns=UNIVERSE_COLUMNS)
+        universe['Aliases'] = universe['Symbol'].map(lambda symbol: ";".join(SAMPLE_ALIASES.get(symbol, [])))
+
+    if 'Aliases' not in universe:
+        universe['Aliases'] = ""
+    universe['Aliases'] = universe['Aliases'].fillna("")
+
+    return universe.drop_duplicates('Symbol').reset_index(drop=True)
@@ -0,0 +1,358 @@
+# data/user_store.py - SQLite persistence for user profiles, watchlists, portfolios and chat
+import os
+import json
+import time
+import queue
+import sqlite3
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from config import PROCESSED_DATA_DIR
+
+USER_DB = os.path.join(PROCESSED_DATA_DIR, "users.db")
+
+POOL_SIZE = 4
+WRITE_BATCH_SIZE = 500
+CHAT_HISTORY_LIMIT = 200  # Most recent messages restored with a user's state
+STATE_CACHE_SIZE = 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    last_seen_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id TEXT PRIMARY KEY REFERENCES users (user_id),
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS watchlists (
+    user_id TEXT NOT NULL REFERENCES users (user_id),
+    symbol TEXT NOT NULL,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (user_id, symbol)
+);
+CREATE TABLE IF NOT EXISTS holdings (
+    user_id TEXT NOT NULL REFERENCES users (user_id),
+    symbol TEXT NOT NULL,
+    shares REAL NOT NULL,
+    avg_cost REAL NOT NULL,
+    currency TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (user_id, symbol)
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL REFERENCES users (user_id),
+    symbol TEXT NOT NULL,
+    action TEXT NOT NULL,
+    shares REAL NOT NULL,
+    price REAL NOT NULL,
+    currency TEXT,
+    executed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_user ON transactions (user_id, executed_at);
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL REFERENCES users (user_id),
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    extra TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chat_messages_user ON chat_messages (user_id, id);
+"""
+
+# Columns added after the first release, as (table, column, definition); rows
+# written before have NULL there
+MIGRATIONS = [
+    ("holdings", "currency", "TEXT"),
+    ("transactions", "currency", "TEXT")
+]
+
+# A returning user's whole state in one statement; every branch is an index
+# lookup on user_id, and the rows are told apart by their first column
+LOAD_STATE_SQL = """
+SELECT 'profile', NULL, data, NULL, NULL, NULL FROM profiles WHERE user_id = :user_id
+UNION ALL
+SELECT 'watchlist', symbol, NULL, NULL, NULL, added_at FROM watchlists WHERE user_id = :user_id
+UNION ALL
+SELECT 'holding', symbol, currency, shares, avg_cost, NULL FROM holdings WHERE user_id = :user_id
+UNION ALL
+SELECT * FROM (
+    SELECT 'chat', role, content, extra, created_at, id FROM chat_messages
+    WHERE user_id = :user_id ORDER BY id DESC LIMIT :chat_limit
+)
+"""
+
+UPSERT_USER_SQL = ("INSERT INTO users (user_id, created_at, last_seen_at) VALUES (?, ?, ?) "
+                   "ON CONFLICT (user_id) DO UPDATE SET last_seen_at = excluded.last_seen_at")
+
+# Buying averages the cost in; selling only reduces the share count
+BUY_SQL = """
+INSERT INTO holdings (user_id, symbol, shares, avg_cost, currency, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (user_id, symbol) DO UPDATE SET
+    avg_cost = (shares * avg_cost + excluded.shares * excluded.avg_cost) / (shares + excluded.shares),
+    shares = shares + excluded.shares,
+    updated_at = excluded.updated_at
+"""
+SELL_SQL = "UPDATE holdings SET shares = MAX(shares - ?, 0), updated_at = ? WHERE user_id = ? AND symbol = ?"
+
+
+class UserStore:
+    """Persistent per-user state shared by every session and worker.
+
+    The database runs in WAL mode so readers never wait for the writer. Writes
+    are queued and applied by one background thread in batched transactions:
+    callers return immediately instead of contending for SQLite's write lock,
+    and many small writes share one commit. Reads use a small pool of
+    connections, each used by one thread at a time, and whole-user states are
+    cached until that user writes again.
+    """
+
+    def __init__(self, db_path=USER_DB, pool_size=POOL_SIZE):
+        self.db_path = db_path
+        self._pool = queue.LifoQueue()
+        self._pool_size = pool_size
+        self._pool_created = 0
+        self._pool_lock = threading.Lock()
+
+        self._cache = {}
+        self._generations = defaultdict(int)
+        self._pending = defaultdict(int)
+        self._cache_lock = threading.Lock()
+
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+            for table, column, definition in MIGRATIONS:
+                if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+        self._writes = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="user-store-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the duration of a with block"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                create = self._pool_created < self._pool_size
+                if create:
+                    self._pool_created += 1
+            conn = self._connect() if create else self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    # Writes
+
+    def _enqueue(self, user_id, statements):
+        """Queue statements to run in order, after making sure the user exists"""
+        with self._cache_lock:
+            self._cache.pop(user_id, None)
+            self._generations[user_id] += 1
+            self._pending[user_id] += 1
+        now = time.time()
+        self._writes.put([(UPSERT_USER_SQL, (user_id, now, now))] + statements)
+
+    def _write_loop(self):
+        while True:
+            batch = [self._writes.get()]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._apply(batch)
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+
+    def _apply(self, batch):
+        with self.connection() as conn:
+            try:
+                with conn:
+                    for statements in batch:
+                        for sql, params in statements:
+                            conn.execute(sql, params)
+            except sqlite3.Error as e:
+                print(f"Batched write failed, retrying one by one : {e}")
+                # Isolate the failing write so the rest of the batch is kept
+                for statements in batch:
+                    try:
+                        with conn:
+                            for sql, params in statements:
+                                conn.execute(sql, params)
+                    except sqlite3.Error as e:
+                        print(f"Dropping write {statements[-1][0].split()[0]} : {e}")
+
+        # Writes of this batch are visible now; reads that raced them must reload
+        with self._cache_lock:
+            for statements in batch:
+                user_id = statements[0][1][0]
+                self._cache.pop(user_id, None)
+                self._generations[user_id] += 1
+                self._pending[user_id] -= 1
+
+    def flush(self):
+        """Block until every queued write has been committed"""
+        self._writes.join()
+
+    def save_profile(self, user_id, profile):
+        self._enqueue(user_id, [(
+            "INSERT INTO profiles (user_id, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (user_id, json.dumps(profile), time.time())
+        )])
+
+    def add_to_watchlist(self, user_id, symbol):
+        self._enqueue(user_id, [(
+            "INSERT OR IGNORE INTO watchlists (user_id, symbol, added_at) VALUES (?, ?, ?)",
+            (user_id, symbol.upper(), time.time())
+        )])
+
+    def remove_from_watchlist(self, user_id, symbols):
+        self._enqueue(user_id, [("DELETE FROM watchlists WHERE user_id = ? AND symbol = ?", (user_id, symbol))
+                                for symbol in symbols])
+
+    def record_transaction(self, user_id, symbol, action, shares, price, executed_at=None, currency=None):
+        """Record a buy or sell and apply it to the user's holding.
+
+        Prices are in the position's native currency, by default the one its
+        exchange trades in.
+        """
+        if action not in ("Buy", "Sell"):
+            raise ValueError(f"Unknown transaction action : {action}")
+        if shares <= 0 or price <= 0:
+            raise ValueError("Transactions need positive shares and price")
+        symbol = symbol.upper()
+        if currency is None:
+            from data.fx import native_currency
+            currency = native_currency(symbol)
+        now = time.time()
+        executed_at = now if executed_at is None else executed_at
+        holding = (BUY_SQL, (user_id, symbol, shares, price, currency, now)) if action == "Buy" \
+            else (SELL_SQL, (shares, now, user_id, symbol))
+        self._enqueue(user_id, [
+            ("INSERT INTO transactions (user_id, symbol, action, shares, price, currency, executed_at) "
+             "VALUES (?, ?, ?, ?, ?, ?, ?)", (user_id, symbol, action, shares, price, currency, executed_at)),
+            holding,
+            ("DELETE FROM holdings WHERE user_id = ? AND symbol = ? AND shares = 0", (user_id, symbol))
+        ])
+
+    def append_chat(self, user_id, message):
+        """Persist a chat message dict with role, content, timestamp and optional sources"""
+        extra = {key: value for key, value in message.items() if key not in ("role", "content", "timestamp")}
+        self._enqueue(user_id, [(
+            "INSERT INTO chat_messages (user_id, role, content, extra, created_at) VALUES (?, ?, ?, ?, ?)",
+            (user_id, message["role"], message["content"], json.dumps(extra) if extra else None,
+             message.get("timestamp", ""))
+        )])
+
+    def clear_chat(self, user_id):
+        self._enqueue(user_id, [("DELETE FROM chat_messages WHERE user_id = ?", (user_id,))])
+
+    # Reads
+
+    def load_user_state(self, user_id, chat_limit=CHAT_HISTORY_LIMIT):
+        """Return a user's profile, watchlist, holdings and recent chat history.
+
+        Returns:
+            dict: profile (dict or None), watchlist (list), holdings (list of dicts), chat_history (list)
+        """
+        with self._cache_lock:
+            state = self._cache.get(user_id)
+            pending = self._pending[user_id]
+            generation = self._generations[user_id]
+        if state is not None:
+            return _copy_state(state)
+        if pending:
+            # Read the user's own queued writes
+            self.flush()
+            with self._cache_lock:
+                generation = self._generations[user_id]
+
+        with self.connection() as conn:
+            rows = conn.execute(LOAD_STATE_SQL, {"user_id": user_id, "chat_limit": chat_limit}).fetchall()
+
+        state = {"profile": None, "watchlist": [], "holdings": [], "chat_history": []}
+        watchlist = []
+        chat = []
+        for kind, key, text, a, b, c in rows:
+            if kind == "profile":
+                state["profile"] = json.loads(text)
+            elif kind == "watchlist":
+                watchlist.append((c, key))
+            elif kind == "holding":
+                state["holdings"].append({"symbol": key, "shares": a, "avg_cost": b, "currency": text})
+            else:
+                message = {"role": key, "content": text, "timestamp": b}
+                message.update(json.loads(a) if a else {})
+                chat.append((c, message))
+        state["watchlist"] = [symbol for _, symbol in sorted(watchlist)]
+        state["holdings"].sort(key=lambda holding: holding["symbol"])
+        if any(holding["currency"] is None for holding in state["holdings"]):
+            # Positions stored before currencies were recorded trade in their exchange's currency
+            from data.fx import native_currency
+            for holding in state["holdings"]:
+                holding["currency"] = holding["currency"] or native_currency(holding["symbol"])
+        state["chat_history"] = [message for _, message in sorted(chat, key=lambda item: item[0])]
+
+        with self._cache_lock:
+            # Only cache what no write has changed since the read started
+            if self._generations[user_id] == generation:
+                if len(self._cache) >= STATE_CACHE_SIZE:
+                    self._cache.pop(next(iter(self._cache)))
+                self._cache[user_id] = state
+        return _copy_state(state)
+
+    def transactions(self, user_id, limit=100):
+        """Return a user's most recent transactions, newest first, including their own queued ones"""
+        with self._cache_lock:
+            pending = self._pending[user_id]
+        if pending:
+            self.flush()
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT symbol, action, shares, price, currency, executed_at FROM transactions "
+                "WHERE user_id = ? ORDER BY executed_at DESC LIMIT ?", (user_id, limit)
+            ).fetchall()
+        return [{"symbol": symbol, "action": action, "shares": shares, "price": price, "currency": currency,
+                 "executed_at": executed_at}
+                for symbol, action, shares, price, currency, executed_at in rows]
+
+
+def _copy_state(state):
+    # Sessions mutate their copy (e.g. appending chat messages) without touching the cache
+    return {
+        "profile": dict(state["profile"]) if state["profile"] is not None else None,
+        "watchlist": list(state["watchlist"]),
+        "holdings": [dict(holding) for holding in state["holdings"]],
+        "chat_history": [dict(message) for message in state["chat_history"]]
+    }
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_user_store():
+    """Return the process-wide user store shared by every session"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = UserStore()
+        return _shared_store
@@ -0,0 +1,287 @@
+# rag/assistant.py - Streaming answer pipeline: retrieved context, generated tokens, then sources
+import re
+import time
+import threading
+from collections import deque
+from config import LLM_MODEL
+from rag.context import ContextAssembler, format_context_facts, mentions_portfolio
+
+TOKEN_DELAY = 0.02        # Seconds per token of the placeholder generator, roughly a CPU model's pace
+MAX_NEW_TOKENS = 512
+METRICS_HISTORY = 200     # Recent queries kept for latency statistics
+
+_recent_metrics = deque(maxlen=METRICS_HISTORY)
+_metrics_lock = threading.Lock()
+_shared_pipeline = None
+_shared_pipeline_lock = threading.Lock()
+
+
+def split_tokens(text):
+    """Split text into word pieces that keep their trailing whitespace"""
+    return re.findall(r"\S+\s*", text)
+
+
+def sources_of(chunks):
+    """One source per retrieved document, in rank order"""
+    sources = {}
+    for chunk in chunks:
+        sources.setdefault(chunk["document_id"], {"title": chunk.get("title") or chunk["document_id"],
+                                                  "url": chunk.get("url", "")})
+    return list(sources.values())
+
+
+def build_prompt(query, user_profile, chunks, conversation=None, facts=""):
+    """Prompt for a language model, most stable parts first.
+
+    The instructions and the investor's profile, then the conversation summary
+    and recent turns, then this question's market facts, sources and the
+    question. Between
+    summary updates each prompt extends the previous one's conversation part,
+    so a backend with prefix caching only processes the new text.
+    """
+    parts = [f"You are an investment assistant. The investor has a {user_profile.get('risk_profile', 'Moderate')} "
+             f"risk profile and is focused on {user_profile.get('investment_goals', 'long-term growth')}.\n"
+             f"Answer using the sources below and cite them by number."]
+    if conversation and conversation.get("summary"):
+        parts.append(f"Earlier in this conversation:\n{conversation['summary']}")
+    for message in (conversation or {}).get("messages", []):
+        parts.append(f"{'User' if message['role'] == 'user' else 'Assistant'}: {message['content']}")
+    if facts:
+        parts.append(f"Market data:\n{facts}")
+    parts.append("\n\n".join(f"[{n}] {chunk.get('title', '')}\n{chunk['text']}" for n, chunk in enumerate(chunks, 1)))
+    parts.append(f"Question: {query}\nAnswer:")
+    return "\n\n".join(parts)
+
+
+class PlaceholderGenerator:
+    """Canned answers streamed word by word, until a language model is configured"""
+
+    def answer(self, query, user_profile):
+        if "bitcoin" in query.lower():
+            return {
+                "answer": "Based on current market conditions, Bitcoin is showing high volatility. Given your moderate risk profile, I'd recommend limiting cryptocurrency exposure to no more than 5% of your portfolio.",
+                "sources": [
+                    {"title": "Cryptocurrency Market Update", "url": "https://example.com/crypto-update"},
+                    {"title": "Bitcoin Analysis", "url": "https://example.com/bitcoin-analysis"}
+                ]
+            }
+        elif "stock" in query.lower() or "invest" in query.lower():
+            return {
+                "answer": f"Based on your {user_profile['risk_profile']} risk profile, I would recommend diversifying your portfolio across different sectors. Your focus on {user_profile['investment_goals']} aligns with a strategy of...",
+                "sources": [
+                    {"title": "Investment Basics", "url": "https://example.com/investment-basics"},
+                    {"title": "Market Analysis Q2 2023", "url": "https://example.com/market-analysis"}
+                ]
+            }
+        else:
+            return {
+                "answer": "I'm currently in development mode and have limited knowledge. Please ask me about investments or stocks!",
+                "sources": []
+            }
+
+    def stream(self, query, user_profile, chunks, conversation=None, facts=""):
+        for token in split_tokens(self.answer(query, user_profile)["answer"]):
+            time.sleep(TOKEN_DELAY)
+            yield token
+
+    def default_sources(self, query, user_profile):
+        return self.answer(query, user_profile)["sources"]
+
+
+class TransformersGenerator:
+    """Streams text from a causal language model (``LLM_MODEL``) as it is decoded.
+
+    Generation runs on a background thread and feeds a TextIteratorStreamer,
+    so each piece of text is yielded as soon as the model produces it.
+    """
+
+    def __init__(self, model_name=LLM_MODEL, max_new_tokens=MAX_NEW_TOKENS):
+        self.model_name = model_name
+        self.max_new_tokens = max_new_tokens
+        self._tokenizer = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                from transformers import AutoTokenizer, AutoModelForCausalLM
+                self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                self._model = AutoModelForCausalLM.from_pretrained(self.model_name).eval()
+
+    def stream(self, query, user_profile, chunks, conversation=None, facts=""):
+        from transformers import TextIteratorStreamer
+
+        self._load()
+        inputs = self._tokenizer(build_prompt(query, user_profile, chunks, conversation, facts), return_tensors="pt").to(self._model.device)
+        streamer = TextIteratorStreamer(self._tokenizer, skip_prompt=True, skip_special_tokens=True)
+        thread = threading.Thread(target=self._model.generate, daemon=True,
+                                  kwargs={**inputs, "streamer": streamer, "max_new_tokens": self.max_new_tokens})
+        thread.start()
+        yield from streamer
+        thread.join()
+
+
+def record_metrics(metrics):
+    with _metrics_lock:
+        _recent_metrics.append(metrics)
+
+
+def latency_summary():
+    """Median and 95th percentile of each latency metric over recent queries"""
+    with _metrics_lock:
+        recent = list(_recent_metrics)
+    summary = {"queries": len(recent),
+               "cache_hit_rate": sum(m.get("cached", False) for m in recent) / len(recent) if recent else 0.0}
+    for key in ["retrieval_ms", "ttft_ms", "total_ms", "tokens_per_second"]:
+        values = sorted(m[key] for m in recent if m.get(key) is not None)
+        if values:
+            summary[key] = {"p50": values[len(values) // 2], "p95": values[min(len(values) - 1, int(len(values) * 0.95))]}
+    return summary
+
+
+class AssistantPipeline:
+    """Answers a question as a stream of events.
+
+    Events are dicts with a "type":
+        "retrieval": the retrieved chunks, before any text
+        "token": a piece of the answer as soon as it is generated
+        "sources": the documents the answer drew on
+        "metrics": time to first token, tokens per second and total latency
+
+    A token is a piece of text as the generator yields it (a word for the
+    placeholder, usually a token or a few for a language model). Answers found
+    in the semantic cache skip retrieval and generation and arrive as a
+    single token.
+    """
+
+    def __init__(self, retriever=None, generator=None, cache=None, use_cache=True, assembler=None):
+        self.retriever = retriever
+        self.generator = generator if generator is not None else PlaceholderGenerator()
+        self.cache = cache
+        self.use_cache = use_cache
+        self.assembler = assembler
+
+    def _get_retriever(self):
+        if self.retriever is None:
+            from rag.retrieval import get_retriever
+            self.retriever = get_retriever()
+        return self.retriever
+
+    def _get_cache(self):
+        if self.cache is None and self.use_cache:
+            from rag.semantic_cache import SemanticCache
+            self.cache = SemanticCache(self._get_retriever().embedder)
+        return self.cache
+
+    def data_version(self):
+        """Changes whenever indexed documents or stored prices change"""
+        from data.price_store import get_price_store
+        return f"{self._get_retriever().version}:{get_price_store().store_version()}"
+
+    def _lookup(self, query, user_profile):
+        """Return (cache, data version, cached response, query vector), with cache None if unavailable"""
+        try:
+            cache = self._get_cache()
+            if cache is None:
+                return None, None, None, None
+            version = self.data_version()
+            return (cache, version, *cache.lookup(query, user_profile, version))
+        except (ImportError, OSError, ValueError) as e:
+            print(f"Error reading the response cache: {e}")
+            return None, None, None, None
+
+    def _assemble(self, query, user_id, vector=None):
+        if self.assembler is None:
+            try:
+                retriever = self._get_retriever()
+            except (ImportError, OSError, ValueError) as e:
+                print(f"Error retrieving context: {e}")
+                retriever = None
+            self.assembler = ContextAssembler(retriever)
+        return self.assembler.assemble(query, user_id=user_id, query_vector=vector)
+
+    def stream(self, query, user_profile, conversation=None, user_id=None):
+        """Answer ``query``.
+
+        Args:
+            conversation (dict): ConversationContext window of the chat so far
+            user_id (str): Whose portfolio to value if the question asks about it
+        """
+        started = time.perf_counter()
+        if conversation and (conversation.get("summary") or conversation.get("messages")):
+            # A follow-up question can mean something else in another conversation
+            cache, version, cached, vector = None, None, None, None
+        elif user_id is not None and mentions_portfolio(query):
+            # Answers about a user's own holdings are theirs alone
+            cache, version, cached, vector = None, None, None, None
+        else:
+            cache, version, cached, vector = self._lookup(query, user_profile)
+        if cached is not None:
+            yield {"type": "retrieval", "chunks": []}
+            first_token = time.perf_counter()
+            yield {"type": "token", "text": cached["answer"]}
+            yield {"type": "sources", "sources": cached["sources"]}
+            finished = time.perf_counter()
+            metrics = {"cached": True, "retrieval_ms": (first_token - started) * 1000, "retrieval_timings": {},
+                       "ttft_ms": (first_token - started) * 1000, "tokens": 1, "tokens_per_second": None,
+                       "total_ms": (finished - started) * 1000}
+            record_metrics(metrics)
+            yield {"type": "metrics", "metrics": metrics}
+            return
+
+        context = self._assemble(query, user_id, vector)
+        chunks = context["chunks"]
+        retrieved = time.perf_counter()
+        yield {"type": "retrieval", "chunks": chunks, "context": context}
+
+        first_token = None
+        pieces = []
+        for text in self.generator.stream(query, user_profile, chunks, conversation, format_context_facts(context)):
+            if first_token is None:
+                first_token = time.perf_counter()
+            pieces.append(text)
+            yield {"type": "token", "text": text}
+        finished = time.perf_counter()
+
+        sources = sources_of(chunks)
+        if not sources and hasattr(self.generator, "default_sources"):
+            sources = self.generator.default_sources(query, user_profile)
+        yield {"type": "sources", "sources": sources}
+        if cache is not None:
+            cache.store(query, user_profile, version, {"answer": "".join(pieces), "sources": sources}, vector)
+
+        tokens = len(pieces)
+        generating = finished - first_token if first_token is not None else 0
+        metrics = {
+            "cached": False,
+            "context_tokens": (conversation or {}).get("tokens", 0),
+            "retrieval_ms": (retrieved - started) * 1000,
+            "retrieval_timings": context["timings"],
+            "timed_out": context["timed_out"],
+            "ttft_ms": (first_token - started) * 1000 if first_token is not None else None,
+            "tokens": tokens,
+            "tokens_per_second": (tokens - 1) / generating if generating > 0 else None,
+            "total_ms": (finished - started) * 1000
+        }
+        record_metrics(metrics)
+        yield {"type": "metrics", "metrics": metrics}
+
+    def respond(self, query, user_profile, conversation=None, user_id=None):
+        """Run the stream to completion and return the answer, sources and metrics"""
+        response = {"answer": "", "sources": [], "metrics": {}}
+        for event in self.stream(query, user_profile, conversation, user_id):
+            if event["type"] == "token":
+                response["answer"] += event["text"]
+            elif event["type"] in ("sources", "metrics"):
+                response[event["type"]] = event[event["type"]]
+        return response
+
+
+def get_assistant_pipeline():
+    """Return the process-wide assistant pipeline"""
+    global _shared_pipeline
+    with _shared_pipeline_lock:
+        if _shared_pipeline is None:
+            _shared_pipeline = AssistantPipeline()
+        return _shared_pipeline
@@ -0,0 +1,219 @@
+# rag/chunker.py - Streaming, sentence-aware document chunking for retrieval
+import os
+import re
+import hashlib
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from config import CHUNK_SIZE, CHUNK_OVERLAP, PROCESSED_DATA_DIR
+
+CHUNK_MANIFEST = os.path.join(PROCESSED_DATA_DIR, "chunk_manifest.db")
+
+BATCH_SIZE = 64  # Documents sent to a worker process at a time
+
+# Sentence ends: terminal punctuation followed by a capital letter, digit or quote.
+# Turkish decimals ("0,8") and abbreviations followed by lowercase ("A.Ş. ile") do not split.
+SENTENCE_END = re.compile(r'[.!?…]\s+(?=[A-ZÇĞİÖŞÜ0-9"“\'(])')
+
+# Metadata copied from a document onto each of its chunks
+CHUNK_METADATA = ["kind", "source", "url", "title", "published", "symbols", "category"]
+
+MANIFEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    chunk_count INTEGER NOT NULL
+);
+"""
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def document_text(document):
+    """Text that gets chunked: the title as the first sentence, then the body"""
+    title = (document.get("title") or "").strip()
+    text = (document.get("text") or "").strip()
+    return f"{title}\n{text}" if title else text
+
+
+def split_sentences(text):
+    """Yield the sentences of a text, treating line breaks as boundaries too"""
+    for paragraph in text.splitlines():
+        paragraph = paragraph.strip()
+        start = 0
+        for end in SENTENCE_END.finditer(paragraph):
+            yield paragraph[start:end.start() + 1]
+            start = end.end()
+        if start < len(paragraph):
+            yield paragraph[start:]
+
+
+def _split_long(sentence, chunk_size, length):
+    """Break a sentence longer than a chunk at word boundaries"""
+    words = sentence.split()
+    piece = []
+    for word in words:
+        if piece and length(" ".join(piece + [word])) > chunk_size:
+            yield " ".join(piece)
+            piece = []
+        piece.append(word)
+    if piece:
+        yield " ".join(piece)
+
+
+def split_text(text, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, length=len):
+    """Pack whole sentences into chunks of at most ``chunk_size``.
+
+    Each chunk starts with the trailing sentences of the previous one, up to
+    ``chunk_overlap``, so context carries across chunk boundaries.
+
+    Args:
+        text (str): Text to split
+        chunk_size (int): Maximum chunk length
+        chunk_overlap (int): Maximum length repeated from the previous chunk
+        length (callable): Length measure, e.g. characters (len) or a tokenizer's token count
+
+    Returns:
+        list: Chunk strings
+    """
+    chunks = []
+    current = deque()
+    current_length = 0
+
+    for sentence in split_sentences(text):
+        for unit in (_split_long(sentence, chunk_size, length) if length(sentence) > chunk_size else [sentence]):
+            unit_length = length(unit) + 1
+            if current and current_length + unit_length > chunk_size:
+                chunks.append(" ".join(current))
+                # Keep the tail of the chunk as overlap, and drop more if the new unit needs the room
+                while current and (current_length > chunk_overlap or current_length + unit_length > chunk_size):
+                    current_length -= length(current.popleft()) + 1
+            current.append(unit)
+            current_length += unit_length
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def chunk_document(document, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """Split a document into chunk records with stable ids and source metadata.
+
+    A chunk's id is the document id and its position, so re-chunking a changed
+    document overwrites its chunks instead of duplicating them.
+    """
+    metadata = {key: document[key] for key in CHUNK_METADATA if document.get(key) is not None}
+    return [{
+        "id": f"{document['id']}#{position}",
+        "document_id": document["id"],
+        "position": position,
+        "text": text,
+        "content_hash": text_hash(text),
+        **metadata
+    } for position, text in enumerate(split_text(document_text(document), chunk_size, chunk_overlap))]
+
+
+def _chunk_batch(task):
+    documents, chunk_size, chunk_overlap = task
+    return [(document["id"], content_hash, chunk_document(document, chunk_size, chunk_overlap))
+            for document, content_hash in documents]
+
+
+class ChunkPipeline:
+    """Turns a stream of documents into a stream of chunks, skipping unchanged documents.
+
+    A manifest records each document's content hash and chunk count. Documents
+    whose hash is unchanged are never chunked again; the rest are chunked in
+    batches on a process pool, with only a few batches in flight at a time so
+    memory stays bounded on large corpora. The ids of chunks that disappeared
+    because a document got shorter are collected in ``deleted_ids``.
+    """
+
+    def __init__(self, manifest_path=CHUNK_MANIFEST, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+                 processes=None, batch_size=BATCH_SIZE):
+        self.manifest_path = manifest_path
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.processes = processes if processes is not None else os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.stats = {}
+        self.deleted_ids = []
+
+    def _changed_batches(self, documents, conn, previous):
+        """Group new or changed documents into batches, remembering their old chunk counts"""
+        batch = []
+        for document in documents:
+            self.stats["documents"] += 1
+            content_hash = text_hash(document_text(document))
+            row = conn.execute("SELECT content_hash, chunk_count FROM documents WHERE document_id = ?",
+                               (document["id"],)).fetchone()
+            if row is not None and row[0] == content_hash:
+                self.stats["unchanged"] += 1
+                continue
+            previous[document["id"]] = row[1] if row else 0
+            batch.append((document, content_hash))
+            if len(batch) >= self.batch_size:
+                yield (batch, self.chunk_size, self.chunk_overlap)
+                batch = []
+        if batch:
+            yield (batch, self.chunk_size, self.chunk_overlap)
+
+    def run(self, documents):
+        """Yield the chunks of every new or changed document.
+
+        The manifest is only updated once the stream has been fully consumed, so
+        an interrupted run chunks the same documents again next time.
+        """
+        self.stats = {"documents": 0, "unchanged": 0, "chunked": 0, "chunks": 0}
+        self.deleted_ids = []
+        previous = {}
+        updates = []
+
+        conn = sqlite3.connect(self.manifest_path)
+        try:
+            conn.executescript(MANIFEST_SCHEMA)
+            tasks = self._changed_batches(documents, conn, previous)
+            for results in self._map(tasks):
+                for document_id, content_hash, chunks in results:
+                    old_count = previous.pop(document_id)
+                    self.deleted_ids += [f"{document_id}#{position}" for position in range(len(chunks), old_count)]
+                    self.stats["chunked"] += 1
+                    self.stats["chunks"] += len(chunks)
+                    updates.append((document_id, content_hash, len(chunks)))
+                    yield from chunks
+
+            with conn:
+                conn.executemany(
+                    "INSERT INTO documents (document_id, content_hash, chunk_count) VALUES (?, ?, ?) "
+                    "ON CONFLICT (document_id) DO UPDATE SET content_hash = excluded.content_hash, "
+                    "chunk_count = excluded.chunk_count", updates)
+        finally:
+            conn.close()
+
+    def _map(self, tasks):
+        if self.processes <= 1:
+            yield from map(_chunk_batch, tasks)
+            return
+        # Submit at most two batches per worker ahead of the consumer
+        with ProcessPoolExecutor(max_workers=self.processes) as executor:
+            pending = deque()
+            for task in tasks:
+                pending.append(executor.submit(_chunk_batch, task))
+                if len(pending) >= self.processes * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+
+if __name__ == "__main__":
+    # Run from the project root: python -m rag.chunker
+    import time
+    from data.loaders.news_loader import iter_corpus
+
+    started = time.perf_counter()
+    pipeline = ChunkPipeline()
+    for _ in pipeline.run(iter_corpus()):
+        pass
+    print(f"{pipeline.stats} in {time.perf_counter() - started:.1f}s")
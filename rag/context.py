@@ -0,0 +1,208 @@
+# rag/context.py - Gathers documents, quotes and portfolio facts for a question concurrently
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from data.entity_linker import get_entity_linker
+
+# Seconds each stage may take, counted from the start of assembly
+STAGE_TIMEOUTS = {"retrieval": 2.0, "quotes": 1.5, "portfolio": 1.0}
+QUOTE_SOURCE = "yahoo_finance"
+QUOTE_SUFFIXES = {"BIST": ".IS"}   # Exchange suffix of a symbol at the quote source
+MAX_TICKERS = 5
+MAX_WORKERS = 8                    # Stages plus one quote per ticker; stuck lookups keep a thread until they return
+PORTFOLIO_WORDS = re.compile(r"\b(my|mine|portfolio|holdings?|positions?|portföy\w*)\b", re.IGNORECASE)
+
+
+def extract_tickers(query, linker=None):
+    """Symbols mentioned in a question ("THYAO", "$AAPL", "THY", "Garanti"), in order of appearance"""
+    linker = linker if linker is not None else get_entity_linker()
+    return list(linker.link(query))[:MAX_TICKERS]
+
+
+def mentions_portfolio(query):
+    """Whether a question is about the user's own holdings"""
+    return PORTFOLIO_WORDS.search(query) is not None
+
+
+def value_holdings(holdings, store=None, reporting=None, fx=None):
+    """Value positions at the latest stored close.
+
+    Prices stay in each position's own currency; values and totals are in
+    ``reporting``, by default the holdings' currency when they share one and
+    US dollars otherwise.
+
+    Returns:
+        dict: positions (symbol, shares, currency, price, value, gain_pct),
+        the reporting currency, total value, cost and gain, and the unpriced
+        symbols, whose currency has no exchange rate and which the totals leave out
+    """
+    import pandas as pd
+    from analysis.valuation import value_positions
+    from data.fx import PIVOT_CURRENCY, native_currency
+    from data.price_store import get_price_store
+
+    store = store if store is not None else get_price_store()
+    latest = store.latest([holding["symbol"] for holding in holdings])
+    frame = pd.DataFrame({
+        "Symbol": [holding["symbol"] for holding in holdings],
+        "Shares": [holding["shares"] for holding in holdings],
+        "Avg Cost": [holding["avg_cost"] for holding in holdings],
+        "Currency": [holding.get("currency") or native_currency(holding["symbol"]) for holding in holdings]
+    })
+    frame["Current Price"] = frame["Symbol"].map(latest["Close"]).fillna(frame["Avg Cost"]).astype(float)
+    currencies = set(frame["Currency"])
+    reporting = reporting or (currencies.pop() if len(currencies) == 1 else PIVOT_CURRENCY)
+    valued = value_positions(frame, reporting, fx)
+
+    positions = [{"symbol": row["Symbol"], "shares": row["Shares"], "currency": row["Currency"],
+                  "price": row["Current Price"], "value": row["Market Value"], "gain_pct": row["Gain/Loss (%)"]}
+                 for row in valued.to_dict("records")]
+    priced = valued[valued["Priced"]]
+    value, cost = float(priced["Market Value"].sum()), float(priced["Cost"].sum())
+    return {"positions": positions, "currency": reporting, "value": value, "cost": cost, "gain": value - cost,
+            "unpriced": valued.loc[~valued["Priced"], "Symbol"].tolist()}
+
+
+class ContextAssembler:
+    """Runs the context stages of a question at the same time.
+
+    Tickers are picked out of the question first by the entity linker, then
+    retrieval, a live quote per ticker and the user's portfolio valuation run
+    on a shared thread pool. Each stage has its own deadline; whatever is not
+    ready by then is left out and the answer goes ahead, so latency is bounded
+    by the slowest deadline instead of the sum of the stages. Late results are
+    discarded, though their threads run on until the lookup returns.
+    """
+
+    def __init__(self, retriever=None, quote_loader=None, store=None, user_store=None, timeouts=None,
+                 quote_sink=None):
+        self.retriever = retriever
+        self.quote_loader = quote_loader
+        self.quote_sink = quote_sink    # Receives every live quote; alerts and the market overview by default
+        self.store = store
+        self.user_store = user_store
+        self.timeouts = {**STAGE_TIMEOUTS, **(timeouts or {})}
+        self._executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="context")
+        self._loader_lock = threading.Lock()
+
+    def _loader(self):
+        with self._loader_lock:
+            if self.quote_loader is None:
+                from data.loaders.stock_loader import get_loader
+                self.quote_loader = get_loader(QUOTE_SOURCE)
+            return self.quote_loader
+
+    def _quote(self, symbol, exchange):
+        price = self._loader().get_stock_price(symbol + QUOTE_SUFFIXES.get(exchange, ""))
+        if price is None:
+            return None
+        if self.quote_sink is None:
+            from analysis.market_overview import apply_quote
+            self.quote_sink = apply_quote
+        self.quote_sink(symbol, float(price))
+        return float(price)
+
+    def _stored_quotes(self, tickers):
+        from data.price_store import get_price_store
+
+        store = self.store if self.store is not None else get_price_store()
+        latest = store.latest(tickers)
+        return {symbol: {"price": float(row["Close"]), "change_pct": (row["Close"] / row["Prev Close"] - 1) * 100,
+                         "as_of": row["Date"].date().isoformat(), "live": False}
+                for symbol, row in latest.iterrows()}
+
+    def _portfolio(self, user_id):
+        from data.user_store import get_user_store
+
+        user_store = self.user_store if self.user_store is not None else get_user_store()
+        holdings = user_store.load_user_state(user_id)["holdings"]
+        return value_holdings(holdings, self.store) if holdings else None
+
+    def _retrieve(self, query, query_vector):
+        timings = {}
+        chunks = self.retriever.retrieve(query, timings=timings, query_vector=query_vector)
+        return chunks, timings
+
+    @staticmethod
+    def _wait(future, deadline):
+        """The future's result if it is ready by ``deadline``, else None; errors are printed"""
+        try:
+            return future.result(timeout=max(0.0, deadline - time.perf_counter()))
+        except TimeoutError:
+            return None
+        except Exception as e:
+            print(f"Error assembling context: {e}")
+            return None
+
+    def assemble(self, query, user_id=None, query_vector=None):
+        """Collect everything ready in time for a question.
+
+        Returns:
+            dict: tickers, chunks, quotes ({symbol: {"price", "live", ...}}),
+            portfolio (or None), timings in ms per stage and the stages that
+            timed_out
+        """
+        started = time.perf_counter()
+        linker = get_entity_linker()
+        tickers = extract_tickers(query, linker)
+
+        futures = {}
+        if self.retriever is not None:
+            futures["retrieval"] = self._executor.submit(self._retrieve, query, query_vector)
+        if user_id is not None and mentions_portfolio(query):
+            futures["portfolio"] = self._executor.submit(self._portfolio, user_id)
+        quote_futures = {symbol: self._executor.submit(self._quote, symbol, linker.exchanges.get(symbol))
+                         for symbol in tickers}
+
+        context = {"tickers": tickers, "chunks": [], "quotes": {}, "portfolio": None,
+                   "timings": {"tickers_ms": (time.perf_counter() - started) * 1000}, "timed_out": []}
+        if tickers:
+            # Stored closes stand in for live quotes that do not arrive in time
+            try:
+                context["quotes"] = self._stored_quotes(tickers)
+            except (OSError, ValueError) as e:
+                print(f"Error reading stored prices: {e}")
+
+        # Waiting on the stages in deadline order bounds the total by the latest deadline
+        stages = list(futures) + (["quotes"] if quote_futures else [])
+        for stage in sorted(stages, key=lambda name: self.timeouts[name]):
+            deadline = started + self.timeouts[stage]
+            if stage == "quotes":
+                for symbol, future in quote_futures.items():
+                    price = self._wait(future, deadline)
+                    if price is not None:
+                        context["quotes"][symbol] = {"price": price, "live": True}
+                done = all(future.done() for future in quote_futures.values())
+            else:
+                result = self._wait(futures[stage], deadline)
+                done = futures[stage].done()
+                if stage == "retrieval" and result is not None:
+                    context["chunks"], context["timings"]["retrieval"] = result
+                elif stage == "portfolio":
+                    context["portfolio"] = result
+            if not done:
+                context["timed_out"].append(stage)
+            context["timings"][f"{stage}_ms"] = (time.perf_counter() - started) * 1000
+        context["timings"]["total_ms"] = (time.perf_counter() - started) * 1000
+        return context
+
+
+def format_context_facts(context):
+    """Quote and portfolio lines for the prompt, empty if there are none"""
+    lines = []
+    for symbol, quote in context.get("quotes", {}).items():
+        detail = "live" if quote.get("live") else f"close of {quote['as_of']}"
+        lines.append(f"{symbol}: {quote['price']:.2f} ({detail})")
+    portfolio = context.get("portfolio")
+    if portfolio:
+        unpriced = portfolio.get("unpriced", [])
+        holdings = ", ".join(f"{p['symbol']} {p['shares']:g} shares ({p['value'] / portfolio['value']:.0%})"
+                             for p in portfolio["positions"]
+                             if p["symbol"] not in unpriced) if portfolio["value"] else ""
+        lines.append(f"Portfolio value {portfolio['value']:.2f} {portfolio['currency']}, "
+                     f"gain {portfolio['gain']:+.2f}: {holdings}")
+        if unpriced:
+            lines.append(f"Not valued, no exchange rate: {', '.join(unpriced)}")
+    return "\n".join(lines)
+
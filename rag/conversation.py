@@ -0,0 +1,108 @@
+# rag/conversation.py - Keeps the chat history sent with each question within a token budget
+import re
+from config import CONTEXT_TOKEN_BUDGET
+
+RECENT_SHARE = 0.75       # Part of the budget for verbatim recent turns; the rest holds the summary
+MAX_RECENT_MESSAGES = 8   # Messages kept verbatim at most, however short
+SUMMARY_WORDS = 30        # Words of a message kept in its summary line
+
+
+def estimate_tokens(text):
+    """Rough token count of a text: words and punctuation marks, plus a third for subword splits"""
+    return len(re.findall(r"\w+|[^\w\s]", text)) * 4 // 3
+
+
+def summary_line(message):
+    """One line standing for a message: its first sentence, cut to ``SUMMARY_WORDS`` words"""
+    first = re.split(r"(?<=[.!?])\s", message["content"].strip(), maxsplit=1)[0]
+    words = first.split()
+    text = " ".join(words[:SUMMARY_WORDS]) + (" ..." if len(words) > SUMMARY_WORDS else "")
+    return f"{'User' if message['role'] == 'user' else 'Assistant'}: {text}"
+
+
+class ExtractiveSummarizer:
+    """Folds messages into a summary by appending one line per message.
+
+    When the summary outgrows its budget, the oldest lines go first: the
+    latest topics matter most to a follow-up question.
+    """
+
+    def __init__(self, count_tokens=estimate_tokens):
+        self.count_tokens = count_tokens
+
+    def update(self, summary, messages, budget):
+        lines = (summary.splitlines() if summary else []) + [summary_line(message) for message in messages]
+        sizes = [self.count_tokens(line) for line in lines]
+        total = sum(sizes)
+        start = 0
+        while total > budget and start < len(lines):
+            total -= sizes[start]
+            start += 1
+        return "\n".join(lines[start:])
+
+
+class ConversationContext:
+    """The part of a chat session's history that goes into the next prompt.
+
+    The most recent turns are kept verbatim as far as the budget allows; turns
+    that fall out of that window are folded into a running summary once, when
+    they leave it, rather than summarizing the whole history on every request.
+    The summary only changes when turns are folded in, so the prompt prefix
+    built from it stays byte-identical between most consecutive requests,
+    which lets an inference backend reuse its prefix (KV) cache.
+
+    Keep one instance per chat session; a history that shrank (cleared or
+    replaced) starts the summary over.
+    """
+
+    def __init__(self, budget=CONTEXT_TOKEN_BUDGET, summarizer=None, count_tokens=estimate_tokens,
+                 max_recent_messages=MAX_RECENT_MESSAGES):
+        self.budget = budget
+        self.count_tokens = count_tokens
+        self.summarizer = summarizer if summarizer is not None else ExtractiveSummarizer(count_tokens)
+        self.max_recent_messages = max_recent_messages
+        self.summary = ""
+        self.summarized = 0     # Messages at the start of the history folded into the summary
+        self._sizes = []        # Token count of each history message, filled as messages arrive
+
+    def reset(self):
+        self.summary = ""
+        self.summarized = 0
+        self._sizes = []
+
+    def _recent(self, end, budget, max_messages):
+        """First message of the longest unsummarized run ending at ``end`` that fits, and its size"""
+        start, used = end, 0
+        while start > self.summarized and end - start < max_messages and used + self._sizes[start - 1] <= budget:
+            start -= 1
+            used += self._sizes[start]
+        return start, used
+
+    def window(self, history):
+        """Summary and verbatim recent messages for the next prompt.
+
+        Args:
+            history (list): Chat messages ({"role", "content"}), oldest first,
+                not including the question being asked
+
+        Returns:
+            dict: summary (str), messages (list of {"role", "content"}) and
+            tokens (estimated size of both)
+        """
+        if len(history) < len(self._sizes) or len(history) < self.summarized:
+            self.reset()
+        self._sizes.extend(self.count_tokens(message["content"]) for message in history[len(self._sizes):])
+
+        recent_budget = int(self.budget * RECENT_SHARE)
+        start, used = self._recent(len(history), recent_budget, self.max_recent_messages)
+        if start > self.summarized:
+            # Fold down to half the window, so the next few turns fit without
+            # touching the summary (and the prompt prefix) again
+            start, used = self._recent(len(history), recent_budget // 2, max(1, self.max_recent_messages // 2))
+            self.summary = self.summarizer.update(self.summary, history[self.summarized:start],
+                                                  self.budget - recent_budget)
+            self.summarized = start
+
+        messages = [{"role": message["role"], "content": message["content"]} for message in history[start:]]
+        return {"summary": self.summary, "messages": messages,
+                "tokens": self.count_tokens(self.summary) + used}
@@ -0,0 +1,327 @@
+# rag/embeddings.py - Batched chunk embedding with a content-addressed vector cache
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from config import EMBEDDING_MODEL, PROCESSED_DATA_DIR
+from rag.chunker import text_hash
+
+EMBEDDING_CACHE = os.path.join(PROCESSED_DATA_DIR, "embeddings.db")
+
+MAX_LENGTH = 512          # Tokens per sequence; longer chunks are truncated
+MAX_BATCH_SIZE = 32       # Sequences per batch
+MAX_BATCH_TOKENS = 8192   # Padded tokens per batch (batch size x longest sequence)
+WINDOW_SIZE = 1024        # Chunks looked up in the cache and embedded together
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model_id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    PRIMARY KEY (model_id, content_hash)
+) WITHOUT ROWID;
+"""
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class TransformerEncoder:
+    """Mean-pooled sentence embeddings from a Hugging Face encoder such as ``EMBEDDING_MODEL``.
+
+    ``model_name`` may also be a local directory. With ``quantize`` the linear
+    layers run in int8 (dynamic quantization), which is faster on CPU at a
+    small cost in accuracy; quantized vectors are cached under their own model id.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, device=None, max_length=MAX_LENGTH, quantize=False,
+                 local_files_only=False):
+        self.model_name = model_name
+        self.device = device
+        self.max_length = max_length
+        self.quantize = quantize
+        self.local_files_only = local_files_only
+        self.threads = None
+        self.model_id = f"{model_name}@{max_length}" + ("+int8" if quantize else "")
+        self._tokenizer = None
+        self._model = None
+
+    def __getstate__(self):
+        # Worker processes load their own copy of the model
+        return {**self.__dict__, "_tokenizer": None, "_model": None}
+
+    def _load(self):
+        if self._model is None:
+            import torch
+            from transformers import AutoTokenizer, AutoModel
+            from config import DEVICE
+
+            if self.threads:
+                torch.set_num_threads(self.threads)
+            self.device = self.device or DEVICE
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name, local_files_only=self.local_files_only)
+            model = AutoModel.from_pretrained(self.model_name, local_files_only=self.local_files_only).eval()
+            if self.quantize:
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                self.device = "cpu"
+            self._model = model.to(self.device)
+
+    def lengths(self, texts):
+        """Token count of each text, including special tokens"""
+        self._load()
+        encoded = self._tokenizer(texts, truncation=True, max_length=self.max_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def encode(self, texts):
+        import torch
+
+        self._load()
+        encoded = self._tokenizer(texts, padding=True, truncation=True, max_length=self.max_length,
+                                  return_tensors="pt").to(self.device)
+        with torch.inference_mode():
+            hidden = self._model(**encoded).last_hidden_state
+        mask = encoded["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        vectors = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        return normalize(vectors.float().cpu().numpy())
+
+
+class HashingEncoder:
+    """A tiny deterministic encoder with no download: each word is hashed to a
+    row of a seeded random matrix and a text is the mean of its rows.
+
+    Used in tests and where transformers is not installed. Batches are padded
+    like a real model's, so batching behaves the same way.
+    """
+
+    def __init__(self, dim=64, buckets=4096, max_length=MAX_LENGTH, seed=0):
+        self.dim = dim
+        self.buckets = buckets
+        self.max_length = max_length
+        self.model_id = f"hashing-{dim}x{buckets}-s{seed}@{max_length}"
+        self._table = np.random.default_rng(seed).standard_normal((buckets, dim)).astype(np.float32)
+
+    def _token_ids(self, text):
+        ids = [int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little") % self.buckets
+               for token in TOKEN_PATTERN.findall(text.lower())]
+        return ids[:self.max_length] or [0]
+
+    def lengths(self, texts):
+        return [min(len(TOKEN_PATTERN.findall(text)), self.max_length) or 1 for text in texts]
+
+    def encode(self, texts):
+        sequences = [self._token_ids(text) for text in texts]
+        ids = np.zeros((len(sequences), max(len(s) for s in sequences)), dtype=np.int64)
+        mask = np.zeros(ids.shape, dtype=np.float32)
+        for row, sequence in enumerate(sequences):
+            ids[row, :len(sequence)] = sequence
+            mask[row, :len(sequence)] = 1
+        vectors = (self._table[ids] * mask[..., None]).sum(axis=1) / mask.sum(axis=1, keepdims=True)
+        return normalize(vectors)
+
+
+def default_encoder(quantize=False):
+    """The transformer encoder when torch and transformers are installed, otherwise the hashing encoder"""
+    try:
+        import torch  # noqa: F401
+        import transformers  # noqa: F401
+    except ImportError:
+        print("torch or transformers is not installed; embedding with the hashing encoder")
+        return HashingEncoder()
+    return TransformerEncoder(quantize=quantize)
+
+
+def normalize(vectors):
+    """Scale rows to unit length so a dot product is the cosine similarity"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def length_batches(lengths, max_batch_size=MAX_BATCH_SIZE, max_batch_tokens=MAX_BATCH_TOKENS):
+    """Group item indexes into batches of similar length.
+
+    Items are taken longest first, and a batch is closed once its padded size
+    (items x longest item) would exceed ``max_batch_tokens``, so short chunks
+    are not padded up to the length of long ones.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches = []
+    batch = []
+    for i in order:
+        # Sorted longest first, so the batch's first item sets its padded length
+        if batch and (len(batch) >= max_batch_size or (len(batch) + 1) * lengths[batch[0]] > max_batch_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class EmbeddingCache:
+    """Vectors stored in SQLite under (model id, content hash)"""
+
+    def __init__(self, path=EMBEDDING_CACHE):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(CACHE_SCHEMA)
+
+    def get_many(self, model_id, hashes):
+        """Return {content hash: vector} for the hashes that are cached"""
+        found = {}
+        hashes = list(hashes)
+        for start in range(0, len(hashes), 500):
+            part = hashes[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT content_hash, vector FROM embeddings WHERE model_id = ? "
+                f"AND content_hash IN ({','.join('?' * len(part))})", [model_id, *part])
+            for content_hash, blob in rows:
+                found[content_hash] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model_id, vectors):
+        """Store a {content hash: vector} mapping"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model_id, content_hash, vector) VALUES (?, ?, ?)",
+                [(model_id, content_hash, np.asarray(vector, dtype=np.float32).tobytes())
+                 for content_hash, vector in vectors.items()])
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+_worker_encoder = None
+
+def _init_worker(encoder, threads):
+    global _worker_encoder
+    encoder.threads = threads
+    _worker_encoder = encoder
+
+def _encode_batch(texts):
+    return _worker_encoder.encode(texts)
+
+
+class EmbeddingService:
+    """Embeds chunks in length-sorted batches, computing only vectors not already cached.
+
+    With ``processes`` above one, batches are spread over worker processes that
+    each load the model once; each worker gets an equal share of the CPU threads.
+    ``stats`` reports how many chunks came from the cache, how many were
+    computed and the throughput in chunks per second.
+    """
+
+    def __init__(self, encoder=None, cache=None, processes=1, max_batch_size=MAX_BATCH_SIZE,
+                 max_batch_tokens=MAX_BATCH_TOKENS, window_size=WINDOW_SIZE):
+        self.encoder = encoder or default_encoder()
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self.processes = processes
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.window_size = window_size
+        self.stats = {}
+
+    @property
+    def model_id(self):
+        return self.encoder.model_id
+
+    def embed_query(self, text):
+        """Embed a single query, bypassing the cache"""
+        return self.encoder.encode([text])[0]
+
+    def embed_texts(self, texts):
+        """Embed a list of texts, returning a (len(texts), dim) array"""
+        items = [{"text": text, "content_hash": text_hash(text)} for text in texts]
+        vectors = [vector for _, vector in self.embed(items)]
+        return np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    def embed(self, chunks):
+        """Yield (chunk, vector) for each chunk of a stream, in input order.
+
+        Chunks need "text" and "content_hash" fields, as produced by rag.chunker.
+        """
+        self.stats = {"chunks": 0, "cached": 0, "computed": 0, "batches": 0,
+                      "tokens": 0, "padded_tokens": 0, "seconds": 0.0}
+        executor = None
+        if self.processes > 1:
+            threads = max(1, (os.cpu_count() or 1) // self.processes)
+            executor = ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker,
+                                           initargs=(self.encoder, threads))
+        try:
+            window = []
+            for chunk in chunks:
+                window.append(chunk)
+                if len(window) >= self.window_size:
+                    yield from self._embed_window(window, executor)
+                    window = []
+            if window:
+                yield from self._embed_window(window, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def _embed_window(self, window, executor):
+        vectors = self.cache.get_many(self.model_id, {chunk["content_hash"] for chunk in window})
+        self.stats["cached"] += sum(chunk["content_hash"] in vectors for chunk in window)
+
+        missing = {}
+        for chunk in window:
+            if chunk["content_hash"] not in vectors:
+                missing.setdefault(chunk["content_hash"], chunk["text"])
+        if missing:
+            computed = self._compute(list(missing.keys()), list(missing.values()), executor)
+            self.cache.put_many(self.model_id, computed)
+            vectors.update(computed)
+
+        self.stats["chunks"] += len(window)
+        for chunk in window:
+            yield chunk, vectors[chunk["content_hash"]]
+
+    def _compute(self, hashes, texts, executor):
+        started = time.perf_counter()
+        lengths = self.encoder.lengths(texts)
+        batches = length_batches(lengths, self.max_batch_size, self.max_batch_tokens)
+        batch_texts = [[texts[i] for i in batch] for batch in batches]
+        results = executor.map(_encode_batch, batch_texts) if executor else map(self.encoder.encode, batch_texts)
+
+        computed = {}
+        for batch, batch_vectors in zip(batches, results):
+            computed.update({hashes[i]: vector for i, vector in zip(batch, batch_vectors)})
+            self.stats["tokens"] += sum(lengths[i] for i in batch)
+            self.stats["padded_tokens"] += len(batch) * lengths[batch[0]]
+        self.stats["batches"] += len(batches)
+        self.stats["computed"] += len(texts)
+        self.stats["seconds"] += time.perf_counter() - started
+        return computed
+
+    @property
+    def chunks_per_second(self):
+        seconds = self.stats.get("seconds", 0)
+        return self.stats["computed"] / seconds if seconds else 0.0
+
+
+if __name__ == "__main__":
+    # Run from the project root: python -m rag.embeddings [--processes N] [--int8]
+    import argparse
+    from data.loaders.news_loader import iter_corpus
+    from rag.chunker import ChunkPipeline
+
+    parser = argparse.ArgumentParser(description="Embed the chunks of every stored document")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--int8", action="store_true", help="Use an int8-quantized model")
+    args = parser.parse_args()
+
+    # Re-embed every chunk; the cache makes unchanged ones free
+    service = EmbeddingService(default_encoder(quantize=args.int8), processes=args.processes)
+    chunks = ChunkPipeline(manifest_path=":memory:").run(iter_corpus())
+    for _ in service.embed(chunks):
+        pass
+    stats = service.stats
+    padding = stats["padded_tokens"] / stats["tokens"] - 1 if stats["tokens"] else 0
+    print(f"{stats['chunks']} chunks: {stats['cached']} cached, {stats['computed']} computed "
+          f"in {stats['seconds']:.1f}s ({service.chunks_per_second:.1f} chunks/s, {padding:.0%} padding)")
@@ -0,0 +1,101 @@
+# rag/index_benchmark.py - Recall and latency of the vector index against brute-force search
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+from rag.embeddings import normalize
+from rag.vector_index import VectorIndex
+
+NPROBES = [1, 2, 4, 8, 16, 32, 64]
+
+
+def synthetic_vectors(rows, dim, topics=1000, noise=0.6, seed=0):
+    """Unit vectors scattered around random topic directions, like embeddings of a news corpus"""
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((topics, dim)))
+    vectors = np.empty((rows, dim), dtype=np.float32)
+    for start in range(0, rows, 100000):
+        size = min(100000, rows - start)
+        vectors[start:start + size] = normalize(
+            centers[rng.integers(0, topics, size)] + noise / np.sqrt(dim) * rng.standard_normal((size, dim)))
+    return vectors
+
+
+def brute_force(vectors, queries, k):
+    """Exact top-k row numbers of each query"""
+    results = []
+    for query in queries:
+        scores = vectors @ query
+        top = np.argpartition(-scores, k)[:k]
+        results.append(top[np.argsort(-scores[top])])
+    return results
+
+
+def run_benchmark(rows=200000, dim=128, queries=200, k=5, nprobes=NPROBES, seed=0):
+    """Build an index over synthetic vectors and measure recall@k and latency per nprobe.
+
+    Returns:
+        list: One dict per setting, brute force first
+    """
+    vectors = synthetic_vectors(rows, dim, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    query_vectors = normalize(vectors[rng.integers(0, rows, queries)] + 0.3 / np.sqrt(dim) *
+                              rng.standard_normal((queries, dim))).astype(np.float32)
+
+    started = time.perf_counter()
+    truth = brute_force(vectors, query_vectors, k)
+    exact_ms = (time.perf_counter() - started) / queries * 1000
+    report = [{"setting": "brute force", "recall": 1.0, "p50_ms": exact_ms, "p95_ms": exact_ms}]
+
+    directory = tempfile.mkdtemp(prefix="vector_index_")
+    try:
+        index = VectorIndex(directory, auto_compact=False)
+        started = time.perf_counter()
+        for start in range(0, rows, 50000):
+            end = min(start + 50000, rows)
+            index.add([{"id": str(row)} for row in range(start, end)], vectors[start:end])
+        index.compact()
+        build_seconds = time.perf_counter() - started
+        index.close()
+
+        # Reopen to measure a cold, memory-mapped start
+        started = time.perf_counter()
+        index = VectorIndex(directory)
+        open_ms = (time.perf_counter() - started) * 1000
+
+        for nprobe in nprobes:
+            latencies, hits = [], 0
+            for query, expected in zip(query_vectors, truth):
+                started = time.perf_counter()
+                found = index.search(query, k=k, nprobe=nprobe)
+                latencies.append((time.perf_counter() - started) * 1000)
+                hits += len({int(result["id"]) for result in found} & set(expected.tolist()))
+            report.append({"setting": f"nprobe={nprobe}", "recall": hits / (queries * k),
+                           "p50_ms": float(np.percentile(latencies, 50)),
+                           "p95_ms": float(np.percentile(latencies, 95))})
+        index.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"{rows} vectors of dimension {dim}, {len(index.centroids)} lists: "
+          f"built in {build_seconds:.1f}s, opened in {open_ms:.1f}ms")
+    return report
+
+
+def print_report(report, k):
+    print(f"{'setting':<14}{f'recall@{k}':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for line in report:
+        print(f"{line['setting']:<14}{line['recall']:>10.3f}{line['p50_ms']:>10.2f}{line['p95_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    # Run from the project root: python -m rag.index_benchmark --rows 1000000 --dim 128
+    parser = argparse.ArgumentParser(description="Compare the vector index with brute-force search")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    print_report(run_benchmark(args.rows, args.dim, args.queries, args.k), args.k)
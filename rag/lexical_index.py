@@ -0,0 +1,299 @@
+# rag/lexical_index.py - BM25 inverted index over chunks with Turkish-aware normalization
+import os
+import re
+import math
+import pickle
+import threading
+import numpy as np
+from config import VECTOR_DB_DIR
+from data.symbol_search import TURKISH_FOLD, fold
+
+LEXICAL_INDEX_FILE = os.path.join(VECTOR_DB_DIR, "lexical.pkl")
+INDEX_FORMAT_VERSION = 1
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+COMMON_TERM_RATIO = 0.05 # Terms in more chunks than this only rescore chunks found through rarer terms
+MIN_STEM_LENGTH = 4      # Never strip a word below this many letters
+
+# Words, numbers with decimal or thousands separators ("6,8", "1.250"), and dotted codes ("KCHOL.E")
+TOKEN_PATTERN = re.compile(r"\w+(?:[.,]\w+)*", re.UNICODE)
+# Suffixes after an apostrophe in names: "THYAO'nun", "TCMB’nin"
+APOSTROPHE_SUFFIX = re.compile(r"['’]\w+", re.UNICODE)
+
+# Common Turkish inflectional suffixes after folding (plural, case and possessive endings), longest first
+SUFFIXES = sorted([
+    "lari", "leri", "larin", "lerin", "lar", "ler",
+    "nin", "nun", "dan", "den", "tan", "ten", "nda", "nde",
+    "da", "de", "ta", "te", "ya", "ye", "yi", "yu", "si", "su", "in", "un",
+    "i", "u", "a", "e"
+], key=len, reverse=True)
+
+# Folded Turkish function words, too frequent to help ranking
+STOPWORDS = {
+    "ve", "ile", "bir", "bu", "su", "o", "da", "de", "ki", "mi", "icin", "gibi", "daha", "en", "cok",
+    "olarak", "olan", "ise", "ya", "veya", "ama", "fakat", "ancak", "her", "hem", "kadar", "sonra",
+    "once", "gore", "uzere", "ne", "nasil", "neden", "hangi", "mu", "var", "yok", "ben", "sen", "biz"
+}
+
+POSTING_DTYPES = [np.uint8, np.uint16, np.uint32]
+
+TERM_CACHE_SIZE = 200000
+_term_cache = {}
+
+
+def stem(word):
+    """Strip up to two inflectional suffixes from a folded word"""
+    for _ in range(2):
+        for suffix in SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+                word = word[:-len(suffix)]
+                break
+        else:
+            break
+    return word
+
+
+def normalize_token(token):
+    """Index term of a single token, or None for a stopword"""
+    term = token.translate(TURKISH_FOLD).lower()
+    if not term.isascii():
+        term = fold(term)
+    if term in STOPWORDS:
+        return None
+    if token.isupper() or not term.isalpha():
+        return term
+    return stem(term)
+
+
+def tokenize(text):
+    """Index terms of a text.
+
+    Words are folded (Turkish letters and accents to ASCII) and stemmed.
+    Tickers, form codes and numbers, which hinge on their exact form, are
+    folded but never stemmed. Word frequencies are skewed, so most tokens
+    are normalized from a cache.
+    """
+    if len(_term_cache) > TERM_CACHE_SIZE:
+        _term_cache.clear()
+    terms = []
+    for token in TOKEN_PATTERN.findall(APOSTROPHE_SUFFIX.sub("", text)):
+        term = _term_cache.get(token, False)
+        if term is False:
+            term = _term_cache[token] = normalize_token(token)
+        if term is not None:
+            terms.append(term)
+    return terms
+
+
+def encode_postings(docs, counts):
+    """Compress a sorted posting list: doc id gaps in the narrowest integer type, counts as uint8"""
+    gaps = np.diff(docs)
+    width = next(i for i, dtype in enumerate(POSTING_DTYPES)
+                 if not len(gaps) or gaps.max() <= np.iinfo(dtype).max)
+    return (int(docs[0]), width, gaps.astype(POSTING_DTYPES[width]).tobytes(),
+            np.minimum(counts, 255).astype(np.uint8).tobytes())
+
+
+def decode_postings(posting):
+    first, width, gaps, counts = posting
+    docs = np.empty(len(counts), dtype=np.int64)
+    docs[0] = first
+    np.cumsum(np.frombuffer(gaps, dtype=POSTING_DTYPES[width]), out=docs[1:])
+    docs[1:] += first
+    return docs, np.frombuffer(counts, dtype=np.uint8)
+
+
+class LexicalIndex:
+    """BM25 keyword index over chunk texts.
+
+    Each term's posting list is stored compressed (see ``encode_postings``)
+    and decoded with numpy at query time. Added chunks are kept as batches of
+    (term id, chunk, count) arrays until ``compact`` (run on ``save``) merges
+    them in; removed chunks are flagged and dropped from the postings on the
+    next compaction.
+
+    Very common terms never produce candidates of their own: they only add
+    their score to chunks matched by the rarer query terms, which bounds the
+    work per query without changing the top results in practice.
+    """
+
+    def __init__(self, path=LEXICAL_INDEX_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self.chunk_ids = []
+        self.doc_of = {}
+        self.lengths = np.zeros(0, dtype=np.int32)
+        self.deleted = np.zeros(0, dtype=bool)
+        self.postings = {}
+        self.pending = []        # (term ids, docs, counts) per added batch
+        self.pending_terms = {}  # Term -> id within the pending batches
+        self._pending_arrays = None
+        self.removed = False
+        self.total_length = 0
+
+    @classmethod
+    def load(cls, path=LEXICAL_INDEX_FILE):
+        """Load a saved index, or return an empty one"""
+        index = cls(path)
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    state = pickle.load(f)
+                if state.get("version") == INDEX_FORMAT_VERSION:
+                    state.pop("version")
+                    index.__dict__.update(state)
+                    index.doc_of = {chunk_id: doc for doc, chunk_id in enumerate(index.chunk_ids)
+                                    if not index.deleted[doc]}
+            except (OSError, pickle.UnpicklingError, EOFError) as e:
+                print(f"Error loading lexical index: {e}")
+        return index
+
+    def save(self):
+        """Compact and write the index"""
+        with self._lock:
+            self.compact()
+            state = {key: getattr(self, key) for key in ["chunk_ids", "lengths", "deleted", "postings", "total_length"]}
+            state["version"] = INDEX_FORMAT_VERSION
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.path)
+
+    def __len__(self):
+        return len(self.doc_of)
+
+    def add(self, chunks):
+        """Index chunks (dicts with "id" and "text"), replacing chunks already indexed"""
+        with self._lock:
+            self.remove([chunk["id"] for chunk in chunks])
+            first = len(self.chunk_ids)
+            term_lists = [tokenize(" ".join(filter(None, [chunk.get("text"), " ".join(chunk.get("symbols") or [])])))
+                          for chunk in chunks]
+            lengths = np.fromiter(map(len, term_lists), dtype=np.int64, count=len(chunks))
+            term_id = self.pending_terms.setdefault
+            terms = np.fromiter((term_id(term, len(self.pending_terms)) for terms in term_lists for term in terms),
+                                dtype=np.int64, count=int(lengths.sum()))
+            docs = np.repeat(np.arange(first, first + len(chunks), dtype=np.int64), lengths)
+            # One key per (doc, term) pair; its count is the term frequency
+            keys, counts = np.unique(docs << 32 | terms, return_counts=True)
+            self.pending.append((keys & 0xFFFFFFFF, keys >> 32, counts))
+            self._pending_arrays = None
+
+            for doc, chunk in enumerate(chunks, start=first):
+                self.chunk_ids.append(chunk["id"])
+                self.doc_of[chunk["id"]] = doc
+            self.lengths = np.concatenate([self.lengths, lengths.astype(np.int32)])
+            self.deleted = np.concatenate([self.deleted, np.zeros(len(chunks), dtype=bool)])
+            self.total_length += int(lengths.sum())
+
+    def remove(self, chunk_ids):
+        """Delete chunks by id; returns the number removed"""
+        with self._lock:
+            docs = [self.doc_of.pop(chunk_id) for chunk_id in chunk_ids if chunk_id in self.doc_of]
+            self.deleted[docs] = True
+            self.removed = self.removed or bool(docs)
+            self.total_length -= int(self.lengths[docs].sum())
+            return len(docs)
+
+    def compact(self):
+        """Merge pending postings into the compressed lists, dropping deleted chunks"""
+        with self._lock:
+            # Group the pending postings by term, in doc order within a term
+            added = {}
+            if self.pending:
+                terms, docs, counts = self._pending()
+                order = np.lexsort((docs, terms))
+                terms, docs, counts = terms[order], docs[order], counts[order]
+                starts = np.flatnonzero(np.concatenate([[True], terms[1:] != terms[:-1]]))
+                names = list(self.pending_terms)
+                for start, end in zip(starts, np.append(starts[1:], len(terms))):
+                    added[names[terms[start]]] = (docs[start:end], counts[start:end])
+
+            # Removals touch every list; otherwise only terms with pending postings change
+            for term in set(self.postings) | set(added) if self.removed else list(added):
+                parts = [decode_postings(self.postings[term])] if term in self.postings else []
+                if term in added:
+                    parts.append(added[term])
+                docs = np.concatenate([part[0] for part in parts])
+                counts = np.concatenate([part[1] for part in parts])
+                live = ~self.deleted[docs]
+                if live.any():
+                    self.postings[term] = encode_postings(docs[live], counts[live])
+                else:
+                    self.postings.pop(term, None)
+
+            self.pending = []
+            self.pending_terms = {}
+            self._pending_arrays = None
+            self.removed = False
+
+    def _pending(self):
+        if self._pending_arrays is None:
+            self._pending_arrays = tuple(np.concatenate([batch[i] for batch in self.pending]) for i in range(3))
+        return self._pending_arrays
+
+    def _term_postings(self, term):
+        parts = []
+        if term in self.postings:
+            parts.append(decode_postings(self.postings[term]))
+        if term in self.pending_terms:
+            terms, docs, counts = self._pending()
+            mask = terms == self.pending_terms[term]
+            parts.append((docs[mask], counts[mask]))
+        if not parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts]).astype(np.int64)
+
+    def _bm25(self, docs, counts, live, average_length, df=None):
+        df = len(docs) if df is None else df
+        idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[docs] / average_length)
+        return idf * counts * (BM25_K1 + 1) / (counts + norm)
+
+    def search(self, query, k=10):
+        """Return up to ``k`` (chunk id, BM25 score) pairs, best first"""
+        terms = set(tokenize(query))
+        with self._lock:
+            live = len(self.doc_of)
+            if not terms or not live:
+                return []
+            average_length = self.total_length / live
+            postings = sorted(((term, *self._term_postings(term)) for term in terms), key=lambda p: len(p[1]))
+            postings = [p for p in postings if len(p[1])]
+            if not postings:
+                return []
+            # The rarest term always produces candidates, even if every term is common
+            limit = max(COMMON_TERM_RATIO * live, len(postings[0][1]))
+            rare = [p for p in postings if len(p[1]) <= limit]
+            common = postings[len(rare):]
+
+            doc_parts, score_parts = [], []
+            for _, docs, counts in rare:
+                doc_parts.append(docs)
+                score_parts.append(self._bm25(docs, counts, live, average_length))
+            docs = np.concatenate(doc_parts)
+            scores = np.concatenate(score_parts)
+            # Sum each document's term scores: densely for long postings, by sorting for short ones
+            if len(docs) * 8 > len(self.chunk_ids):
+                totals = np.bincount(docs, weights=scores, minlength=len(self.chunk_ids))
+                docs = np.flatnonzero(totals)
+                scores = totals[docs]
+            else:
+                docs, inverse = np.unique(docs, return_inverse=True)
+                scores = np.bincount(inverse, weights=scores)
+
+            for _, term_docs, counts in common:
+                # Compacted postings are sorted; pending ones follow them in doc order as well
+                found = np.minimum(np.searchsorted(term_docs, docs), len(term_docs) - 1)
+                hit = term_docs[found] == docs
+                scores[hit] += self._bm25(docs[hit], counts[found[hit]], live, average_length, len(term_docs))
+
+            keep = ~self.deleted[docs]
+            docs, scores = docs[keep], scores[keep]
+
+            if len(docs) > k:
+                top = np.argpartition(-scores, k)[:k]
+                docs, scores = docs[top], scores[top]
+            best = np.argsort(-scores)
+            return [(self.chunk_ids[doc], float(score)) for doc, score in zip(docs[best], scores[best])]
@@ -0,0 +1,169 @@
+# rag/retrieval.py - Hybrid keyword + vector retrieval fused by reciprocal rank
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import TOP_K_RETRIEVAL
+from rag.chunker import ChunkPipeline
+from rag.embeddings import EmbeddingService
+from rag.lexical_index import LexicalIndex
+from rag.vector_index import VectorIndex
+
+RRF_K = 60               # Rank offset in reciprocal rank fusion; damps the weight of the very top ranks
+CANDIDATE_FACTOR = 4     # Candidates fetched from each retriever per result
+INDEX_BATCH_SIZE = 1024
+
+_shared_retriever = None
+_shared_retriever_lock = threading.Lock()
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Merge ranked id lists: each id scores the sum of 1 / (k + rank) over the lists it appears in.
+
+    Returns:
+        list: (id, score) pairs, best first
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever:
+    """Retrieves chunks with BM25 and vector search at once and fuses the rankings.
+
+    Keyword search catches exact tickers, form codes and figures that dense
+    retrieval misses; vector search catches paraphrases. Both run on a small
+    thread pool per query. The vector side is skipped while its index is empty,
+    so the embedding model is not loaded for nothing.
+    """
+
+    def __init__(self, vector_index=None, lexical_index=None, embedder=None):
+        self.embedder = embedder if embedder is not None else EmbeddingService()
+        self.vector_index = vector_index if vector_index is not None else VectorIndex(model_id=self.embedder.model_id)
+        self.lexical_index = lexical_index if lexical_index is not None else LexicalIndex.load()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="retrieval")
+
+    def add(self, chunks, vectors):
+        self.vector_index.add(chunks, vectors)
+        self.lexical_index.add(chunks)
+
+    def remove(self, chunk_ids):
+        chunk_ids = list(chunk_ids)
+        self.vector_index.remove(chunk_ids)
+        self.lexical_index.remove(chunk_ids)
+
+    def save(self):
+        # The vector index persists every change itself
+        self.lexical_index.save()
+
+    @property
+    def version(self):
+        """Changes whenever chunks are added to or removed from the indexes"""
+        return f"{self.vector_index.meta['next_row']}-{len(self.vector_index)}"
+
+    def _vector_search(self, query, vector, k, filters, timings):
+        started = time.perf_counter()
+        if not self.vector_index.dim:
+            return []
+        if vector is None:
+            try:
+                vector = self.embedder.embed_query(query)
+            except (ImportError, OSError) as e:
+                print(f"Error embedding query: {e}")
+                return []
+        timings["embed_ms"] = (time.perf_counter() - started) * 1000
+        results = self.vector_index.search(vector, k=k, **filters)
+        timings["vector_ms"] = (time.perf_counter() - started) * 1000
+        return results
+
+    def _lexical_search(self, query, k, timings):
+        started = time.perf_counter()
+        results = self.lexical_index.search(query, k=k)
+        timings["lexical_ms"] = (time.perf_counter() - started) * 1000
+        return results
+
+    def retrieve(self, query, k=TOP_K_RETRIEVAL, timings=None, query_vector=None, **filters):
+        """Return the ``k`` best chunks for a query.
+
+        Args:
+            query (str): Question or keywords
+            k (int): Number of chunks
+            timings (dict): If given, filled with the embed, vector, lexical and total time in ms
+            query_vector: The query's embedding, if the caller already has it
+            **filters: symbols, sources, since and until, as in VectorIndex.search
+
+        Returns:
+            list: Chunk payloads with an RRF "score" and each retriever's rank
+        """
+        started = time.perf_counter()
+        timings = timings if timings is not None else {}
+        candidates = k * CANDIDATE_FACTOR
+        vector_future = self._executor.submit(self._vector_search, query, query_vector, candidates, filters, timings)
+        lexical_future = self._executor.submit(self._lexical_search, query, candidates, timings)
+        vector_hits = vector_future.result()
+        lexical_hits = lexical_future.result()
+
+        vector_ranking = [hit["id"] for hit in vector_hits]
+        lexical_ranking = [chunk_id for chunk_id, _ in lexical_hits]
+        fused = reciprocal_rank_fusion([vector_ranking, lexical_ranking])
+
+        # Keyword hits carry no payload yet, and have not been through the filters
+        payloads = {hit["id"]: hit for hit in vector_hits}
+        payloads.update(self.vector_index.get([chunk_id for chunk_id, _ in fused if chunk_id not in payloads],
+                                              **filters))
+        vector_ranks = {chunk_id: rank for rank, chunk_id in enumerate(vector_ranking, start=1)}
+        lexical_ranks = {chunk_id: rank for rank, chunk_id in enumerate(lexical_ranking, start=1)}
+
+        results = []
+        for chunk_id, score in fused:
+            if chunk_id in payloads:
+                results.append({**payloads[chunk_id], "score": score,
+                                "vector_rank": vector_ranks.get(chunk_id), "lexical_rank": lexical_ranks.get(chunk_id)})
+                if len(results) == k:
+                    break
+        timings["total_ms"] = (time.perf_counter() - started) * 1000
+        return results
+
+
+def get_retriever():
+    """Return the process-wide retriever, loading the indexes on first use"""
+    global _shared_retriever
+    with _shared_retriever_lock:
+        if _shared_retriever is None:
+            _shared_retriever = HybridRetriever()
+        return _shared_retriever
+
+
+def index_documents(documents, retriever=None, pipeline=None):
+    """Chunk, embed and index new or changed documents, and drop chunks that disappeared.
+
+    Returns:
+        dict: Chunking statistics
+    """
+    retriever = retriever if retriever is not None else get_retriever()
+    pipeline = pipeline if pipeline is not None else ChunkPipeline()
+    batch = []
+    for chunk, vector in retriever.embedder.embed(pipeline.run(documents)):
+        batch.append((chunk, vector))
+        if len(batch) >= INDEX_BATCH_SIZE:
+            retriever.add([c for c, _ in batch], [v for _, v in batch])
+            batch = []
+    if batch:
+        retriever.add([c for c, _ in batch], [v for _, v in batch])
+    retriever.remove(pipeline.deleted_ids)
+    retriever.save()
+    return pipeline.stats
+
+
+if __name__ == "__main__":
+    # Run from the project root: python -m rag.retrieval
+    from data.entity_linker import get_entity_linker
+    from data.loaders.news_loader import iter_corpus
+
+    started = time.perf_counter()
+    retriever = get_retriever()
+    # Chunks carry the tickers their document mentions, for the symbols filter
+    stats = index_documents(get_entity_linker().tag(iter_corpus()), retriever)
+    print(f"{stats['chunks']} chunks indexed, {len(retriever.vector_index)} in total, "
+          f"in {time.perf_counter() - started:.1f}s")
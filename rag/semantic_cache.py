@@ -0,0 +1,123 @@
+# rag/semantic_cache.py - Reuses answers to near-identical questions from similar investors
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import Counter
+from config import VECTOR_DB_DIR
+from data.symbol_search import fold
+from rag.vector_index import VectorIndex
+
+SEMANTIC_CACHE_DIR = os.path.join(VECTOR_DB_DIR, "responses")
+
+SIMILARITY_THRESHOLD = 0.92   # Cosine similarity above which two questions get the same answer
+CACHE_TTL = 3600              # Seconds an answer stays valid even if no data changed
+PROFILE_KEYS = ["risk_profile", "investment_goals"]
+
+
+def normalize_query(query):
+    """Fold case, Turkish letters and punctuation so trivially different questions match exactly"""
+    return " ".join(re.findall(r"\w+", fold(query)))
+
+
+class SemanticCache:
+    """Answers keyed by question embedding, investor profile and data version.
+
+    The profile attributes that shape an answer and the version of the data it
+    was built from form a partition; a lookup only considers answers in its own
+    partition, so new news or prices make older answers unreachable. Within a
+    partition, an exactly matching (normalized) question is found without
+    embedding anything; otherwise the nearest cached question is used if it is
+    similar enough. Answers also expire after ``ttl`` seconds; the index
+    reclaims the space of expired and purged answers once they pile up.
+    """
+
+    def __init__(self, embedder, directory=SEMANTIC_CACHE_DIR, threshold=SIMILARITY_THRESHOLD, ttl=CACHE_TTL):
+        self.embedder = embedder
+        self.index = VectorIndex(directory, model_id=embedder.model_id)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._last_version = None
+        self._embedding_failed = False
+
+    @staticmethod
+    def partition(user_profile, version):
+        key = "|".join([str(user_profile.get(name, "")) for name in PROFILE_KEYS] + [str(version)])
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+    def _entry_id(self, query, partition):
+        return f"{partition}:{hashlib.sha1(normalize_query(query).encode('utf-8')).hexdigest()}"
+
+    def _embed(self, query):
+        if self._embedding_failed:
+            return None
+        try:
+            return self.embedder.embed_query(query)
+        except (ImportError, OSError) as e:
+            # Without an embedding model there is nothing to compare questions with
+            print(f"Semantic cache disabled: {e}")
+            self._embedding_failed = True
+            return None
+
+    def _fresh(self, entry):
+        if time.time() - entry["created"] <= self.ttl:
+            return True
+        self.index.remove([entry["id"]])
+        self._count("expired")
+        return False
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def lookup(self, query, user_profile, version):
+        """Find a cached answer.
+
+        Returns:
+            tuple: (response dict or None, query vector or None); pass the
+            vector on to retrieval and ``store`` so the query is embedded once
+        """
+        self._count("lookups")
+        partition = self.partition(user_profile, version)
+        exact = self.index.get([self._entry_id(query, partition)]).values()
+        for entry in exact:
+            if self._fresh(entry):
+                self._count("exact_hits")
+                return entry["response"], None
+
+        vector = self._embed(query)
+        if vector is not None and self.index.dim:
+            for entry in self.index.search(vector, k=1, sources=[partition]):
+                if entry["score"] >= self.threshold and self._fresh(entry):
+                    self._count("semantic_hits")
+                    return entry["response"], vector
+        self._count("misses")
+        return None, vector
+
+    def store(self, query, user_profile, version, response, vector=None):
+        """Cache an answer ({"answer", "sources"}) under the question and partition"""
+        if vector is None:
+            vector = self._embed(query)
+            if vector is None:
+                return
+        if version != self._last_version:
+            self._last_version = version
+            self.purge(version)
+        partition = self.partition(user_profile, version)
+        self.index.add([{"id": self._entry_id(query, partition), "source": partition, "query": query,
+                         "response": response, "version": str(version), "created": time.time()}], [vector])
+
+    def purge(self, version=None):
+        """Drop expired answers and answers built from data other than ``version``"""
+        stale = self.index.select_ids(
+            "json_extract(payload, '$.created') < ? OR (? IS NOT NULL AND json_extract(payload, '$.version') != ?)",
+            (time.time() - self.ttl, version, str(version)))
+        return self.index.remove(stale)
+
+    @property
+    def hit_rate(self):
+        lookups = self.stats["lookups"]
+        return (self.stats["exact_hits"] + self.stats["semantic_hits"]) / lookups if lookups else 0.0
@@ -0,0 +1,469 @@
+# rag/vector_index.py - On-disk IVF vector index over memory-mapped, 8-bit quantized vectors
+import os
+import json
+import sqlite3
+import threading
+import numpy as np
+from config import TOP_K_RETRIEVAL, VECTOR_DB_DIR
+from rag.embeddings import normalize
+
+INDEX_DIR = os.path.join(VECTOR_DB_DIR, "chunks")
+
+NPROBE = 16                  # Inverted lists scanned per query
+RERANK_FACTOR = 4            # Candidates per result re-scored with the float16 vectors
+EXACT_SEARCH_LIMIT = 20000   # Filters matching fewer rows than this are searched exactly
+COMPACT_RATIO = 0.1          # Re-cluster once the unindexed tail outgrows this share of the index
+RECLAIM_RATIO = 0.25         # Rewrite the per-row files once deleted rows reach this share of them
+MIN_INDEX_ROWS = 4096        # Smaller indexes are searched by brute force only
+TRAIN_SAMPLE_PER_LIST = 32   # k-means sample size per inverted list
+KMEANS_ITERATIONS = 10
+ASSIGN_BATCH = 65536
+NO_DATE = np.iinfo(np.int32).min
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    row INTEGER PRIMARY KEY,
+    chunk_id TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    symbol TEXT NOT NULL,
+    row INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS symbols_symbol ON symbols (symbol, row);
+CREATE TABLE IF NOT EXISTS sources (
+    code INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+"""
+
+
+def date_code(value):
+    """Days since 1970-01-01 of an ISO date or datetime, or NO_DATE"""
+    if not value:
+        return NO_DATE
+    try:
+        return int(np.datetime64(str(value)[:10], "D").astype(np.int64))
+    except ValueError:
+        return NO_DATE
+
+
+def quantize(vectors):
+    """Scalar-quantize unit vectors to int8 codes with one scale per vector.
+
+    A vector is approximately ``codes * scale``; a dot product with a query is
+    ``(codes @ query) * scale``.
+    """
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def train_centroids(vectors, nlist, iterations=KMEANS_ITERATIONS, seed=0):
+    """Spherical k-means on a sample of the vectors"""
+    rng = np.random.default_rng(seed)
+    size = min(len(vectors), nlist * TRAIN_SAMPLE_PER_LIST)
+    sample = normalize(vectors[np.sort(rng.choice(len(vectors), size, replace=False))].astype(np.float32))
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=nlist)
+        filled = np.flatnonzero(counts)
+        sums = np.add.reduceat(sample[order], np.concatenate([[0], np.cumsum(counts)[:-1]])[filled])
+        centroids[filled] = normalize(sums)
+        # Reseed empty lists from random sample points
+        empty = np.flatnonzero(counts == 0)
+        centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+    return centroids
+
+
+def assign_lists(vectors, centroids):
+    """Nearest centroid of each vector, computed in batches"""
+    return np.concatenate([
+        np.argmax(vectors[start:start + ASSIGN_BATCH].astype(np.float32) @ centroids.T, axis=1)
+        for start in range(0, len(vectors), ASSIGN_BATCH)
+    ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+
+class VectorIndex:
+    """Approximate nearest-neighbour index of chunk vectors (inner product on unit vectors).
+
+    Candidates are scored on int8 codes with a scale per vector, which are a
+    quarter of the float32 size and cheap to decode; the best few are then
+    re-scored on a float16 copy. The codes mostly sit in an inverted-file
+    (IVF) segment, sorted by their nearest k-means centroid, and both it and
+    the float16 copy are memory-mapped on open, so startup does not read them
+    and a query only touches the ``nprobe`` lists closest to it. Newly added
+    vectors are appended to a small tail that is searched exactly until
+    ``compact`` re-clusters everything.
+
+    Each row also has a scale, date and source column kept in memory and a deleted
+    flag, while chunk ids, payloads and ticker symbols live in SQLite. Adding a
+    chunk id that is already indexed replaces it. Removed rows are only flagged
+    until they make up ``RECLAIM_RATIO`` of the index; ``reclaim`` then
+    rewrites every per-row file without them.
+    """
+
+    def __init__(self, directory=INDEX_DIR, model_id=None, nprobe=NPROBE, auto_compact=True):
+        self.directory = directory
+        self.nprobe = nprobe
+        self.auto_compact = auto_compact
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+
+        self.meta = {"dim": None, "model_id": model_id, "next_row": 0, "indexed": 0}
+        if os.path.exists(self._path("meta.json")):
+            with open(self._path("meta.json"), encoding="utf-8") as f:
+                self.meta.update(json.load(f))
+        if model_id and self.meta["model_id"] != model_id:
+            raise ValueError(f"Index in {directory} holds vectors of {self.meta['model_id']}, not {model_id}")
+
+        self.conn = sqlite3.connect(self._path("meta.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._sources = {name: code for code, name in self.conn.execute("SELECT code, name FROM sources")}
+        self._load()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read(self, name, dtype):
+        path = self._path(name)
+        return np.fromfile(path, dtype=dtype) if os.path.exists(path) else np.zeros(0, dtype=dtype)
+
+    def _append(self, name, array):
+        with open(self._path(name), "ab") as f:
+            f.write(np.ascontiguousarray(array).tobytes())
+
+    def _save_meta(self):
+        temp_path = self._path("meta.json.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(temp_path, self._path("meta.json"))
+
+    def _load(self):
+        rows = self.meta["next_row"]
+        dim = self.meta["dim"] or 0
+        # Anything past next_row was written by an add that never completed
+        self.scale = self._read("scale.f4", np.float32)[:rows]
+        self.published = self._read("published.i4", np.int32)[:rows]
+        self.source = self._read("source.i4", np.int32)[:rows]
+        self.deleted = self._read("deleted.u1", np.uint8)[:rows]
+        with self.conn:
+            self.conn.execute("DELETE FROM chunks WHERE row >= ?", (rows,))
+            self.conn.execute("DELETE FROM symbols WHERE row >= ?", (rows,))
+
+        self.tail_rows = self._read("tail_rows.i8", np.int64)
+        tail = self._read("tail.i8", np.int8)
+        self.tail = tail[:len(tail) // dim * dim].reshape(-1, dim) if dim else tail.reshape(0, 0)
+        complete = self.tail_rows[:len(self.tail)] < rows
+        self.tail_rows, self.tail = self.tail_rows[:len(self.tail)][complete], self.tail[complete]
+
+        self._map_vectors()
+        indexed = self.meta["indexed"]
+        if indexed:
+            self.centroids = np.load(self._path("centroids.npy"))
+            self.offsets = np.load(self._path("offsets.npy"))
+            self.ivf_rows = np.asarray(np.load(self._path("ivf_rows.npy"), mmap_mode="r"))
+            # A plain ndarray view slices faster than the np.memmap subclass
+            self.ivf = np.asarray(np.memmap(self._path("ivf.i8"), dtype=np.int8, mode="r", shape=(indexed, dim)))
+        else:
+            self.centroids = self.offsets = self.ivf_rows = self.ivf = None
+        self._locations = None
+
+    def _map_vectors(self):
+        rows, dim = self.meta["next_row"], self.meta["dim"] or 0
+        if rows and dim:
+            self.vectors = np.asarray(np.memmap(self._path("vectors.f16"), dtype=np.float16, mode="r",
+                                                shape=(rows, dim)))
+        else:
+            self.vectors = np.zeros((0, dim), dtype=np.float16)
+
+    def __len__(self):
+        return int(len(self.deleted) - self.deleted.sum())
+
+    @property
+    def dim(self):
+        return self.meta["dim"]
+
+    def _source_code(self, name):
+        name = name or ""
+        if name not in self._sources:
+            cursor = self.conn.execute("INSERT INTO sources (name) VALUES (?)", (name,))
+            self._sources[name] = cursor.lastrowid
+        return self._sources[name]
+
+    def add(self, chunks, vectors):
+        """Index chunks (dicts with an "id") with their vectors, replacing chunks already indexed"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(chunks), -1)
+        if not len(chunks):
+            return
+        with self._lock:
+            if self.meta["dim"] is None:
+                self.meta["dim"] = vectors.shape[1]
+                self.tail = self.tail.reshape(0, self.meta["dim"])
+            if vectors.shape[1] != self.meta["dim"]:
+                raise ValueError(f"Expected vectors of dimension {self.meta['dim']}, got {vectors.shape[1]}")
+            self.remove([chunk["id"] for chunk in chunks])
+
+            start = self.meta["next_row"]
+            rows = np.arange(start, start + len(chunks), dtype=np.int64)
+            published = np.array([date_code(chunk.get("published")) for chunk in chunks], dtype=np.int32)
+            sources = np.array([self._source_code(chunk.get("source")) for chunk in chunks], dtype=np.int32)
+            vectors = normalize(vectors)
+            stored, scales = quantize(vectors)
+
+            for name, array in [("scale.f4", scales), ("published.i4", published), ("source.i4", sources),
+                                ("deleted.u1", np.zeros(len(chunks), dtype=np.uint8)),
+                                ("vectors.f16", vectors.astype(np.float16)), ("tail.i8", stored),
+                                ("tail_rows.i8", rows)]:
+                self._append(name, array)
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO chunks (row, chunk_id, payload) VALUES (?, ?, ?)",
+                                      [(int(row), chunk["id"], json.dumps(chunk, ensure_ascii=False))
+                                       for row, chunk in zip(rows, chunks)])
+                self.conn.executemany("INSERT INTO symbols (symbol, row) VALUES (?, ?)",
+                                      [(symbol.upper(), int(row)) for row, chunk in zip(rows, chunks)
+                                       for symbol in chunk.get("symbols") or []])
+            self.meta["next_row"] = start + len(chunks)
+            self._save_meta()
+
+            self.scale = np.concatenate([self.scale, scales])
+            self.published = np.concatenate([self.published, published])
+            self.source = np.concatenate([self.source, sources])
+            self.deleted = np.concatenate([self.deleted, np.zeros(len(chunks), dtype=np.uint8)])
+            self.tail = np.concatenate([self.tail, stored])
+            self.tail_rows = np.concatenate([self.tail_rows, rows])
+            self._locations = None
+            self._map_vectors()
+
+            if self.auto_compact and self.needs_compaction:
+                self.compact()
+
+    def remove(self, chunk_ids):
+        """Delete chunks by id; returns the number removed"""
+        chunk_ids = list(chunk_ids)
+        with self._lock:
+            rows = []
+            for start in range(0, len(chunk_ids), 500):
+                part = chunk_ids[start:start + 500]
+                rows += [row for (row,) in self.conn.execute(
+                    f"SELECT row FROM chunks WHERE chunk_id IN ({','.join('?' * len(part))})", part)]
+            if not rows:
+                return 0
+            with open(self._path("deleted.u1"), "r+b") as f:
+                for row in rows:
+                    f.seek(row)
+                    f.write(b"\x01")
+            self.deleted[rows] = 1
+            with self.conn:
+                self.conn.executemany("DELETE FROM chunks WHERE row = ?", [(row,) for row in rows])
+                self.conn.executemany("DELETE FROM symbols WHERE row = ?", [(row,) for row in rows])
+            if self.auto_compact and self.needs_reclaim:
+                self.reclaim()
+            return len(rows)
+
+    @property
+    def needs_reclaim(self):
+        return bool(len(self.deleted)) and self.deleted.sum() >= RECLAIM_RATIO * len(self.deleted)
+
+    def reclaim(self):
+        """Drop deleted rows from every per-row file and renumber the live rows in order"""
+        with self._lock:
+            live = np.flatnonzero(self.deleted == 0)
+            renumber = np.full(len(self.deleted), -1, dtype=np.int64)
+            renumber[live] = np.arange(len(live))
+            dim = self.meta["dim"] or 0
+
+            # Live rows only move down, so renumbering them in order never collides with a row still to move
+            moved = [(int(renumber[row]), int(row)) for row in live if renumber[row] != row]
+            with self.conn:
+                self.conn.executemany("UPDATE chunks SET row = ? WHERE row = ?", moved)
+                self.conn.executemany("UPDATE symbols SET row = ? WHERE row = ?", moved)
+
+            tail_live = renumber[self.tail_rows] >= 0
+            files = [("scale.f4", self.scale[live]), ("published.i4", self.published[live]),
+                     ("source.i4", self.source[live]), ("deleted.u1", np.zeros(len(live), dtype=np.uint8)),
+                     ("vectors.f16", self.vectors[live] if dim else self.vectors),
+                     ("tail.i8", self.tail[tail_live]), ("tail_rows.i8", renumber[self.tail_rows[tail_live]])]
+            if self.ivf is not None:
+                ivf_live = renumber[self.ivf_rows] >= 0
+                lists = np.repeat(np.arange(len(self.centroids)), np.diff(self.offsets))
+                offsets = np.concatenate([[0], np.cumsum(np.bincount(lists[ivf_live], minlength=len(self.centroids)))])
+                files += [("ivf.i8", self.ivf[ivf_live]), ("offsets.npy", offsets),
+                          ("ivf_rows.npy", renumber[self.ivf_rows[ivf_live]])]
+                self.meta["indexed"] = int(ivf_live.sum())
+
+            self.vectors = self.ivf = self.ivf_rows = None
+            for name, array in files:
+                with open(self._path(name + ".tmp"), "wb") as f:
+                    if name.endswith(".npy"):
+                        np.save(f, array)
+                    else:
+                        f.write(np.ascontiguousarray(array).tobytes())
+                os.replace(self._path(name + ".tmp"), self._path(name))
+            self.meta["next_row"] = len(live)
+            self._save_meta()
+            self._load()
+
+    @property
+    def needs_compaction(self):
+        tail = len(self.tail_rows)
+        if not self.meta["indexed"]:
+            return tail >= MIN_INDEX_ROWS
+        return tail > COMPACT_RATIO * self.meta["indexed"]
+
+    def compact(self, nlist=None):
+        """Re-cluster every live vector into the IVF segment, dropping deleted rows"""
+        with self._lock:
+            parts, rows = [], []
+            if self.ivf is not None:
+                live = ~self.deleted[self.ivf_rows].astype(bool)
+                parts.append(self.ivf[live])
+                rows.append(self.ivf_rows[live])
+            live = ~self.deleted[self.tail_rows].astype(bool)
+            parts.append(self.tail[live])
+            rows.append(self.tail_rows[live])
+            vectors = np.concatenate(parts)
+            rows = np.concatenate(rows)
+            if not len(vectors):
+                return
+
+            nlist = nlist or max(1, min(int(np.sqrt(len(vectors))), len(vectors)))
+            centroids = train_centroids(vectors, nlist)
+            assign = assign_lists(vectors, centroids)
+            order = np.argsort(assign, kind="stable")
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+
+            self.ivf = self.ivf_rows = None
+            for name, array in [("centroids.npy", centroids), ("offsets.npy", offsets), ("ivf_rows.npy", rows[order])]:
+                with open(self._path(name + ".tmp"), "wb") as f:
+                    np.save(f, array)
+                os.replace(self._path(name + ".tmp"), self._path(name))
+            vectors[order].tofile(self._path("ivf.i8.tmp"))
+            os.replace(self._path("ivf.i8.tmp"), self._path("ivf.i8"))
+            for name in ["tail.i8", "tail_rows.i8"]:
+                open(self._path(name), "wb").close()
+
+            self.meta["indexed"] = len(vectors)
+            self._save_meta()
+            self._load()
+
+    def _filter(self, symbols, sources, since, until):
+        """Rows a query may return: live rows matching every given filter"""
+        allowed = self.deleted == 0
+        if symbols:
+            symbols = [symbol.upper() for symbol in symbols]
+            matching = np.fromiter((row for (row,) in self.conn.execute(
+                f"SELECT row FROM symbols WHERE symbol IN ({','.join('?' * len(symbols))})", symbols)), dtype=np.int64)
+            mask = np.zeros(len(allowed), dtype=bool)
+            mask[matching] = True
+            allowed &= mask
+        if sources:
+            allowed &= np.isin(self.source, [self._sources[name] for name in sources if name in self._sources])
+        if since:
+            allowed &= self.published >= date_code(since)
+        if until:
+            allowed &= (self.published <= date_code(until)) & (self.published != NO_DATE)
+        return allowed
+
+    def _vectors_of(self, rows):
+        """Int8 codes of arbitrary rows, from the IVF segment or the tail"""
+        if self._locations is None:
+            locations = np.zeros(len(self.deleted), dtype=np.int64)
+            if self.ivf_rows is not None:
+                locations[self.ivf_rows] = np.arange(len(self.ivf_rows))
+            locations[self.tail_rows] = -1 - np.arange(len(self.tail_rows))
+            self._locations = locations
+        locations = self._locations[rows]
+        vectors = np.empty((len(rows), self.meta["dim"]), dtype=np.int8)
+        in_ivf = locations >= 0
+        if in_ivf.any():
+            vectors[in_ivf] = self.ivf[locations[in_ivf]]
+        vectors[~in_ivf] = self.tail[-1 - locations[~in_ivf]]
+        return vectors
+
+    def search(self, vector, k=TOP_K_RETRIEVAL, symbols=None, sources=None, since=None, until=None, nprobe=None):
+        """Return the ``k`` chunks closest to a query vector, best first.
+
+        Args:
+            vector: Query embedding
+            k (int): Number of results
+            symbols (list): Only chunks mentioning one of these tickers
+            sources (list): Only chunks from these sources
+            since, until: Only chunks published in this date range (inclusive)
+            nprobe (int): Inverted lists to scan; more is slower but more accurate
+
+        Returns:
+            list: Chunk payloads with a "score" (cosine similarity) added
+        """
+        if not self.meta["dim"]:
+            return []
+        query = normalize(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+        with self._lock:
+            filtered = bool(symbols or sources or since or until)
+            allowed = self._filter(symbols, sources, since, until)
+
+            if self.ivf is None or (filtered and allowed.sum() <= EXACT_SEARCH_LIMIT):
+                rows = np.flatnonzero(allowed)
+                scores = (self._vectors_of(rows).astype(np.float32) @ query) * self.scale[rows]
+            else:
+                rows, scores = self._search_ivf(query, allowed, nprobe or self.nprobe)
+
+            # Re-score the best candidates exactly
+            candidates = k * RERANK_FACTOR
+            if len(rows) > candidates:
+                rows = rows[np.argpartition(-scores, candidates)[:candidates]]
+            rows = np.sort(rows)
+            scores = self.vectors[rows].astype(np.float32) @ query
+            if len(rows) > k:
+                top = np.argpartition(-scores, k)[:k]
+                rows, scores = rows[top], scores[top]
+            best = np.argsort(-scores)
+            rows, scores = rows[best], scores[best]
+            if not len(rows):
+                return []
+            payloads = dict(self.conn.execute(
+                f"SELECT row, payload FROM chunks WHERE row IN ({','.join('?' * len(rows))})",
+                [int(row) for row in rows]))
+        return [{**json.loads(payloads[int(row)]), "score": float(score)} for row, score in zip(rows, scores)]
+
+    def select_ids(self, condition, params=()):
+        """Ids of the chunks matching an SQL condition on the chunk_id and (JSON) payload columns"""
+        with self._lock:
+            return [chunk_id for (chunk_id,) in self.conn.execute(
+                f"SELECT chunk_id FROM chunks WHERE {condition}", params)]
+
+    def get(self, chunk_ids, symbols=None, sources=None, since=None, until=None):
+        """Return {chunk id: payload} for the given chunks that are indexed and match the filters"""
+        chunk_ids = list(chunk_ids)
+        if not chunk_ids:
+            return {}
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT row, chunk_id, payload FROM chunks WHERE chunk_id IN ({','.join('?' * len(chunk_ids))})",
+                chunk_ids).fetchall()
+            allowed = self._filter(symbols, sources, since, until) if symbols or sources or since or until else None
+        return {chunk_id: json.loads(payload) for row, chunk_id, payload in rows
+                if allowed is None or allowed[row]}
+
+    def _search_ivf(self, query, allowed, nprobe):
+        nprobe = min(nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        row_parts, score_parts = [], []
+        for lst in lists:
+            start, end = self.offsets[lst], self.offsets[lst + 1]
+            rows = self.ivf_rows[start:end]
+            keep = allowed[rows]
+            row_parts.append(rows[keep])
+            score_parts.append(self.ivf[start:end][keep].astype(np.float32) @ query)
+        keep = allowed[self.tail_rows]
+        row_parts.append(self.tail_rows[keep])
+        score_parts.append(self.tail[keep].astype(np.float32) @ query)
+        rows = np.concatenate(row_parts)
+        return rows, np.concatenate(score_parts) * self.scale[rows]
+
+    def close(self):
+        self.conn.close()
+
@@ -0,0 +1,69 @@
+import os
+import hashlib
+import mimetypes
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+class FixtureSite:
+    """Stand-in web site serving recorded fixture files.
+
+    ``routes`` maps a request path, with or without its query string, to a file
+    under tests/fixtures. Responses carry an ETag, and a request repeating it in
+    If-None-Match gets 304 Not Modified.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.statuses = Counter()
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                name = site.routes.get(self.path) or site.routes.get(self.path.split("?")[0])
+                if name is None:
+                    self._reply(404)
+                    return
+                path = os.path.join(FIXTURES_DIR, name)
+                with open(path, "rb") as f:
+                    body = f.read()
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self._reply(304, etag=etag)
+                else:
+                    self._reply(200, body, etag, mimetypes.guess_type(path)[0])
+
+            def _reply(self, status, body=b"", etag=None, content_type=None):
+                site.statuses[(self.path, status)] += 1
+                self.send_response(status)
+                if etag:
+                    self.send_header("ETag", etag)
+                if content_type and content_type.startswith(("text/", "application/json")):
+                    content_type += "; charset=utf-8"
+                self.send_header("Content-Type", content_type or "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def requests_with_status(self, status):
+        return sum(count for (_, code), count in self.statuses.items() if code == status)
+
+
+@pytest.fixture
+def fixture_site():
+    site = FixtureSite()
+    thread = threading.Thread(target=site.server.serve_forever, daemon=True)
+    thread.start()
+    yield site
+    site.server.shutdown()
+    site.server.server_close()
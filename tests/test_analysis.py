@@ -0,0 +1,176 @@
+from analysis.profile_matching import ProfileMatcher
+from analysis.sentiment import LexiconModel, SentimentCache, SentimentPipeline, SentimentTracker
+from analysis.valuation import nav_history, value_positions
+
+def test_conservative_income_profile_prefers_dividend_stocks():
+    matcher = ProfileMatcher()
+    profile = {
+        "risk_profile": "Very Conservative",
+        "risk_score": 2.0,
+        "investment_timeline": "1-3 years",
+        "investment_goals": "Income generation, Capital preservation",
+        "preferred_sectors": [],
+        "max_loss_tolerance": 5
+    }
+    matches = matcher.top_k(profile, k=3)
+    assert len(matches) == 3
+    assert all(matcher.universe.set_index('Symbol').loc[m['symbol'], 'Dividend Yield'] > 2 for m in matches)
+
+def test_batch_matches_single_profile_scoring():
+    matcher = ProfileMatcher()
+    profiles = [
+        {"risk_profile": "Aggressive", "preferred_sectors": ["Technology"]},
+        {"risk_profile": "Conservative", "investment_goals": ["Retirement planning"]}
+    ]
+    batch = matcher.top_k_batch(profiles, k=4)
+    for profile, symbols in zip(profiles, batch):
+        assert symbols == [m['symbol'] for m in matcher.top_k(profile, k=4)]
+
+def test_market_overview_streaming_quotes_match_full_rebuild(tmp_path):
+    from data.price_store import PriceStore, seed_sample_history
+    from data.universe import load_universe
+    from analysis.market_overview import MarketOverview
+
+    store = PriceStore(str(tmp_path))
+    universe = load_universe()
+    seed_sample_history(store, universe['Symbol'], years=1)
+    overview = MarketOverview(universe=universe, store=store)
+
+    last_close = store.latest(['AAPL', 'XOM'])['Close']
+    overview.update_quote('AAPL', last_close['AAPL'] * 1.10)
+    overview.update_quote('XOM', last_close['XOM'] * 0.90)
+    streamed = overview.snapshot()['sectors'].set_index('Sector')
+
+    # Persist the same quotes as today's bars and aggregate from scratch
+    for symbol, factor in [('AAPL', 1.10), ('XOM', 0.90)]:
+        bars = store.read(symbol, mmap=False).tail(1).copy()
+        bars['Close'] = last_close[symbol] * factor
+        store.write(symbol, bars)
+    rebuilt = MarketOverview(universe=universe, store=store).snapshot()['sectors'].set_index('Sector')
+
+    assert (streamed['Return (%)'] - rebuilt.loc[streamed.index, 'Return (%)']).abs().max() < 1e-9
+    assert (streamed['Advancers'] == rebuilt.loc[streamed.index, 'Advancers']).all()
+
+def test_alert_engine_fires_only_crossed_alerts(tmp_path):
+    from analysis.alerts import AlertEngine, PRICE_ABOVE, PRICE_BELOW
+
+    engine = AlertEngine(str(tmp_path / "alerts.db"))
+    above = engine.add_alert("u1", "AAPL", PRICE_ABOVE, 200)
+    assert engine.add_alert("u1", "aapl", PRICE_ABOVE, 200) == above
+    engine.add_alert("u1", "AAPL", PRICE_ABOVE, 250)
+    below = engine.add_alert("u2", "AAPL", PRICE_BELOW, 150, repeat=True, cooldown=60)
+
+    assert engine.on_tick("AAPL", 180, timestamp=0) == []
+    assert [event["alert_id"] for event in engine.on_tick("AAPL", 210, timestamp=1)] == [above]
+    assert [event["alert_id"] for event in engine.on_tick("AAPL", 140, timestamp=2)] == [below]
+    engine.on_tick("AAPL", 160, timestamp=3)
+    assert engine.on_tick("AAPL", 140, timestamp=4) == []  # Still cooling down
+    engine.on_tick("AAPL", 160, timestamp=100)
+    assert [event["alert_id"] for event in engine.on_tick("AAPL", 140, timestamp=101)] == [below]
+
+    # One-shot alerts are gone after a reload, repeating ones survive
+    reloaded = AlertEngine(str(tmp_path / "alerts.db"))
+    assert {alert["id"] for alert in reloaded.alerts.values()} == {below, above + 1}
+
+    # With a price store, the first tick is compared with the stored close and volume average
+    import pandas as pd
+    from analysis.alerts import VOLUME_SPIKE
+    from data.price_store import PriceStore
+
+    store = PriceStore(str(tmp_path / "prices"))
+    store.write("MSFT", pd.DataFrame({"Open": 400.0, "High": 400.0, "Low": 400.0, "Close": 400.0,
+                                      "Volume": 1000.0}, index=pd.bdate_range("2024-01-01", periods=30)))
+    seeded = AlertEngine(str(tmp_path / "seeded.db"), store=store)
+    spike = seeded.add_alert("u1", "MSFT", VOLUME_SPIKE)
+    breakout = seeded.add_alert("u1", "MSFT", PRICE_ABOVE, 410)
+    assert {event["alert_id"] for event in seeded.on_tick("MSFT", 415, volume=2500, timestamp=0)} == {spike, breakout}
+
+    # An alert that already holds at the last price fires as soon as it is set
+    reached = seeded.add_alert("u2", "MSFT", PRICE_ABOVE, 412)
+    assert reached not in seeded.alerts and seeded.recent_events("u2")[0]["alert_id"] == reached
+    assert seeded.add_alert("u2", "MSFT", PRICE_BELOW, 420) not in seeded.alerts
+    assert seeded.add_alert("u2", "MSFT", PRICE_BELOW, 400) in seeded.alerts
+
+def test_backtest_buy_and_hold_tracks_prices_and_charges_costs():
+    import numpy as np
+    import pandas as pd
+    from analysis.backtesting import run_backtest
+
+    dates = pd.bdate_range("2020-01-01", periods=500)
+    prices = np.column_stack([np.linspace(100, 200, 500), np.full(500, 50.0)])
+
+    free = run_backtest(prices, dates, [1.0, 0.0], rebalance=None, fee_bps=0, slippage_bps=0, lag=0)
+    assert abs(free["values"][-1] - 20000.0) < 1e-6
+
+    costly = run_backtest(prices, dates, [0.6, 0.4], rebalance="M", contribution=100.0)
+    assert costly["metrics"]["Costs"] > 0
+    # 23 months of data; the first month is funded by the initial capital
+    assert costly["metrics"]["Invested"] == 10000.0 + 100.0 * 22
+
+def test_sentiment_aggregates_decay_and_skip_seen_documents(tmp_path):
+    path = str(tmp_path / "sentiment.db")
+    tracker = SentimentTracker(path, half_life_days=1.0)
+    pipeline = SentimentPipeline(LexiconModel(), SentimentCache(path), tracker)
+    documents = [
+        {"id": "1", "title": "THYAO zarar açıkladı", "text": "Hisseler sert düştü.", "published": "2024-05-01T10:00:00"},
+        {"id": "2", "title": "THYAO rekor kâr", "text": "Yolcu sayısı arttı, hisseler yükseldi.",
+         "published": "2024-05-03T10:00:00"},
+        {"id": "3", "title": "Garanti BBVA temettü dağıtacak", "text": "Güçlü bilanço.", "published": "2024-05-03T10:00:00"}
+    ]
+    stats = pipeline.run(documents)
+    assert stats["documents"] == 3 and stats["scored"] == 3
+
+    thyao = tracker.get("THYAO")
+    negative, positive = LexiconModel().score(
+        [f"{d['title']}. {d['text']}" for d in documents[:2]])
+    # Two half-lives separate the documents: the older one counts a quarter
+    assert abs(thyao["score"] - (0.25 * negative + positive) / 1.25) < 1e-9
+    assert thyao["label"] == "Positive" and thyao["documents"] == 2
+    assert tracker.get("Finance", kind="sector")["score"] > 0
+
+    # Reopened, the aggregates are read back and nothing is counted twice
+    reopened = SentimentTracker(path, half_life_days=1.0)
+    assert SentimentPipeline(LexiconModel(), SentimentCache(path), reopened).run(documents).get("documents", 0) == 0
+    assert abs(reopened.get("THYAO")["score"] - thyao["score"]) < 1e-12
+
+    # A tracker that is already open sees documents added through another connection
+    reopened.update([("4", -1.0, thyao["updated"], ["AKBNK"], ["Finance"])])
+    assert tracker.get("AKBNK")["documents"] == 1 and "AKBNK" in tracker.scores()
+
+
+def test_mixed_currency_book_is_valued_in_the_reporting_currency(tmp_path):
+    import pandas as pd
+    from data.fx import FXService, fx_currency
+    from data.price_store import PriceStore
+
+    store = PriceStore(str(tmp_path / "prices"))
+    dates = pd.date_range("2024-01-01", periods=3)
+    bars = lambda closes: pd.DataFrame({"Open": closes, "High": closes, "Low": closes, "Close": closes,
+                                        "Volume": 1.0}, index=dates)
+    store.write("TRY=X", bars([30.0, 31.0, 32.0]))
+    store.write("EUR=X", bars([0.8, 0.8, 0.8]))
+    store.write("THYAO", bars([300.0, 310.0, 320.0]))
+    store.write("AAPL", bars([100.0, 100.0, 100.0]))
+    fx = FXService(store)
+    assert fx.has_rates("TRY") and not FXService(PriceStore(str(tmp_path / "empty"))).has_rates("TRY")
+
+    book = pd.DataFrame({"Symbol": ["THYAO", "AAPL"], "Shares": [10.0, 2.0], "Avg Cost": [240.0, 90.0],
+                         "Current Price": [320.0, 100.0], "Currency": ["TRY", "USD"]})
+    valued = value_positions(book, "EUR", fx)
+    assert valued["Market Value"].round(6).tolist() == [80.0, 160.0]
+    assert valued["Gain/Loss"].round(6).tolist() == [20.0, 16.0]
+
+    # Without a TRY rate the lira position is flagged unpriced instead of being valued at par
+    unpriced = value_positions(book, "USD", FXService(PriceStore(str(tmp_path / "empty"))))
+    assert unpriced["Priced"].tolist() == [False, True] and unpriced["Market Value"].isna().tolist() == [True, False]
+
+    # A live quote of the TRY=X pair revalues the whole book without touching the stored history
+    assert (fx_currency("TRY=X"), fx_currency("THYAO")) == ("TRY", None)
+    fx.tick(fx_currency("TRY=X"), 40.0)
+    assert value_positions(book, "USD", fx)["Market Value"].round(6).tolist() == [80.0, 200.0]
+
+    day = pd.Timestamp("2024-01-02").timestamp()
+    transactions = [{"symbol": "THYAO", "action": "Buy", "shares": 10, "currency": "TRY", "executed_at": day},
+                    {"symbol": "AAPL", "action": "Buy", "shares": 2, "currency": "USD", "executed_at": day}]
+    nav = nav_history(transactions, "USD", store=store, fx=fx)
+    assert nav.round(6).tolist() == [300.0, 300.0]
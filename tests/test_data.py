@@ -0,0 +1,228 @@
+import pandas as pd
+from data.analyst_ratings import AnalystRatingsStore
+from data.cache import SharedCache
+from data.entity_linker import EntityLinker, EntityPostings, link_corpus
+from data.loaders.economic_loader import MacroStore, build_factor_panel
+from data.price_store import PriceStore, generate_sample_history
+from data.symbol_search import SymbolSearchIndex, fold
+from data.user_store import UserStore
+
+def test_user_store_restores_state_after_queued_writes(tmp_path):
+    store = UserStore(str(tmp_path / "users.db"))
+    store.save_profile("alice", {"risk_profile": "Aggressive", "risk_score": 4.5})
+    store.add_to_watchlist("alice", "aapl")
+    store.add_to_watchlist("alice", "MSFT")
+    store.remove_from_watchlist("alice", ["MSFT"])
+    store.record_transaction("alice", "AAPL", "Buy", 10, 100.0)
+    store.record_transaction("alice", "AAPL", "Buy", 10, 200.0)
+    store.record_transaction("alice", "AAPL", "Sell", 5, 210.0)
+    store.append_chat("alice", {"role": "user", "content": "Hi", "timestamp": "t1"})
+    store.append_chat("alice", {"role": "assistant", "content": "Hello", "sources": [], "timestamp": "t2"})
+
+    # A fresh store over the same file sees everything the first one queued
+    store.flush()
+    state = UserStore(str(tmp_path / "users.db")).load_user_state("alice")
+
+    assert state["profile"]["risk_score"] == 4.5
+    assert state["watchlist"] == ["AAPL"]
+    assert state["holdings"] == [{"symbol": "AAPL", "shares": 15.0, "avg_cost": 150.0, "currency": "USD"}]
+    assert [message["content"] for message in state["chat_history"]] == ["Hi", "Hello"]
+    assert len(store.transactions("alice")) == 3
+    # A trade still in the write queue is part of the next read
+    store.record_transaction("alice", "MSFT", "Buy", 1, 300.0)
+    assert store.transactions("alice")[0]["symbol"] == "MSFT"
+
+    store.clear_chat("alice")
+    assert store.load_user_state("alice")["chat_history"] == []
+
+def test_entity_linker_tags_documents_and_stores_postings(tmp_path):
+    linker = EntityLinker()
+    mentions = linker.link("THY'nin yolcu sayısı arttı; Türk Hava Yolları ve Garanti BBVA yükseldi. "
+                           "Müşteriye garanti verildi. BREAKING: CAT AND DOG NEWS. $V and KO up.")
+    assert mentions == {"THYAO": 2, "GARAN": 1, "V": 1, "KO": 1}
+
+    postings = EntityPostings(str(tmp_path / "entities.db"))
+    documents = [
+        {"id": "n1", "kind": "news", "title": "Akbank ve Garanti", "text": "Bankalar güçlü.", "published": "2024-05-02"},
+        {"id": "n2", "kind": "news", "title": "Piyasa", "text": "Endeks yatay.", "published": "2024-05-03"},
+        {"id": "k1", "kind": "disclosure", "title": "ÖDA", "text": "", "symbols": ["ASELS"], "published": "2024-05-01"}
+    ]
+    assert link_corpus(documents, linker, postings)["linked"] == 3
+    assert link_corpus(documents, linker, postings).get("linked", 0) == 0
+    assert [d["id"] for d in postings.documents(["GARAN", "ASELS"])] == ["n1", "k1"]
+    assert [d["id"] for d in postings.documents()] == ["n2", "n1", "k1"]
+    assert postings.counts() == {"AKBNK": 1, "GARAN": 1, "ASELS": 1}
+
+
+def test_analyst_consensus_is_incremental_and_point_in_time(tmp_path):
+    store = AnalystRatingsStore(str(tmp_path / "ratings.db"))
+    store.add_ratings([
+        {"symbol": "AAPL", "firm": "A", "rated_at": "2024-01-02", "rating": "Buy", "target": 200.0},
+        {"symbol": "AAPL", "firm": "B", "rated_at": "2024-01-05", "rating": "Hold", "target": 180.0},
+    ])
+    store.add_ratings([{"symbol": "AAPL", "firm": "B", "rated_at": "2024-02-01", "rating": "Buy", "target": 210.0}])
+
+    latest = store.consensus("AAPL")
+    assert (latest["buy"], latest["hold"], latest["median_target"]) == (2, 0, 205.0)
+    assert latest["consensus"] == "Strong Buy" and latest["upgrades"] == 1 and latest["momentum"] == 1.0
+    assert store.consensus_as_of("AAPL", "2024-01-20")["hold"] == 1
+    assert store.consensus_as_of("AAPL", "2024-01-01") is None
+
+    # A backfilled rating rewrites the snapshots after it, seen by a fresh store too
+    store.add_ratings([{"symbol": "AAPL", "firm": "C", "rated_at": "2024-01-03", "rating": "Sell", "target": 150.0}])
+    reopened = AnalystRatingsStore(str(tmp_path / "ratings.db"))
+    assert reopened.consensus_as_of("AAPL", "2024-01-20")["sell"] == 1
+    assert reopened.consensus("AAPL")["median_target"] == 200.0
+
+
+def test_analyst_records_parse_turkish_dates_and_targets():
+    from data.scrapers.analyst_scraper import parse_rating, parse_target
+
+    rating = parse_rating({"hisse": "THYAO.IS", "kurum": "Aracı Kurum", "tarih": "05.03.2024",
+                           "tavsiye": "Endeks Üzeri", "hedef_fiyat": "1.234,50 TL"})
+    assert (rating["symbol"], rating["rated_at"], rating["rating"], rating["target"]) == \
+        ("THYAO", "2024-03-05", "Buy", 1234.5)
+    assert [parse_target(value) for value in ["1,234.50", "1234,5", "$310"]] == [1234.5, 1234.5, 310.0]
+    # A date in no known format drops the record rather than storing an unsortable string
+    assert parse_rating({"ticker": "AAPL", "broker": "A", "date": "next week", "rating": "Buy"}) is None
+
+
+def test_symbol_search_folds_turkish_and_ranks_prefixes_above_fuzzy_matches(monkeypatch):
+    universe = pd.DataFrame({
+        "Symbol": ["THYAO", "GARAN", "ISCTR", "AAPL", "APLE"],
+        "Company": ["Türk Hava Yolları", "Türkiye Garanti Bankası", "Türkiye İş Bankası", "Apple Inc.",
+                    "Apple Hospitality REIT"],
+        "Exchange": ["BIST", "BIST", "BIST", "US", "US"],
+        "Market Cap": [1e10, 2e10, 1.5e10, 3e12, 1e9],
+        "Aliases": ["THY;Turkish Airlines", "Garanti BBVA", "İş Bankası", "", ""]
+    })
+    index = SymbolSearchIndex.from_universe(universe)
+
+    assert fold("İŞ BANKASI") == "is bankasi" and fold("Türk Hava Yolları") == "turk hava yollari"
+    assert index.search_symbols("İş") == index.search_symbols("is ban") == ["ISCTR"]
+    assert index.search_symbols("hava yollari") == ["THYAO"]
+    # An exact symbol beats a far more popular misspelling match, which is still found
+    assert index.search_symbols("aple") == ["APLE", "AAPL"]
+    assert index.search_symbols("garanit") == ["GARAN"]
+    # within= restricts prefix and fuzzy matches alike
+    assert index.search_symbols("turk", within={"GARAN", "ISCTR"}) == ["GARAN", "ISCTR"]
+    assert index.search_symbols("garanit", within={"THYAO"}) == []
+    # The prefix scan cap counts only keys of symbols within the filter
+    monkeypatch.setattr("data.symbol_search.MAX_PREFIX_SCAN", 1)
+    assert index.search_symbols("tu", within={"ISCTR"}) == ["ISCTR"]
+
+
+def test_macro_releases_join_prices_without_lookahead(tmp_path):
+    macro = MacroStore(str(tmp_path / "macro"))
+    periods = pd.to_datetime(["2024-01-01", "2024-02-01"])
+    macro.write("US_CPI", pd.DataFrame({"Period": periods, "Value": [100.0, 101.0]}))
+    # January is revised after February's first print; February stays the newest period
+    macro.write("US_CPI", pd.DataFrame({"Period": periods, "Value": [100.5, 101.0]}), seen_at="2024-03-20")
+
+    prices = PriceStore(str(tmp_path / "prices"))
+    dates = pd.bdate_range("2024-02-12", "2024-03-22")
+    for symbol in ["AAA", "BBB"]:
+        prices.write(symbol, generate_sample_history(symbol, dates))
+    panel = build_factor_panel(["AAA", "BBB"], ["US_CPI"], store=prices, macro=macro).set_index(["Date", "Symbol"])
+
+    assert pd.isna(panel.loc[(pd.Timestamp("2024-02-12"), "AAA"), "US_CPI"])
+    assert panel.loc[(pd.Timestamp("2024-02-13"), "BBB"), "US_CPI"] == 100.0   # Released 12:30 UTC, before the close
+    assert panel.loc[(pd.Timestamp("2024-03-12"), "AAA"), "US_CPI"] == 100.0
+    assert panel.loc[(pd.Timestamp("2024-03-21"), "AAA"), "US_CPI"] == 101.0
+    assert len(panel) == 2 * len(dates)
+    assert macro.latest("US_CPI", now="2024-03-21")["previous"] == 100.5
+
+
+def test_shared_cache_invalidates_evicts_and_computes_once():
+    import threading
+    import time
+    import numpy as np
+
+    cache = SharedCache(max_bytes=3000)
+    compute = lambda value: lambda: np.full(100, value, dtype=float)   # 800 bytes each
+
+    cache.get_or_compute("prices:AAPL", "chart", compute(1))
+    assert cache.get_or_compute("prices:AAPL", "chart", compute(2))[0] == 1
+    assert cache.get_or_compute("prices:AAPL", "chart", compute(3), version="v2")[0] == 3
+    cache.invalidate("prices:AAPL")
+    assert cache.bytes_used == 0
+    assert cache.get_or_compute("prices:AAPL", "chart", compute(4))[0] == 4
+
+    # Past the budget the least recently used entries go first
+    for key in range(1, 4):
+        cache.get_or_compute("other", key, compute(key))
+    cache.get_or_compute("prices:AAPL", "chart", compute(5))
+    assert cache.bytes_used <= 3000
+    assert cache.get_or_compute("other", 1, compute(6))[0] == 6
+
+    # Concurrent misses on one key share a single computation
+    started = []
+    def slow():
+        started.append(1)
+        time.sleep(0.2)
+        return "done"
+    threads = [threading.Thread(target=cache.get_or_compute, args=("slow", "key", slow)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert started == [1]
+
+    # Hit statistics are kept for the most recently active sessions only
+    tracked = SharedCache(max_sessions=2)
+    for session_id in ["a", "b", "a", "c"]:
+        tracked.get_or_compute("ns", "key", lambda: 1, session_id=session_id)
+    assert list(tracked.stats) == ["total", "a", "c"]
+    assert tracked.session_stats("a")["hit_rate"] == 0.5 and tracked.session_stats()["misses"] == 1
+
+
+def test_lttb_keeps_endpoints_and_peaks_within_the_target():
+    import numpy as np
+    from data.chart_data import downsample_line, lttb
+
+    x = np.arange(1000)
+    y = np.sin(x / 30.0)
+    y[500] = 5.0
+    kept = lttb(x, y, 100)
+    assert len(kept) == 100 and kept[0] == 0 and kept[-1] == 999
+    assert (np.diff(kept) > 0).all() and 500 in kept
+    assert (lttb(x[:50], y[:50], 100) == np.arange(50)).all()
+
+    series = pd.Series(y, index=pd.date_range("2020-01-01", periods=1000))
+    series.iloc[10] = np.nan
+    reduced = downsample_line(series, resolution=200)
+    assert len(reduced) == 200 and reduced.notna().all()
+    assert reduced.index[0] == series.index[0] and reduced.index[-1] == series.index[-1]
+
+
+def test_downsample_ohlc_preserves_each_buckets_extremes_and_volume():
+    from data.chart_data import downsample_ohlc
+
+    frame = generate_sample_history("AAA", pd.bdate_range("2015-01-01", periods=2500))
+    reduced = downsample_ohlc(frame, resolution=300)
+    assert len(reduced) == 300
+    assert reduced["High"].max() == frame["High"].max() and reduced["Low"].min() == frame["Low"].min()
+    assert reduced["Volume"].sum() == frame["Volume"].sum()
+    assert reduced["Open"].iloc[0] == frame["Open"].iloc[0] and reduced["Close"].iloc[-1] == frame["Close"].iloc[-1]
+
+    # Every bucket spans the bars from its stamp up to the next one
+    second, third = reduced.index[1], reduced.index[2]
+    bucket = frame[(frame.index >= second) & (frame.index < third)]
+    assert reduced.loc[second, "High"] == bucket["High"].max() and reduced.loc[second, "Low"] == bucket["Low"].min()
+    assert reduced.loc[second, "Close"] == bucket["Close"].iloc[-1]
+    # Short histories are returned as they are
+    assert downsample_ohlc(frame.head(100), resolution=300).equals(frame.head(100))
+
+
+def test_chart_cache_sees_a_bar_rewritten_in_place(tmp_path):
+    from data.chart_data import get_chart_candles
+
+    store = PriceStore(str(tmp_path / "prices"))
+    assert get_chart_candles("AAA", store=store) is None
+    dates = pd.bdate_range("2024-01-01", periods=30)
+    store.write("AAA", generate_sample_history("AAA", dates))
+    assert get_chart_candles("AAA", store=store)["Close"].iloc[-1] != 999.0
+
+    store.write("AAA", pd.DataFrame({"Open": 1.0, "High": 999.0, "Low": 1.0, "Close": 999.0, "Volume": 1.0},
+                                    index=dates[-1:]))
+    assert get_chart_candles("AAA", store=store)["Close"].iloc[-1] == 999.0
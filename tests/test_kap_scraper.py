@@ -0,0 +1,56 @@
+import os
+from data.document_store import DocumentStore
+from data.scrapers.news_scraper import HostLimiter
+from data.scrapers.kap_scraper import KapScraper
+
+# Recorded KAP responses: request path -> fixture file
+ROUTES = {
+    "/tr/api/disclosures?afterDisclosureIndex=0": "kap/disclosures_after_0.json",
+    "/tr/api/disclosures?afterDisclosureIndex=1302": "kap/disclosures_after_1302.json",
+    "/tr/api/disclosures?afterDisclosureIndex=1303": "kap/disclosures_after_1303.json",
+    "/tr/Bildirim/1301": "kap/bildirim_1301.html",
+    "/tr/Bildirim/1302": "kap/bildirim_1302.html",
+    "/tr/api/file/download/4028328c8f1b2e6a": "kap/attachment_4028328c8f1b2e6a.pdf"
+}
+
+
+def make_scraper(site, data_dir):
+    return KapScraper(base_url=site.url, data_dir=str(data_dir),
+                      store=DocumentStore(str(data_dir / "documents.jsonl")),
+                      limiter=HostLimiter(concurrency=4, interval=0))
+
+
+def test_kap_ingestion_resumes_from_cursor_after_a_failure(fixture_site, tmp_path):
+    fixture_site.routes.update(ROUTES)
+
+    # The page of 1303 is not available yet: ingestion stops just before it
+    scraper = make_scraper(fixture_site, tmp_path)
+    assert scraper.run() == 2
+    assert scraper.cursor["last_index"] == 1302
+
+    documents = {document["id"]: document for document in scraper.store.iter_documents("disclosure")}
+    assert documents["kap:1301"]["symbols"] == ["THYAO"]
+    assert documents["kap:1301"]["published"] == "2024-05-03T18:30:12"
+    assert "6,8 milyona" in documents["kap:1301"]["text"]
+    assert "tracking" not in documents["kap:1301"]["text"]
+    attachment = documents["kap:1302"]["attachments"][0]
+    assert attachment["name"] == "Konsolide Finansal Tablolar.pdf"
+    with open(attachment["path"], "rb") as f:
+        assert f.read().startswith(b"%PDF")
+
+    # A restarted scraper picks up from the persisted cursor only
+    fixture_site.routes["/tr/Bildirim/1303"] = "kap/bildirim_1303.html"
+    scraper = make_scraper(fixture_site, tmp_path)
+    assert scraper.run() == 1
+    assert scraper.cursor["last_index"] == 1303
+    assert fixture_site.statuses[("/tr/Bildirim/1301", 200)] == 1
+
+    kchol = next(d for d in scraper.store.iter_documents() if d["id"] == "kap:1303")
+    assert kchol["symbols"] == ["KCHOL", "KCHOL.E"]
+
+    # Nothing new: one list request, nothing stored twice
+    scraper = make_scraper(fixture_site, tmp_path)
+    assert scraper.run() == 0
+    assert scraper.stats["list_requests"] == 1
+    assert len(DocumentStore(str(tmp_path / "documents.jsonl"))) == 3
+    assert os.path.exists(tmp_path / "cursor.json")
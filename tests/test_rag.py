@@ -0,0 +1,271 @@
+import os
+from importlib.util import find_spec
+import numpy as np
+import pytest
+from rag.assistant import AssistantPipeline, PlaceholderGenerator
+from rag.chunker import ChunkPipeline, split_text, text_hash
+from rag.context import ContextAssembler, extract_tickers
+from rag.conversation import ConversationContext
+from rag.embeddings import (EmbeddingCache, EmbeddingService, HashingEncoder, TransformerEncoder, default_encoder,
+                            length_batches)
+from rag.lexical_index import LexicalIndex, tokenize
+from rag.retrieval import HybridRetriever, index_documents
+from rag.semantic_cache import SemanticCache
+from rag.vector_index import VectorIndex
+
+
+def test_split_text_packs_sentences_with_overlap():
+    text = " ".join(f"Cümle {n} burada biter." for n in range(40))
+    chunks = split_text(text, chunk_size=120, chunk_overlap=40)
+
+    assert all(len(chunk) <= 120 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+    # Every chunk after the first repeats the last sentence of the one before it
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.startswith(previous.rsplit(". ", 1)[-1])
+
+
+def test_pipeline_skips_unchanged_documents(tmp_path):
+    documents = [
+        {"id": "a", "kind": "news", "title": "Borsa", "text": "Endeks yükseldi. " * 30},
+        {"id": "b", "kind": "disclosure", "title": "KAP", "text": "Temettü dağıtılacak."}
+    ]
+    pipeline = ChunkPipeline(str(tmp_path / "manifest.db"), chunk_size=100, chunk_overlap=20, processes=1)
+    chunks = list(pipeline.run(documents))
+    assert chunks[0]["id"] == "a#0" and chunks[0]["kind"] == "news"
+    assert pipeline.stats["chunked"] == 2
+
+    assert list(pipeline.run(documents)) == []
+    assert pipeline.stats["unchanged"] == 2
+
+    # A shortened document is chunked again and its surplus chunk ids are reported
+    documents[0]["text"] = "Endeks düştü."
+    assert [chunk["id"] for chunk in pipeline.run(documents)] == ["a#0"]
+    assert pipeline.deleted_ids[0] == "a#1"
+
+
+def test_embedding_service_only_computes_uncached_chunks(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"))
+    chunks = [{"text": text, "content_hash": text_hash(text)}
+              for text in ["Faiz kararı açıklandı.", "Endeks rekor kırdı.", "Faiz kararı açıklandı."]]
+
+    service = EmbeddingService(HashingEncoder(dim=16), cache=cache)
+    first = [vector for _, vector in service.embed(chunks)]
+    assert service.stats["computed"] == 2 and service.stats["cached"] == 0
+    assert np.allclose(first[0], first[2]) and np.isclose(np.linalg.norm(first[1]), 1)
+
+    # Worker processes give the same vectors, and cached chunks are not recomputed
+    service = EmbeddingService(HashingEncoder(dim=16), cache=cache, processes=2)
+    chunks.append({"text": "Dolar yükseldi.", "content_hash": text_hash("Dolar yükseldi.")})
+    second = [vector for _, vector in service.embed(chunks)]
+    assert service.stats["computed"] == 1 and service.stats["cached"] == 3
+    assert np.allclose(first, second[:3])
+
+
+@pytest.mark.skipif(bool(find_spec("torch") and find_spec("transformers")), reason="transformers is installed")
+def test_embedding_service_falls_back_to_the_hashing_encoder():
+    assert isinstance(default_encoder(), HashingEncoder)
+    assert isinstance(EmbeddingService(cache=EmbeddingCache(":memory:")).encoder, HashingEncoder)
+
+
+def test_transformer_encoder_loads_a_local_model_without_downloads(tmp_path):
+    pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+
+    # A tiny randomly initialised BERT with its own vocabulary
+    words = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "hisse", "yukseldi", "dustu", "kar", "zarar"]
+    (tmp_path / "vocab.txt").write_text("\n".join(words) + "\n", encoding="utf-8")
+    transformers.BertTokenizer(str(tmp_path / "vocab.txt")).save_pretrained(str(tmp_path))
+    config = transformers.BertConfig(vocab_size=len(words), hidden_size=16, num_hidden_layers=1,
+                                     num_attention_heads=2, intermediate_size=32, max_position_embeddings=64)
+    transformers.BertModel(config).save_pretrained(str(tmp_path))
+
+    encoder = TransformerEncoder(str(tmp_path), device="cpu", local_files_only=True)
+    assert encoder.lengths(["hisse yukseldi", "kar"]) == [4, 3]
+    vectors = encoder.encode(["hisse yukseldi", "kar zarar dustu"])
+    assert vectors.shape == (2, 16)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+    # Padding a text inside a longer batch leaves its vector unchanged
+    assert np.allclose(encoder.encode(["hisse yukseldi"])[0], vectors[0], atol=1e-5)
+
+
+def test_length_batches_group_similar_lengths():
+    batches = length_batches([5, 100, 6, 98, 7], max_batch_size=4, max_batch_tokens=220)
+    assert batches == [[1, 3], [4, 2, 0]]
+
+
+def test_vector_index_filters_deletes_and_reopens(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((500, 16))
+    chunks = [{"id": f"c{n}", "text": f"chunk {n}", "source": "KAP" if n % 2 else "BloombergHT",
+               "published": f"2024-05-{n % 28 + 1:02d}", "symbols": ["THYAO"] if n % 50 == 0 else []}
+              for n in range(500)]
+    index = VectorIndex(str(tmp_path / "index"), auto_compact=False)
+    index.add(chunks[:300], vectors[:300])
+    index.compact()
+    index.add(chunks[300:], vectors[300:])
+
+    assert index.search(vectors[42], k=1)[0]["id"] == "c42"
+    assert index.search(vectors[420], k=1)[0]["id"] == "c420"
+    assert {r["id"] for r in index.search(vectors[42], k=20, symbols=["thyao"])} == {f"c{n}" for n in range(0, 500, 50)}
+    dated = index.search(vectors[42], k=5, sources=["KAP"], since="2024-05-10", until="2024-05-12")
+    assert all(r["source"] == "KAP" and "2024-05-10" <= r["published"] <= "2024-05-12" for r in dated)
+
+    # Deleted and replaced chunks survive a reopen; the tail is folded into the IVF segment
+    index.remove(["c42"])
+    index.add([{"id": "c420", "text": "updated"}], vectors[420:421])
+    index.close()
+    index = VectorIndex(str(tmp_path / "index"))
+    assert index.search(vectors[42], k=1)[0]["id"] != "c42"
+    assert index.search(vectors[420], k=1)[0]["text"] == "updated"
+    index.compact()
+    assert len(index) == 499 and len(index.tail_rows) == 0
+    assert index.search(vectors[420], k=1)[0]["text"] == "updated"
+
+
+def test_tokenize_folds_stems_and_keeps_codes():
+    assert tokenize("THYAO'nun kârı 6,8 milyar TL oldu") == ["thyao", "kari", "6,8", "milyar", "tl", "oldu"]
+    # Inflected forms share a stem
+    assert tokenize("Borsada hisseler") == tokenize("borsa hisse")
+
+
+def test_hybrid_retrieval_fuses_keyword_and_vector_hits(tmp_path):
+    documents = [
+        {"id": "kap:1", "kind": "disclosure", "source": "KAP", "title": "THYAO Özel Durum Açıklaması",
+         "text": "Şirketimiz yeni uçak siparişi verdi.", "symbols": ["THYAO"], "published": "2024-05-03"},
+        {"id": "news:1", "kind": "news", "source": "BloombergHT", "title": "Faiz kararı",
+         "text": "Merkez Bankası politika faizini sabit tuttu.", "published": "2024-05-02"},
+        {"id": "news:2", "kind": "news", "source": "BloombergHT", "title": "Borsa",
+         "text": "Borsa İstanbul güne yükselişle başladı, THYAO öne çıktı.", "published": "2024-05-03"}
+    ]
+    retriever = HybridRetriever(VectorIndex(str(tmp_path / "vectors")), LexicalIndex(str(tmp_path / "lexical.pkl")),
+                                EmbeddingService(HashingEncoder(dim=32), cache=EmbeddingCache(str(tmp_path / "e.db"))))
+    stats = index_documents(documents, retriever, ChunkPipeline(str(tmp_path / "manifest.db"), processes=1))
+    assert stats["chunks"] == 3
+
+    timings = {}
+    results = retriever.retrieve("THYAO", k=3, timings=timings)
+    assert {r["document_id"] for r in results[:2]} == {"kap:1", "news:2"}
+    assert results[0]["lexical_rank"] == 1 and "total_ms" in timings
+    assert [r["document_id"] for r in retriever.retrieve("THYAO", k=3, sources=["KAP"])] == ["kap:1"]
+    assert retriever.retrieve("politika faizi", k=1)[0]["document_id"] == "news:1"
+
+    # The saved keyword index reloads with the same postings
+    assert LexicalIndex.load(str(tmp_path / "lexical.pkl")).search("faiz") == retriever.lexical_index.search("faiz")
+
+
+def test_assistant_pipeline_streams_tokens_before_sources():
+    class Retriever:
+        def retrieve(self, query, timings=None, query_vector=None):
+            return [{"id": "kap:1#0", "document_id": "kap:1", "title": "THYAO ÖDA", "url": "u", "text": "..."}]
+
+    pipeline = AssistantPipeline(Retriever(), PlaceholderGenerator(), use_cache=False)
+    events = list(pipeline.stream("Which stock should I invest in?",
+                                  {"risk_profile": "Moderate", "investment_goals": "Income"}))
+
+    assert events[0]["type"] == "retrieval"
+    assert [e["type"] for e in events[1:-2]] == ["token"] * (len(events) - 3)
+    assert events[-2]["sources"] == [{"title": "THYAO ÖDA", "url": "u"}]
+    metrics = events[-1]["metrics"]
+    assert metrics["tokens"] == len(events) - 3
+    assert metrics["ttft_ms"] < metrics["total_ms"] and metrics["tokens_per_second"] > 0
+
+
+def test_semantic_cache_partitions_by_profile_and_version(tmp_path):
+    embedder = EmbeddingService(HashingEncoder(dim=64), EmbeddingCache(str(tmp_path / "embeddings.db")))
+    cache = SemanticCache(embedder, str(tmp_path / "responses"), threshold=0.85)
+    profile = {"risk_profile": "Moderate", "investment_goals": "Income"}
+    response = {"answer": "Keep crypto under 5%.", "sources": []}
+
+    cached, vector = cache.lookup("Should I buy bitcoin?", profile, "v1")
+    assert cached is None
+    cache.store("Should I buy bitcoin?", profile, "v1", response, vector)
+
+    assert cache.lookup("should i buy BITCOIN", profile, "v1")[0] == response
+    assert cache.lookup("should i buy bitcoin today", profile, "v1")[0] == response
+    assert cache.stats["exact_hits"] == 1 and cache.stats["semantic_hits"] == 1
+    assert cache.lookup("Should I buy bitcoin?", {**profile, "risk_profile": "Aggressive"}, "v1")[0] is None
+    assert cache.lookup("Should I buy bitcoin?", profile, "v2")[0] is None
+
+    cache.ttl = -1
+    assert cache.lookup("Should I buy bitcoin?", profile, "v1")[0] is None
+    assert cache.stats["expired"] == 1
+
+
+def test_vector_index_reclaims_deleted_rows(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((400, 16))
+    chunks = [{"id": f"c{n}", "text": f"chunk {n}", "symbols": ["THYAO"] if n % 2 else []} for n in range(400)]
+    index = VectorIndex(str(tmp_path / "index"))
+    index.add(chunks[:300], vectors[:300])
+    index.compact()
+    index.add(chunks[300:], vectors[300:])
+
+    # Flagged rows stay on disk until they reach the reclaim ratio, then every per-row file shrinks
+    index.remove([f"c{n}" for n in range(0, 150, 2)])
+    assert len(index.deleted) == 400
+    index.remove([f"c{n}" for n in range(150, 400, 10)])
+    assert len(index.deleted) == len(index) == 300 and index.meta["indexed"] + len(index.tail_rows) == 300
+    assert os.path.getsize(tmp_path / "index" / "vectors.f16") == 300 * 16 * 2
+
+    index.close()
+    index = VectorIndex(str(tmp_path / "index"))
+    assert index.search(vectors[151], k=1)[0]["id"] == "c151"
+    assert index.search(vectors[395], k=1)[0]["id"] == "c395"
+    assert index.search(vectors[0], k=1)[0]["id"] != "c0"
+    assert {r["id"] for r in index.search(vectors[7], k=300, symbols=["THYAO"])} == {f"c{n}" for n in range(1, 400, 2)}
+
+
+def test_conversation_context_stays_within_budget():
+    context = ConversationContext(budget=300)
+    history, summaries = [], []
+    for turn in range(200):
+        history.append({"role": "user", "content": f"Question {turn} about THYAO dividends and the payout ratio?"})
+        history.append({"role": "assistant", "content": f"Answer {turn}. " + "The payout looks sustainable. " * 5})
+        window = context.window(history)
+        assert window["tokens"] <= 300
+        assert window["messages"][-1]["content"] == history[-1]["content"]
+        summaries.append(window["summary"])
+
+    # Older turns are folded in batches, so the summary (the prompt prefix) rarely changes
+    assert "Question 0 " not in window["summary"] and "Question 199" not in window["summary"]
+    assert window["summary"].endswith(f"Answer {199 - len(window['messages']) // 2}.")
+    assert sum(a != b for a, b in zip(summaries, summaries[1:])) < len(summaries) / 2
+    assert context.window([])["summary"] == ""
+
+
+def test_context_assembly_uses_whatever_is_ready_by_each_deadline(tmp_path):
+    import time
+    import pandas as pd
+    from data.price_store import PriceStore
+
+    class SlowRetriever:
+        def retrieve(self, query, timings=None, query_vector=None):
+            time.sleep(1.0)
+            return [{"id": "late"}]
+
+    class Quotes:
+        def get_stock_price(self, ticker):
+            return {"THYAO.IS": 301.5}.get(ticker)
+
+    class Users:
+        def load_user_state(self, user_id):
+            return {"holdings": [{"symbol": "THYAO", "shares": 10, "avg_cost": 250.0}]}
+
+    store = PriceStore(str(tmp_path / "prices"))
+    dates = pd.date_range("2024-01-01", periods=3)
+    store.write("THYAO", pd.DataFrame({"Open": 1.0, "High": 1.0, "Low": 1.0, "Close": [280.0, 290.0, 300.0],
+                                       "Volume": 1.0}, index=dates))
+    published = []
+    assembler = ContextAssembler(SlowRetriever(), Quotes(), store, Users(),
+                                 timeouts={"retrieval": 0.3, "quotes": 0.3, "portfolio": 0.3},
+                                 quote_sink=lambda symbol, price: published.append((symbol, price)))
+
+    assert extract_tickers("Is THY or Garanti cheaper than $aapl? apple") == ["THYAO", "GARAN", "AAPL"]
+    started = time.perf_counter()
+    context = assembler.assemble("Should I add THYAO to my portfolio?", user_id="alice")
+    assert time.perf_counter() - started < 0.6
+    assert context["timed_out"] == ["retrieval"] and context["chunks"] == []
+    assert context["quotes"]["THYAO"] == {"price": 301.5, "live": True}
+    assert published == [("THYAO", 301.5)]
+    assert context["portfolio"]["value"] == 3000.0 and context["portfolio"]["gain"] == 500.0
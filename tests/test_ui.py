@@ -0,0 +1,61 @@
+import pandas as pd
+from ui.components import page_of
+
+
+def test_page_of_sorts_the_whole_frame_before_paging():
+    frame = pd.DataFrame({"Symbol": [f"S{i:03d}" for i in range(120)], "Value": [(i * 37) % 120 for i in range(120)]})
+
+    rows, page, page_count = page_of(frame, "Value", ascending=False, page=1, page_size=50)
+    assert (page, page_count, len(rows)) == (1, 3, 50)
+    assert rows["Value"].tolist() == list(range(119, 69, -1))
+
+    rows, page, _ = page_of(frame, "Value", ascending=True, page=3, page_size=50)
+    assert page == 3 and rows["Value"].tolist() == list(range(100, 120))
+
+    # Unknown sort columns leave the order alone
+    rows, _, _ = page_of(frame, "Missing", page=2, page_size=50)
+    assert rows["Symbol"].tolist() == frame["Symbol"].iloc[50:100].tolist()
+
+
+def test_page_of_clamps_out_of_range_pages():
+    frame = pd.DataFrame({"Value": range(30)})
+
+    rows, page, page_count = page_of(frame, "Value", page=9, page_size=25)
+    assert (page, page_count) == (2, 2) and rows["Value"].tolist() == list(range(25, 30))
+    assert page_of(frame, "Value", page=0, page_size=25)[1] == 1
+
+    rows, page, page_count = page_of(frame.iloc[:0], "Value", page=3, page_size=25)
+    assert rows.empty and (page, page_count) == (1, 1)
+
+
+def run_isolated(code, **env):
+    """Run code in a fresh interpreter from the project root, so earlier imports don't leak in"""
+    import os
+    import subprocess
+    import sys
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True,
+                            env={**os.environ, **env}, timeout=120)
+    assert result.returncode == 0, result.stderr
+
+
+def test_importing_config_reads_no_environment_until_a_setting_is_used():
+    run_isolated("""
+import sys
+import config
+assert "dotenv" not in sys.modules and not config._env_loaded
+assert "DEBUG" not in vars(config) and "PROCESSED_DATA_DIR" not in vars(config)
+assert config.DEBUG is True and config._env_loaded and vars(config)["DEBUG"] is True
+""", DEBUG="true")
+
+
+def test_pages_are_imported_only_when_opened():
+    run_isolated("""
+import sys
+from ui.app import PAGES, load_page
+loaded = lambda: {name for name in sys.modules if name.startswith("ui.pages.")}
+assert loaded() == set()
+assert callable(load_page("Portfolio")) and loaded() == {"ui.pages.portfolio"}
+assert {module for module, _ in PAGES.values()} >= loaded()
+""")
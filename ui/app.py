@@ -5,15 +5,41 @@ import os
 # Add the project root directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import importlib
 import streamlit as st
 from config import PAGE_TITLE, PAGE_ICON, THEME
 
-# Import page modules
-from ui.pages.home import show_home_page
-from ui.pages.risk_profile import show_risk_profile
-from ui.pages.assistant import show_assistant
-from ui.pages.stock_discovery import show_stock_discovery
-from ui.pages.portfolio import show_portfolio
+# Page registry: page modules, and the libraries they use, are imported the
+# first time a page is opened rather than at startup
+PAGES = {
+    "Home": ("ui.pages.home", "show_home_page"),
+    "Profile": ("ui.pages.risk_profile", "show_risk_profile"),
+    "Assistant": ("ui.pages.assistant", "show_assistant"),
+    "Stock Discovery": ("ui.pages.stock_discovery", "show_stock_discovery"),
+    "Portfolio": ("ui.pages.portfolio", "show_portfolio")
+}
+
+def load_page(name):
+    """Import a registered page on demand and return its render function"""
+    module_name, function_name = PAGES[name]
+    return getattr(importlib.import_module(module_name), function_name)
+
+def new_guest_id():
+    """A fresh id for an anonymous session"""
+    import uuid
+    return f"guest-{uuid.uuid4().hex[:16]}"
+
+def load_user_session(user_id):
+    """Copy a user's persisted profile, watchlist and chat history into the session"""
+    from data.user_store import get_user_store
+    state = get_user_store().load_user_state(user_id)
+    
+    st.session_state.user_id = user_id
+    if state["profile"] is not None:
+        st.session_state.user_profile = state["profile"]
+    st.session_state.watchlist = state["watchlist"]
+    st.session_state.chat_history = state["chat_history"]
+    st.session_state.pop("chat_context", None)
 
 def main():
     """Main Streamlit application entry point"""
@@ -28,7 +54,14 @@ def main():
         }
     )
     
-    # Session state initialization
+    # Session state initialization, restoring a returning user's saved state.
+    # Anonymous visitors get their own id, kept in the URL so a reload finds
+    # their state again, instead of sharing one persisted user
+    if "user_id" not in st.session_state:
+        user_id = st.query_params.get("user") or new_guest_id()
+        st.query_params["user"] = user_id
+        load_user_session(user_id)
+    
     if "user_profile" not in st.session_state:
         st.session_state.user_profile = {
             "risk_profile": "Moderate",
@@ -60,20 +93,11 @@ def main():
     st.sidebar.title("🔍 Navigation")
     page = st.sidebar.radio(
         "Select a page",
-        ["Home", "Profile", "Assistant", "Stock Discovery", "Portfolio"]
+        list(PAGES)
     )
     
     # Display the appropriate page
-    if page == "Home":
-        show_home_page()
-    elif page == "Profile":
-        show_risk_profile()
-    elif page == "Assistant":
-        show_assistant()
-    elif page == "Stock Discovery":
-        show_stock_discovery()
-    elif page == "Portfolio":
-        show_portfolio()
+    load_page(page)()
     
     # Add footer
     st.sidebar.markdown("---")
@@ -84,6 +108,11 @@ def main():
     
     # Version info
     st.sidebar.caption("Version 0.1.0 - Development Mode")
+    
+    from config import DEBUG
+    if DEBUG:
+        from ui.page_cache import show_cache_diagnostics
+        show_cache_diagnostics()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
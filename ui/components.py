@@ -0,0 +1,86 @@
+# ui/components.py - Small widgets shared by several pages
+import streamlit as st
+
+def show_index_metric(snapshot, name, prefix="", delta_color="normal"):
+    """Display the level and daily change of a market index from the overview snapshot"""
+    index = snapshot["indices"].get(name)
+    if index is None:
+        st.metric(name, "N/A")
+        return
+    
+    value = index["value"]
+    value_text = f"{value:,.2f}" if abs(value) < 100 else f"{value:,.0f}"
+    st.metric(name, f"{prefix}{value_text}", f"{index['change']:+.1f}%", delta_color=delta_color)
+
+def show_market_data_notice(snapshot):
+    """Say when the overview rests on sample history, or on no stored history at all"""
+    if snapshot["as_of"] is None:
+        st.info("No market data is stored yet; the overview fills in once price history is loaded.")
+    elif snapshot["sample"]:
+        st.caption("Sample market data")
+
+GRID_PAGE_SIZES = [25, 50, 100, 250]
+
+def page_of(frame, sort_by=None, ascending=True, page=1, page_size=GRID_PAGE_SIZES[1]):
+    """Sort a frame server-side and return one page of it.
+    
+    Returns:
+        tuple: (page rows, page number clamped to the valid range, page count)
+    """
+    page_count = max(1, -(-len(frame) // page_size))
+    page = min(max(1, int(page)), page_count)
+    if sort_by in frame:
+        frame = frame.sort_values(sort_by, ascending=ascending, kind="stable")
+    start = (page - 1) * page_size
+    return frame.iloc[start:start + page_size], page, page_count
+
+def show_data_grid(frame, key, sort_columns=None, default_sort=None, ascending=False,
+                   column_config=None, selection_mode="single-row"):
+    """Display a frame as one sortable, paginated and selectable table.
+    
+    Only the current page is sent to the browser, so render time does not grow
+    with the number of rows, and row actions read the selection instead of
+    creating widgets for every row.
+    
+    Args:
+        frame (DataFrame): Rows to display, already filtered
+        key (str): Unique widget key prefix for this grid
+        sort_columns (list): Columns offered for sorting, defaults to all columns
+        default_sort (str): Column sorted on initially
+        ascending (bool): Initial sort direction
+        column_config (dict): Streamlit column configuration
+        selection_mode (str): "single-row" or "multi-row"
+    
+    Returns:
+        DataFrame: The selected rows
+    """
+    sort_columns = sort_columns or list(frame.columns)
+    col1, col2, col3, col4 = st.columns([2, 1.5, 1, 1])
+    
+    with col1:
+        sort_by = st.selectbox("Sort by", sort_columns, key=f"{key}_sort",
+                               index=sort_columns.index(default_sort) if default_sort in sort_columns else 0)
+    with col2:
+        order = st.radio("Order", ["Descending", "Ascending"], index=int(ascending),
+                         horizontal=True, key=f"{key}_order")
+    with col3:
+        page_size = st.selectbox("Rows per page", GRID_PAGE_SIZES, index=1, key=f"{key}_page_size")
+    
+    # Keep the page in range when a filter shrinks the table
+    page_count = max(1, -(-len(frame) // page_size))
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > page_count:
+        st.session_state[page_key] = page_count
+    with col4:
+        page = st.number_input("Page", min_value=1, max_value=page_count, step=1, key=page_key)
+    
+    rows, page, page_count = page_of(frame, sort_by, order == "Ascending", page, page_size)
+    event = st.dataframe(rows, key=f"{key}_table", on_select="rerun", selection_mode=selection_mode,
+                         hide_index=True, use_container_width=True, column_config=column_config)
+    
+    first = (page - 1) * page_size
+    st.caption(f"Showing {first + 1 if len(frame) else 0}-{first + len(rows)} of {len(frame)} "
+               f"· page {page} of {page_count}")
+    # A selection made on a longer page may point past the end of this one
+    selected = [row for row in (event.selection.rows if event is not None else []) if row < len(rows)]
+    return rows.iloc[selected]
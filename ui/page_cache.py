@@ -0,0 +1,35 @@
+# ui/page_cache.py - Page-level access to the shared computation cache
+import streamlit as st
+from data.cache import shared_cache
+
+def current_session_id():
+    """Return the Streamlit session id of the running script, if any"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+def cached(namespace, key, compute, version=None):
+    """Return a page computation from the cache shared by all sessions.
+    
+    Args:
+        namespace (str): Group of entries invalidated together, e.g. "prices:AAPL"
+        key: Identifies the computation within the namespace
+        compute (callable): Builds the value on a miss
+        version: Version of the inputs; a new version never hits old entries
+    """
+    return shared_cache.get_or_compute(namespace, key, compute, version=version,
+                                       session_id=current_session_id())
+
+def show_cache_diagnostics():
+    """Display cache hit rates for this session and for the whole process"""
+    session = shared_cache.session_stats(current_session_id())
+    total = shared_cache.session_stats()
+    
+    with st.sidebar.expander("⚙️ Cache Diagnostics"):
+        st.metric("Session hit rate", f"{session['hit_rate']:.0%}")
+        st.caption(f"{session['hits']} hits / {session['misses']} misses this session")
+        st.caption(f"All sessions: {total['hit_rate']:.0%} hit rate, {total['entries']} entries, "
+                   f"{total['bytes'] / 1024 / 1024:.1f} MB")
@@ -1,44 +1,37 @@
 # ui/pages/assistant.py - Chat assistant interface
 import streamlit as st
-import time
 from datetime import datetime
+from data.user_store import get_user_store
+from rag.assistant import get_assistant_pipeline
+from rag.conversation import ConversationContext
 
-# Placeholder for the actual RAG assistant (will be implemented later)
 def get_assistant_response(query, user_profile):
     """
-    Placeholder function that will be replaced with actual RAG-based response generation
+    Generate a complete response, for callers that cannot render a stream
     
     Args:
         query (str): User's question
         user_profile (dict): User's profile information
     
     Returns:
-        dict: Response containing answer and sources
+        dict: Response containing answer, sources and latency metrics
     """
-    # This is just a placeholder
-    time.sleep(1)  # Simulate processing time
-    
-    if "bitcoin" in query.lower():
-        return {
-            "answer": "Based on current market conditions, Bitcoin is showing high volatility. Given your moderate risk profile, I'd recommend limiting cryptocurrency exposure to no more than 5% of your portfolio.",
-            "sources": [
-                {"title": "Cryptocurrency Market Update", "url": "https://example.com/crypto-update"},
-                {"title": "Bitcoin Analysis", "url": "https://example.com/bitcoin-analysis"}
-            ]
-        }
-    elif "stock" in query.lower() or "invest" in query.lower():
-        return {
-            "answer": f"Based on your {user_profile['risk_profile']} risk profile, I would recommend diversifying your portfolio across different sectors. Your focus on {user_profile['investment_goals']} aligns with a strategy of...",
-            "sources": [
-                {"title": "Investment Basics", "url": "https://example.com/investment-basics"},
-                {"title": "Market Analysis Q2 2023", "url": "https://example.com/market-analysis"}
-            ]
-        }
-    else:
-        return {
-            "answer": "I'm currently in development mode and have limited knowledge. Please ask me about investments or stocks!",
-            "sources": []
-        }
+    return get_assistant_pipeline().respond(query, user_profile)
+
+def show_sources(sources):
+    with st.expander("📚 Sources"):
+        for source in sources:
+            st.markdown(f"- [{source['title']}]({source['url']})")
+
+def show_metrics(metrics):
+    """Caption with the response's latency, shown in debug mode"""
+    from config import DEBUG
+    if DEBUG and metrics.get("cached"):
+        st.caption(f"Cached answer · total {metrics['total_ms']:.0f} ms")
+    elif DEBUG and metrics.get("ttft_ms") is not None:
+        rate = f" · {metrics['tokens_per_second']:.0f} tokens/s" if metrics.get("tokens_per_second") else ""
+        st.caption(f"Retrieval {metrics['retrieval_ms']:.0f} ms · first token {metrics['ttft_ms']:.0f} ms"
+                   f"{rate} · total {metrics['total_ms']:.0f} ms")
 
 def show_assistant():
     """Display the chat assistant interface"""
@@ -68,41 +61,58 @@ def show_assistant():
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
             if message.get("sources"):
-                with st.expander("📚 Sources"):
-                    for source in message["sources"]:
-                        st.markdown(f"- [{source['title']}]({source['url']})")
+                show_sources(message["sources"])
     
     # Chat input
     if prompt := st.chat_input("Ask a question about investments..."):
+        # The bounded view of the conversation so far goes with the question
+        if "chat_context" not in st.session_state:
+            st.session_state.chat_context = ConversationContext()
+        conversation = st.session_state.chat_context.window(st.session_state.chat_history)
+        
         # Add user message to chat history
-        st.session_state.chat_history.append({"role": "user", "content": prompt, "timestamp": datetime.now().isoformat()})
+        user_id = st.session_state.get("user_id", "guest")
+        user_message = {"role": "user", "content": prompt, "timestamp": datetime.now().isoformat()}
+        st.session_state.chat_history.append(user_message)
+        get_user_store().append_chat(user_id, user_message)
         
         # Display user message
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Generate and display assistant response
+        # Stream the assistant response, rendering tokens as they arrive
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = get_assistant_response(prompt, st.session_state.user_profile)
-                st.markdown(response["answer"])
-                
-                # Show sources if available
-                if response.get("sources"):
-                    with st.expander("📚 Sources"):
-                        for source in response["sources"]:
-                            st.markdown(f"- [{source['title']}]({source['url']})")
+            response = {"sources": [], "metrics": {}}
+            
+            def answer_tokens():
+                for event in get_assistant_pipeline().stream(prompt, st.session_state.user_profile, conversation, user_id):
+                    if event["type"] == "token":
+                        yield event["text"]
+                    elif event["type"] in ("sources", "metrics"):
+                        response[event["type"]] = event[event["type"]]
+            
+            answer = st.write_stream(answer_tokens())
+            
+            # Show sources if available
+            if response["sources"]:
+                show_sources(response["sources"])
+            show_metrics(response["metrics"])
         
         # Add assistant response to chat history
-        st.session_state.chat_history.append({
+        assistant_message = {
             "role": "assistant", 
-            "content": response["answer"], 
-            "sources": response.get("sources", []),
+            "content": answer, 
+            "sources": response["sources"],
+            "metrics": {key: response["metrics"].get(key) for key in ("retrieval_ms", "ttft_ms", "tokens_per_second", "total_ms")},
             "timestamp": datetime.now().isoformat()
-        })
+        }
+        st.session_state.chat_history.append(assistant_message)
+        get_user_store().append_chat(user_id, assistant_message)
     
     # Clear chat history button
     if st.session_state.chat_history:
         if st.button("Clear Chat History", type="secondary"):
             st.session_state.chat_history = []
+            st.session_state.pop("chat_context", None)
+            get_user_store().clear_chat(st.session_state.get("user_id", "guest"))
             st.experimental_rerun()
\ No newline at end of file
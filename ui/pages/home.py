@@ -1,5 +1,6 @@
 # ui/pages/home.py - Home page for the application
 import streamlit as st
+from ui.components import show_index_metric, show_market_data_notice
 
 def show_home_page():
     """Display the home page content"""
@@ -95,6 +96,14 @@ def show_home_page():
         }
     ]
     
+    # The sector with the most positive news lately, once news has been scored
+    from analysis.sentiment import get_sentiment_tracker
+    sectors = get_sentiment_tracker().scores(kind="sector")
+    if sectors:
+        best = max(sectors, key=sectors.get)
+        example_insights[1]["content"] = (f"News about the {best} sector has been the most positive lately "
+                                          f"(sentiment {sectors[best]:+.2f}); worth a closer look if it fits your profile.")
+    
     cols = st.columns(len(example_insights))
     for i, insight in enumerate(example_insights):
         with cols[i]:
@@ -105,16 +114,21 @@ def show_home_page():
     st.markdown("---")
     st.subheader("📈 Quick Market Overview")
     
-    # Placeholder for real-time data (you can implement this later)
+    # Shared market snapshot, updated as quotes stream in. Imported here so the
+    # static content above paints before numpy, pandas and the price store load.
+    from analysis.market_overview import get_market_overview
+    snapshot = get_market_overview().snapshot()
+    show_market_data_notice(snapshot)
+    
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("S&P 500", "5,872", "+1.2%", delta_color="normal")
+        show_index_metric(snapshot, "S&P 500", delta_color="normal")
     with col2:
-        st.metric("NASDAQ", "19,372", "+0.8%", delta_color="normal")
+        show_index_metric(snapshot, "NASDAQ", delta_color="normal")
     with col3:
-        st.metric("USD/EUR", "0.93", "-0.2%", delta_color="inverse")
+        show_index_metric(snapshot, "USD/EUR", delta_color="inverse")
     with col4:
-        st.metric("Gold", "$2,318", "-0.5%", delta_color="inverse")
+        show_index_metric(snapshot, "Gold", prefix="$", delta_color="inverse")
     
     # Info box
     st.info("Navigate to the 'Profile' page to set up your investment preferences, or go directly to the 'Assistant' page to start asking financial questions.")
\ No newline at end of file
@@ -2,13 +2,43 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from datetime import datetime, timedelta
+from datetime import datetime
+from data.symbol_search import get_search_index
+from analysis.alerts import get_alert_engine, VOLUME_SPIKE
+from data.chart_data import CHART_RANGES, get_chart_candles, get_chart_line
+from ui.page_cache import cached, current_session_id
+from ui.components import show_data_grid
+from data.cache import shared_cache
+from data.user_store import get_user_store
+from data.fx import CURRENCIES, CURRENCY_SYMBOLS, PIVOT_CURRENCY, format_money, get_fx_service
+
+def holdings_columns(reporting):
+   """Grid formats: prices in each position's own currency, values in the reporting currency"""
+   sign = CURRENCY_SYMBOLS.get(reporting, "")
+   return {
+       'Avg Cost': st.column_config.NumberColumn(format="%.2f"),
+       'Current Price': st.column_config.NumberColumn(format="%.2f"),
+       'Market Value': st.column_config.NumberColumn(format=f"{sign}%.2f"),
+       'Gain/Loss': st.column_config.NumberColumn(format=f"{sign}%.2f"),
+       'Gain/Loss (%)': st.column_config.NumberColumn(format="%.1f%%"),
+       'Priced': None
+   }
+
+WATCHLIST_COLUMNS = {
+   'Price': st.column_config.NumberColumn(format="$%.2f")
+}
 
 def show_portfolio():
    """Display the portfolio tracking page"""
    st.header("💼 Portfolio Management")
    
+   # Values, P&L and history are converted into this currency
+   st.selectbox("Reporting currency", CURRENCIES, key="reporting_currency")
+   if reporting_currency() != st.session_state.reporting_currency:
+       st.warning(f"No {st.session_state.reporting_currency} exchange rates are stored yet; "
+                  f"amounts are shown in {PIVOT_CURRENCY}.")
+   show_unpriced_warning(st.session_state.get("user_id", "guest"), reporting_currency())
+   
    # Portfolio tabs
    tab1, tab2, tab3, tab4 = st.tabs(["📊 Overview", "📈 Holdings", "📋 Watchlist", "⚡ Rebalancing"])
    
@@ -24,44 +54,125 @@ def show_portfolio():
    with tab4:
        portfolio_rebalancing()
 
+def reporting_currency():
+   """Selected reporting currency, or the pivot currency while the selected one has no rates"""
+   currency = st.session_state.get("reporting_currency", PIVOT_CURRENCY)
+   return currency if get_fx_service().has_rates(currency) else PIVOT_CURRENCY
+
+def show_unpriced_warning(user_id, reporting):
+   """Name the positions whose currency has no exchange rate, which values and totals leave out"""
+   holdings = cached(f"portfolio:{user_id}", ("holdings", reporting),
+                     lambda: get_holdings_data(user_id, reporting), version=portfolio_data_version())
+   unpriced = holdings[~holdings['Priced']]
+   if not unpriced.empty:
+       st.warning(f"No exchange rates are stored for {', '.join(sorted(set(unpriced['Currency'])))}, so these "
+                  f"positions are left out of the {reporting} values and totals: {', '.join(unpriced['Symbol'])}")
+
+def portfolio_data_version():
+   """Token that changes when stored prices or FX rates change; trades invalidate the portfolio namespace"""
+   from data.price_store import get_price_store
+   return get_price_store().store_version(), get_fx_service().version
+
 def portfolio_overview():
    """Display portfolio overview and performance"""
    st.subheader("Portfolio Overview")
    
-   # Portfolio metrics
+   user_id = st.session_state.get("user_id", "guest")
+   reporting = reporting_currency()
+   
+   # Portfolio metrics in the reporting currency
+   metrics = cached(f"portfolio:{user_id}", ("metrics", reporting),
+                    lambda: portfolio_metrics(user_id, reporting), version=portfolio_data_version())
    col1, col2, col3, col4 = st.columns(4)
    
    with col1:
-       st.metric("Portfolio Value", "$125,750", "+$5,840 (4.9%)")
+       month = metrics['month_change']
+       st.metric("Portfolio Value", format_money(metrics['value'], reporting),
+                 None if month is None else f"{format_money(month, reporting)} (30 days)")
    with col2:
-       st.metric("Day's Gain/Loss", "+$1,420", "+1.14%")
+       day, day_pct = metrics['day_change'], metrics['day_change_pct']
+       st.metric("Day's Gain/Loss", "-" if day is None else format_money(day, reporting),
+                 None if day_pct is None else f"{day_pct:+.2f}%")
    with col3:
-       st.metric("Total Gain/Loss", "+$15,230", "+13.8%")
+       st.metric("Total Gain/Loss", format_money(metrics['gain'], reporting), f"{metrics['gain_pct']:+.1f}%")
    with col4:
-       st.metric("Dividend Income", "$1,240", "+12.5%")
+       st.metric("Positions", metrics['positions'])
    
    # Portfolio performance chart
    st.subheader("Portfolio Performance")
    
-   # Generate sample portfolio data
-   dates = pd.date_range(start='2023-01-01', end='2024-05-03', freq='D')
-   portfolio_value = generate_portfolio_data(dates)
+   range_label = st.radio("Range", list(CHART_RANGES), index=3, horizontal=True, key="portfolio_range")
+   
+   # Figures are shared across reruns and sessions until the portfolio, prices or FX rates change
+   fig = cached(f"portfolio:{user_id}", ("performance", range_label, reporting),
+                lambda: create_performance_chart(user_id, range_label, reporting), version=portfolio_data_version())
+   st.plotly_chart(fig, use_container_width=True)
+   
+   # Asset allocation pie chart
+   col1, col2 = st.columns(2)
+   
+   with col1:
+       st.subheader("Asset Allocation")
+       fig_pie = cached(f"portfolio:{user_id}", "asset_allocation", lambda: create_allocation_chart(
+           ['Stocks', 'Bonds', 'Cash', 'Commodities'], [60, 24, 12, 4]))
+       st.plotly_chart(fig_pie, use_container_width=True)
+   
+   with col2:
+       st.subheader("Sector Allocation")
+       fig_sector = cached(f"portfolio:{user_id}", "sector_allocation", lambda: create_allocation_chart(
+           ['Technology', 'Healthcare', 'Finance', 'Consumer', 'Others'], [35, 20, 15, 15, 15]))
+       st.plotly_chart(fig_sector, use_container_width=True)
+
+def portfolio_metrics(user_id, reporting=PIVOT_CURRENCY):
+   """Value and P&L of the holdings, and day and 30-day changes of the daily NAV, in the reporting currency"""
+   holdings = get_holdings_data(user_id, reporting)
+   priced = holdings[holdings['Priced']]
+   value, cost = float(priced['Market Value'].sum()), float(priced['Cost'].sum())
+   metrics = {
+       'value': value, 'gain': value - cost, 'gain_pct': (value / cost - 1) * 100 if cost else 0.0,
+       'positions': len(holdings), 'day_change': None, 'day_change_pct': None, 'month_change': None
+   }
+   nav, _ = load_nav_history(user_id, reporting)
+   if nav is not None and len(nav) > 1:
+       metrics['day_change'] = float(nav.iloc[-1] - nav.iloc[-2])
+       metrics['day_change_pct'] = (nav.iloc[-1] / nav.iloc[-2] - 1) * 100
+       # Portfolios younger than 30 days change from their first value
+       month_ago = nav.asof(nav.index[-1] - pd.Timedelta(days=30))
+       metrics['month_change'] = float(nav.iloc[-1] - (nav.iloc[0] if pd.isna(month_ago) else month_ago))
+   return metrics
+
+def create_performance_chart(user_id, range_label, reporting=PIVOT_CURRENCY):
+   """Build the portfolio vs S&P 500 performance figure"""
+   portfolio_series, sp500_series = load_nav_history(user_id, reporting)
+   if portfolio_series is None:
+       # Generate sample portfolio data
+       dates = pd.date_range(start='2023-01-01', end='2024-05-03', freq='D')
+       portfolio_value = generate_portfolio_data(dates)
+       sp500_value = portfolio_value * (0.85 + 0.03 * (dates - dates[0]).days / 365)
+       portfolio_series = pd.Series(portfolio_value, index=dates)
+       sp500_series = pd.Series(sp500_value, index=dates)
+   
+   # Both lines are reduced to the chart width before they are sent to the browser
+   session_id = current_session_id()
+   portfolio_line = get_chart_line(f"portfolio:{user_id}:{reporting}", portfolio_series,
+                                   range_label, session_id=session_id)
+   sp500_line = get_chart_line(f"portfolio_sp500:{user_id}:{reporting}", sp500_series,
+                               range_label, session_id=session_id)
    
    fig = go.Figure()
    
    # Portfolio line
    fig.add_trace(go.Scatter(
-       x=dates,
-       y=portfolio_value,
+       x=portfolio_line.index,
+       y=portfolio_line.to_numpy(),
        name='Portfolio',
        line=dict(color='#2E86C1', width=3)
    ))
    
    # S&P 500 comparison
-   sp500_value = portfolio_value * (0.85 + 0.03 * (dates - dates[0]).days / 365)
    fig.add_trace(go.Scatter(
-       x=dates,
-       y=sp500_value,
+       x=sp500_line.index,
+       y=sp500_line.to_numpy(),
        name='S&P 500',
        line=dict(color='#E74C3C', width=2, dash='dash')
    ))
@@ -69,139 +180,100 @@ def portfolio_overview():
    fig.update_layout(
        title='Portfolio Performance vs S&P 500',
        xaxis_title='Date',
-       yaxis_title='Value ($)',
+       yaxis_title=f'Value ({reporting})',
        height=500,
        hovermode='x unified'
    )
-   
-   st.plotly_chart(fig, use_container_width=True)
-   
-   # Asset allocation pie chart
-   col1, col2 = st.columns(2)
-   
-   with col1:
-       st.subheader("Asset Allocation")
-       allocation_data = pd.DataFrame({
-           'Asset': ['Stocks', 'Bonds', 'Cash', 'Commodities'],
-           'Value': [75200, 30100, 15450, 5000],
-           'Percentage': [60, 24, 12, 4]
-       })
-       
-       fig_pie = go.Figure(data=[go.Pie(
-           labels=allocation_data['Asset'],
-           values=allocation_data['Percentage'],
-           hole=.4,
-           textposition='inside',
-           textinfo='label+percent'
-       )])
-       
-       fig_pie.update_layout(height=400)
-       st.plotly_chart(fig_pie, use_container_width=True)
-   
-   with col2:
-       st.subheader("Sector Allocation")
-       sector_data = pd.DataFrame({
-           'Sector': ['Technology', 'Healthcare', 'Finance', 'Consumer', 'Others'],
-           'Percentage': [35, 20, 15, 15, 15]
-       })
-       
-       fig_sector = go.Figure(data=[go.Pie(
-           labels=sector_data['Sector'],
-           values=sector_data['Percentage'],
-           hole=.4,
-           textposition='inside',
-           textinfo='label+percent'
-       )])
-       
-       fig_sector.update_layout(height=400)
-       st.plotly_chart(fig_sector, use_container_width=True)
+   return fig
+
+def load_nav_history(user_id, reporting):
+   """The user's daily portfolio value and the S&P 500 scaled to its start, or (None, None) without trades"""
+   from analysis.valuation import nav_history
+   from data.price_store import get_price_store
+   
+   transactions = get_user_store().transactions(user_id, limit=-1)
+   if not transactions:
+       return None, None
+   fx = get_fx_service()
+   nav = nav_history(transactions, reporting, fx=fx)
+   nav = nav[nav > 0]
+   if nav.empty:
+       return None, None
+   
+   store = get_price_store()
+   if not store.has('^GSPC'):
+       return nav, pd.Series(dtype=float)
+   sp500 = store.panel(['^GSPC'], 'Close').reindex(nav.index, method='ffill')
+   sp500 = fx.convert_history(sp500, [PIVOT_CURRENCY], reporting)['^GSPC']
+   return nav, sp500 / sp500.iloc[0] * nav.iloc[0]
+
+def create_allocation_chart(labels, percentages):
+   """Build an allocation donut chart"""
+   fig = go.Figure(data=[go.Pie(
+       labels=labels,
+       values=percentages,
+       hole=.4,
+       textposition='inside',
+       textinfo='label+percent'
+   )])
+   
+   fig.update_layout(height=400)
+   return fig
 
 def portfolio_holdings():
    """Display detailed portfolio holdings"""
    st.subheader("Current Holdings")
    
    # Holdings data
-   holdings_data = pd.DataFrame({
-       'Symbol': ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'JNJ', 'BRK.B', 'V', 'LLY', 'TSLA'],
-       'Company': ['Apple Inc.', 'Microsoft Corp.', 'Alphabet Inc.', 'Amazon.com Inc.', 
-                   'Meta Platforms', 'Johnson & Johnson', 'Berkshire Hathaway', 'Visa Inc.',
-                   'Eli Lilly', 'Tesla Inc.'],
-       'Shares': [50, 25, 5, 30, 20, 40, 25, 35, 15, 10],
-       'Avg Cost': [145.50, 280.25, 2450.00, 145.80, 280.50, 155.25, 480.75, 240.30, 480.90, 250.00],
-       'Current Price': [178.25, 338.11, 2819.89, 175.75, 321.22, 160.45, 525.80, 268.50, 532.75, 245.60],
-       'Market Value': [8912.50, 8452.75, 14099.45, 5272.50, 6424.40, 6418.00, 13145.00, 9397.50, 7991.25, 2456.00],
-       'Gain/Loss ($)': [1637.50, 1446.50, 1849.45, 898.50, 814.40, 208.00, 1126.25, 987.00, 778.75, -44.00],
-       'Gain/Loss (%)': [22.5, 20.7, 15.1, 20.5, 14.5, 3.4, 9.3, 11.7, 14.4, -1.7]
-   })
+   user_id = st.session_state.get("user_id", "guest")
+   reporting = reporting_currency()
+   holdings_data = cached(f"portfolio:{user_id}", ("holdings", reporting),
+                          lambda: get_holdings_data(user_id, reporting), version=portfolio_data_version())
    
-   # Search and filter
-   col1, col2 = st.columns([3, 1])
-   with col1:
-       search_term = st.text_input("Search holdings", placeholder="Search by symbol or company name")
-   with col2:
-       sort_by = st.selectbox("Sort by", ["Current Value", "Gain/Loss %", "Gain/Loss $", "Symbol"])
+   # Search filter
+   search_term = st.text_input("Search holdings", placeholder="Search by symbol or company name")
    
-   # Apply search filter
+   # Apply search filter through the shared symbol index
    if search_term:
-       mask = (holdings_data['Symbol'].str.contains(search_term, case=False) | 
-               holdings_data['Company'].str.contains(search_term, case=False))
-       holdings_data = holdings_data[mask]
-   
-   # Sort data
-   if sort_by == "Current Value":
-       holdings_data = holdings_data.sort_values('Market Value', ascending=False)
-   elif sort_by == "Gain/Loss %":
-       holdings_data = holdings_data.sort_values('Gain/Loss (%)', ascending=False)
-   elif sort_by == "Gain/Loss $":
-       holdings_data = holdings_data.sort_values('Gain/Loss ($)', ascending=False)
-   else:
-       holdings_data = holdings_data.sort_values('Symbol')
+       matched_symbols = get_search_index().search_symbols(
+           search_term, limit=len(holdings_data), within=set(holdings_data['Symbol'])
+       )
+       holdings_data = holdings_data[holdings_data['Symbol'].isin(matched_symbols)]
+   
+   # Sorting and pagination run on the frame; only the visible page is rendered
+   selected = show_data_grid(
+       holdings_data, "holdings",
+       sort_columns=['Market Value', 'Gain/Loss (%)', 'Gain/Loss', 'Symbol', 'Shares'],
+       default_sort='Market Value',
+       column_config=holdings_columns(reporting)
+   )
    
-   # Display holdings
-   for idx, holding in holdings_data.iterrows():
-       with st.container():
-           col1, col2, col3, col4, col5, col6 = st.columns([1.5, 2, 1, 1.5, 1.5, 1])
-           
-           with col1:
-               st.markdown(f"**{holding['Symbol']}**")
-               st.caption(holding['Company'])
-           
-           with col2:
-               st.markdown(f"Shares: {holding['Shares']}")
-               st.caption(f"Avg Cost: ${holding['Avg Cost']:.2f}")
-           
-           with col3:
-               change_color = "green" if holding['Gain/Loss (%)'] > 0 else "red"
-               st.metric("Current", f"${holding['Current Price']:.2f}")
-           
-           with col4:
-               st.metric("Market Value", f"${holding['Market Value']:,.2f}")
-           
-           with col5:
-               gain_loss_color = "green" if holding['Gain/Loss ($)'] > 0 else "red"
-               st.markdown(f"<h4 style='color: {gain_loss_color}'>${holding['Gain/Loss ($)']:,.2f}</h4>", unsafe_allow_html=True)
-               st.markdown(f"<p style='color: {gain_loss_color}'>{holding['Gain/Loss (%)']:.1f}%</p>", unsafe_allow_html=True)
-           
-           with col6:
-               if st.button("📈", key=f"chart_{holding['Symbol']}", help="View Chart"):
-                   show_stock_chart(holding['Symbol'])
-               if st.button("📝", key=f"edit_{holding['Symbol']}", help="Edit Position"):
-                   edit_position(holding['Symbol'])
-           
-           st.divider()
+   # Row actions apply to the selected holding
+   if selected.empty:
+       st.caption("Select a holding to view its chart or edit the position.")
+   else:
+       symbol = selected.iloc[0]['Symbol']
+       action = st.radio("Action", ["📈 View Chart", "📝 Edit Position"], horizontal=True, key="holding_action")
+       if action == "📈 View Chart":
+           show_stock_chart(symbol)
+       else:
+           edit_position(symbol)
    
    # Performance summary
    st.subheader("Holdings Performance Summary")
    col1, col2, col3 = st.columns(3)
    
+   # Positions without an exchange rate are named in the warning at the top of the page
+   priced = holdings_data[holdings_data['Priced']]
+   total_cost = priced['Cost'].sum()
    with col1:
-       st.metric("Total Invested", f"${holdings_data['Avg Cost'].sum() * holdings_data['Shares'].sum():.2f}")
+       st.metric("Total Invested", format_money(total_cost, reporting))
    with col2:
-       st.metric("Current Value", f"${holdings_data['Market Value'].sum():.2f}")
+       st.metric("Current Value", format_money(priced['Market Value'].sum(), reporting))
    with col3:
-       total_gain = holdings_data['Gain/Loss ($)'].sum()
-       total_gain_pct = (total_gain / (holdings_data['Avg Cost'].sum() * holdings_data['Shares'].sum())) * 100
-       st.metric("Total Gain/Loss", f"${total_gain:.2f}", f"{total_gain_pct:.1f}%")
+       total_gain = priced['Gain/Loss'].sum()
+       total_gain_pct = total_gain / total_cost * 100 if total_cost else 0.0
+       st.metric("Total Gain/Loss", format_money(total_gain, reporting), f"{total_gain_pct:.1f}%")
 
 def portfolio_watchlist():
    """Display and manage watchlist"""
@@ -215,38 +287,30 @@ def portfolio_watchlist():
        if st.button("Add", use_container_width=True):
            if 'watchlist' not in st.session_state:
                st.session_state.watchlist = []
-           if new_symbol and new_symbol not in st.session_state.watchlist:
+           if new_symbol and new_symbol.upper() not in st.session_state.watchlist:
                st.session_state.watchlist.append(new_symbol.upper())
+               get_user_store().add_to_watchlist(st.session_state.get("user_id", "guest"), new_symbol)
                st.success(f"Added {new_symbol.upper()} to watchlist")
    
    # Display watchlist
    if 'watchlist' in st.session_state and st.session_state.watchlist:
-       watchlist_data = generate_watchlist_data(st.session_state.watchlist)
+       watchlist_data = cached("watchlist", tuple(st.session_state.watchlist),
+                               lambda: generate_watchlist_data(st.session_state.watchlist))
+       
+       selected = show_data_grid(
+           watchlist_data, "watchlist",
+           sort_columns=['Symbol', 'Price', 'Company'],
+           default_sort='Symbol', ascending=True,
+           column_config=WATCHLIST_COLUMNS,
+           selection_mode="multi-row"
+       )
+       
+       if not selected.empty and st.button(f"Remove {len(selected)} selected", key="remove_watchlist"):
+           removed = set(selected['Symbol'])
+           st.session_state.watchlist = [symbol for symbol in st.session_state.watchlist if symbol not in removed]
+           get_user_store().remove_from_watchlist(st.session_state.get("user_id", "guest"), removed)
+           st.rerun()
        
-       for idx, stock in watchlist_data.iterrows():
-           with st.container():
-               col1, col2, col3, col4, col5 = st.columns([1.5, 1.5, 1.5, 1, 1])
-               
-               with col1:
-                   st.markdown(f"**{stock['Symbol']}**")
-                   st.caption(stock['Company'])
-               
-               with col2:
-                   st.metric("Price", f"${stock['Price']:.2f}", stock['Change'])
-               
-               with col3:
-                   st.metric("Volume", f"{stock['Volume']:,}")
-               
-               with col4:
-                   st.metric("Market Cap", stock['Market Cap'])
-               
-               with col5:
-                   if st.button("Remove", key=f"remove_{stock['Symbol']}"):
-                       st.session_state.watchlist.remove(stock['Symbol'])
-                       st.experimental_rerun()
-               
-               st.divider()
-               
        # Watchlist alerts
        st.subheader("Price Alerts")
        col1, col2, col3 = st.columns(3)
@@ -261,8 +325,33 @@ def portfolio_watchlist():
            else:
                alert_value = None
        
+       alert_engine = get_alert_engine()
+       user_id = st.session_state.get("user_id", "guest")
+       
        if st.button("Set Alert", use_container_width=True):
-           st.success(f"Alert set for {alert_symbol}")
+           try:
+               alert_id = alert_engine.add_alert(user_id, alert_symbol, alert_type, alert_value)
+               if alert_id in alert_engine.alerts:
+                   st.success(f"Alert set for {alert_symbol}")
+               else:
+                   st.info(f"{alert_symbol} already meets this condition; the alert triggered right away")
+           except ValueError as e:
+               st.error(str(e))
+       
+       # Active and recently triggered alerts
+       for alert in alert_engine.user_alerts(user_id):
+           col1, col2 = st.columns([4, 1])
+           with col1:
+               condition = alert['alert_type'] if alert['alert_type'] == VOLUME_SPIKE else f"{alert['alert_type']} ${alert['threshold']:.2f}"
+               st.markdown(f"🔔 **{alert['symbol']}** - {condition}")
+           with col2:
+               if st.button("Delete", key=f"alert_{alert['id']}"):
+                   alert_engine.remove_alert(alert['id'])
+                   st.rerun()
+       
+       for event in alert_engine.recent_events(user_id)[:5]:
+           triggered_at = datetime.fromtimestamp(event['timestamp']).strftime('%Y-%m-%d %H:%M')
+           st.caption(f"{triggered_at} - {event['symbol']} {event['alert_type']} triggered at ${event['price']:.2f}")
    else:
        st.info("Your watchlist is empty. Add some stocks to track!")
 
@@ -318,16 +407,20 @@ def portfolio_rebalancing():
    st.subheader("Tax-Loss Harvesting Opportunities")
    
    # Find holdings with losses
-   holdings_data = get_holdings_data()
-   loss_opportunities = holdings_data[holdings_data['Gain/Loss ($)'] < 0].copy()
+   user_id = st.session_state.get("user_id", "guest")
+   reporting = reporting_currency()
+   holdings_data = cached(f"portfolio:{user_id}", ("holdings", reporting),
+                          lambda: get_holdings_data(user_id, reporting), version=portfolio_data_version())
+   loss_opportunities = holdings_data[holdings_data['Gain/Loss'] < 0].copy()
    
    if not loss_opportunities.empty:
-       loss_opportunities['Loss Amount'] = loss_opportunities['Gain/Loss ($)'].abs()
+       loss_opportunities['Loss Amount'] = loss_opportunities['Gain/Loss'].abs()
        loss_opportunities = loss_opportunities.sort_values('Loss Amount', ascending=False)
        
        for idx, holding in loss_opportunities.head(3).iterrows():
-           st.markdown(f"**{holding['Symbol']}** - Potential tax savings: ${holding['Loss Amount'] * 0.25:.2f}")
-           st.caption(f"Loss: ${holding['Loss Amount']:.2f} ({holding['Gain/Loss (%)']:.1f}%)")
+           st.markdown(f"**{holding['Symbol']}** - Potential tax savings: "
+                       f"{format_money(holding['Loss Amount'] * 0.25, reporting)}")
+           st.caption(f"Loss: {format_money(holding['Loss Amount'], reporting)} ({holding['Gain/Loss (%)']:.1f}%)")
    else:
        st.info("No significant tax-loss harvesting opportunities at this time.")
    
@@ -394,14 +487,15 @@ def show_stock_chart(symbol):
    """Show a chart for the selected stock"""
    st.subheader(f"{symbol} Price Chart")
    
-   # Generate sample data for the chart
-   dates = pd.date_range(start='2024-01-01', end='2024-05-03', freq='D')
-   prices = generate_sample_stock_data(symbol, dates)
+   prices = get_chart_candles(symbol, "1Y")
+   if prices is None:
+       dates = pd.date_range(start='2024-01-01', end='2024-05-03', freq='D')
+       prices = get_chart_candles(symbol, "1Y", frame=generate_sample_stock_data(symbol, dates))
    
    fig = go.Figure()
    
    fig.add_trace(go.Candlestick(
-       x=dates,
+       x=prices.index,
        open=prices['Open'],
        high=prices['High'],
        low=prices['Low'],
@@ -430,15 +524,28 @@ def edit_position(symbol):
        shares = st.number_input("Number of Shares", min_value=1, value=10)
    
    with col2:
-       price = st.number_input("Price per Share", min_value=0.01, value=100.00)
+       from data.fx import native_currency
+       currency = native_currency(symbol)
+       price = st.number_input(f"Price per Share ({currency})", min_value=0.01, value=100.00)
        date = st.date_input("Transaction Date", value=datetime.now())
    
    if st.button("Submit", use_container_width=True):
-       st.success(f"{action} order submitted for {shares} shares of {symbol} at ${price:.2f}")
+       user_id = st.session_state.get("user_id", "guest")
+       executed_at = datetime.combine(date, datetime.now().time()).timestamp()
+       get_user_store().record_transaction(user_id, symbol, action, shares, price, executed_at, currency=currency)
+       # Holdings and figures derived from the old position are stale now
+       shared_cache.invalidate(f"portfolio:{user_id}")
+       st.success(f"{action} order submitted for {shares} shares of {symbol} at {format_money(price, currency)}")
 
-def get_holdings_data():
-   """Get portfolio holdings data"""
-   return pd.DataFrame({
+def get_holdings_data(user_id="guest", reporting=PIVOT_CURRENCY):
+   """Get portfolio holdings data, from the user's stored positions when there are any"""
+   from analysis.valuation import value_positions
+   
+   holdings = get_user_store().load_user_state(user_id)["holdings"]
+   if holdings:
+       return value_positions(build_holdings_frame(holdings), reporting)
+   
+   return value_positions(pd.DataFrame({
        'Symbol': ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'JNJ', 'BRK.B', 'V', 'LLY', 'TSLA'],
        'Company': ['Apple Inc.', 'Microsoft Corp.', 'Alphabet Inc.', 'Amazon.com Inc.', 
                    'Meta Platforms', 'Johnson & Johnson', 'Berkshire Hathaway', 'Visa Inc.',
@@ -446,10 +553,22 @@ def get_holdings_data():
        'Shares': [50, 25, 5, 30, 20, 40, 25, 35, 15, 10],
        'Avg Cost': [145.50, 280.25, 2450.00, 145.80, 280.50, 155.25, 480.75, 240.30, 480.90, 250.00],
        'Current Price': [178.25, 338.11, 2819.89, 175.75, 321.22, 160.45, 525.80, 268.50, 532.75, 245.60],
-       'Market Value': [8912.50, 8452.75, 14099.45, 5272.50, 6424.40, 6418.00, 13145.00, 9397.50, 7991.25, 2456.00],
-       'Gain/Loss ($)': [1637.50, 1446.50, 1849.45, 898.50, 814.40, 208.00, 1126.25, 987.00, 778.75, -44.00],
-       'Gain/Loss (%)': [22.5, 20.7, 15.1, 20.5, 14.5, 3.4, 9.3, 11.7, 14.4, -1.7]
-   })
+       'Currency': 'USD'
+   }), reporting)
+
+def build_holdings_frame(holdings):
+   """Price stored positions at the latest stored close in their own currency, falling back to their cost"""
+   from data.price_store import get_price_store
+   from data.universe import load_universe
+   
+   frame = pd.DataFrame(holdings).rename(columns={'symbol': 'Symbol', 'shares': 'Shares', 'avg_cost': 'Avg Cost',
+                                                  'currency': 'Currency'})
+   latest = get_price_store().latest(frame['Symbol'])
+   companies = load_universe().set_index('Symbol')['Company']
+   
+   frame['Company'] = frame['Symbol'].map(companies).fillna(frame['Symbol'])
+   frame['Current Price'] = frame['Symbol'].map(latest['Close']).fillna(frame['Avg Cost'])
+   return frame[['Symbol', 'Company', 'Currency', 'Shares', 'Avg Cost', 'Current Price']]
 
 def generate_sample_stock_data(symbol, dates):
    """Generate sample stock price data"""
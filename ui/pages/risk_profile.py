@@ -1,5 +1,6 @@
 # ui/pages/risk_profile.py - Risk profile assessment page
 import streamlit as st
+from data.user_store import get_user_store
 
 def show_risk_profile():
     """Display the risk profile assessment page"""
@@ -77,6 +78,10 @@ def show_risk_profile():
         submitted = st.form_submit_button("Save Profile", use_container_width=True)
         
         if submitted:
+            risk_score = calculate_risk_score(
+                risk_tolerance, market_sentiment, max_loss_tolerance
+            )
+            
             # Update session state with the profile
             st.session_state.user_profile = {
                 "age": age,
@@ -87,18 +92,16 @@ def show_risk_profile():
                 "investment_goals": ", ".join(investment_goals),
                 "preferred_sectors": preferred_sectors,
                 "max_loss_tolerance": max_loss_tolerance,
-                "market_sentiment": market_sentiment
+                "market_sentiment": market_sentiment,
+                "risk_score": risk_score
             }
             
+            get_user_store().save_profile(st.session_state.get("user_id", "guest"), st.session_state.user_profile)
             st.success("✅ Profile saved successfully!")
             
             # Provide quick analysis
             st.subheader("Quick Profile Analysis")
             
-            risk_score = calculate_risk_score(
-                risk_tolerance, market_sentiment, max_loss_tolerance
-            )
-            
             st.markdown(f"**Your Risk Score:** {risk_score}/10")
             st.progress(risk_score / 10)
             
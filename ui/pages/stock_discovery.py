@@ -2,7 +2,30 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import datetime
+from analysis.profile_matching import ProfileMatcher
+from data.symbol_search import get_search_index
+from analysis.market_overview import get_market_overview
+from data.chart_data import CHART_RANGES, get_chart_candles
+from data.price_store import get_price_store
+from ui.components import show_index_metric, show_market_data_notice
+from ui.page_cache import cached, current_session_id
+
+# Shown until news has been scraped and linked
+SAMPLE_NEWS = [
+    {
+        "title": "Tech Giants Report Better-than-Expected Earnings",
+        "source": "CNBC",
+        "time": "4 hours ago",
+        "summary": "Apple, Microsoft, and Google exceed earnings forecasts, driving tech sector rally."
+    },
+    {
+        "title": "Global Markets React to Economic Data",
+        "source": "Bloomberg",
+        "time": "6 hours ago",
+        "summary": "Asian markets climb on positive economic indicators from China and Japan."
+    }
+]
 
 def show_stock_discovery():
     """Display the stock discovery page"""
@@ -26,6 +49,10 @@ def show_stock_discovery():
             ["All", "Low", "Medium", "High"]
         )
     
+    # Typeahead results from the shared symbol index
+    if search_query:
+        show_search_results(search_query)
+    
     # Main content area with tabs
     tab1, tab2, tab3 = st.tabs(["📊 Recommended Stocks", "🎯 Match with Your Profile", "📈 Market Overview"])
     
@@ -42,6 +69,16 @@ def show_stock_discovery():
             'Risk': ['Medium', 'Medium', 'Medium', 'Medium', 'High']
         })
         
+        # News sentiment per ticker, a dictionary lookup each
+        from analysis.sentiment import get_sentiment_tracker
+        sentiment = get_sentiment_tracker().scores()
+        stock_data['Sentiment'] = stock_data['Symbol'].map(sentiment)
+        
+        # Analyst consensus per ticker, precomputed on ingestion
+        from data.analyst_ratings import get_ratings_store
+        ratings = get_ratings_store()
+        stock_data['Consensus'] = [(ratings.consensus(symbol) or {}).get('consensus') for symbol in stock_data['Symbol']]
+        
         # Apply filters
         filtered_stocks = stock_data.copy()
         if sector_filter != "All":
@@ -56,7 +93,9 @@ def show_stock_discovery():
                 
                 with col1:
                     st.markdown(f"**{stock['Symbol']}** - {stock['Company']}")
-                    st.caption(f"Sector: {stock['Sector']}")
+                    mood = f" • Sentiment: {stock['Sentiment']:+.2f}" if pd.notna(stock['Sentiment']) else ""
+                    rating = f" • Analysts: {stock['Consensus']}" if stock['Consensus'] else ""
+                    st.caption(f"Sector: {stock['Sector']}{mood}{rating}")
                 
                 with col2:
                     st.metric("Price", f"${stock['Price']}", stock['Change'])
@@ -79,13 +118,14 @@ def show_stock_discovery():
     with tab2:
         st.subheader("Stocks That Match Your Profile")
         
-        if st.session_state.user_profile['risk_profile'] in st.session_state.user_profile:
-            risk_profile = st.session_state.user_profile['risk_profile']
+        # The risk score is only stored once the profile form has been submitted
+        if "risk_score" in st.session_state.user_profile:
+            user_profile = st.session_state.user_profile
             
-            st.markdown(f"Based on your **{risk_profile}** risk profile:")
+            st.markdown(f"Based on your **{user_profile['risk_profile']}** risk profile:")
             
-            # Generate recommendations based on risk profile
-            matched_stocks = generate_profile_matched_stocks(risk_profile)
+            # Score the whole universe against the full profile
+            matched_stocks = generate_profile_matched_stocks(user_profile)
             
             for stock in matched_stocks:
                 st.markdown(f"- **{stock['name']}** ({stock['symbol']}) - {stock['reason']}")
@@ -98,47 +138,63 @@ def show_stock_discovery():
     with tab3:
         st.subheader("Market Overview")
         
+        # Every session reads the same shared snapshot
+        snapshot = get_market_overview().snapshot()
+        show_market_data_notice(snapshot)
+        
         # Market indices display
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("S&P 500", "5,872", "+1.2%")
+            show_index_metric(snapshot, "S&P 500")
         with col2:
-            st.metric("NASDAQ", "19,372", "+0.8%")
+            show_index_metric(snapshot, "NASDAQ")
         with col3:
-            st.metric("DOW", "39,432", "+0.5%")
+            show_index_metric(snapshot, "DOW")
         with col4:
-            st.metric("VIX", "12.45", "-0.3%")
+            show_index_metric(snapshot, "VIX", delta_color="inverse")
+        
+        breadth = snapshot["breadth"]
+        st.caption(f"Breadth: {breadth['advancers']} advancing, {breadth['decliners']} declining, "
+                   f"{breadth['unchanged']} unchanged")
         
-        # Market heatmap (placeholder)
+        # Market heatmap
         st.subheader("Sector Performance")
-        create_sector_heatmap()
+        create_sector_heatmap(snapshot)
         
-        # Market news (placeholder)
+        # Market news, filterable by holding
         st.subheader("Market News")
         show_market_news()
 
+def show_search_results(search_query, limit=8):
+    """Show ranked symbol and company matches for the search box"""
+    matches = get_search_index().search(search_query, limit=limit)
+    
+    if not matches:
+        st.caption(f"No stocks match '{search_query}'")
+        return
+    
+    for match in matches:
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.markdown(f"**{match['symbol']}** - {match['company']}")
+            st.caption(match['exchange'])
+        with col2:
+            if st.button("View Details", key=f"search_{match['symbol']}"):
+                st.session_state.selected_stock = match['symbol']
+                st.rerun()
+
 def show_stock_details(symbol):
     """Show detailed information for a specific stock"""
     st.header(f"📈 {symbol} - Stock Details")
     
-    # Create sample stock chart
-    dates = pd.date_range(start='2023-11-01', end='2024-05-03', freq='B')
-    prices = generate_sample_price_data(symbol, dates)
+    # Narrower ranges get the same point budget, so zooming in refines the candles
+    range_label = st.radio("Range", list(CHART_RANGES), index=3, horizontal=True, key=f"range_{symbol}")
     
-    fig = go.Figure(data=[go.Candlestick(x=dates,
-                open=prices['Open'],
-                high=prices['High'],
-                low=prices['Low'],
-                close=prices['Close'])])
-    
-    fig.update_layout(
-        title=f'{symbol} Price Chart',
-        yaxis_title='Price (USD)',
-        xaxis_title='Date',
-        xaxis_rangeslider_visible=False,
-        height=500
-    )
+    # The figure is shared by every session until the stored history changes
+    fig = cached(f"prices:{symbol}", ("candlestick", range_label),
+                 lambda: create_candlestick_chart(symbol, range_label),
+                 version=get_price_store().version(symbol))
     
     st.plotly_chart(fig, use_container_width=True)
     
@@ -161,26 +217,87 @@ def show_stock_details(symbol):
     
     with col3:
         st.subheader("Analyst Ratings")
-        st.metric("Target Price", "$195.00")
-        st.markdown("**Consensus:** Hold")
-        st.markdown("🟢 Buy: 12")
-        st.markdown("🟡 Hold: 18")
-        st.markdown("🔴 Sell: 3")
+        from data.analyst_ratings import get_ratings_store
+        ratings = get_ratings_store()
+        consensus = ratings.consensus(symbol)
+        if consensus:
+            if ratings.sample:
+                st.caption("Sample ratings")
+            if consensus['median_target'] is not None:
+                st.metric("Target Price", f"${consensus['median_target']:.2f}",
+                          f"${consensus['low_target']:.2f} - ${consensus['high_target']:.2f}", delta_color="off")
+            st.markdown(f"**Consensus:** {consensus['consensus']}")
+            st.markdown(f"🟢 Buy: {consensus['buy']:.0f}")
+            st.markdown(f"🟡 Hold: {consensus['hold']:.0f}")
+            st.markdown(f"🔴 Sell: {consensus['sell']:.0f}")
+            st.caption(f"Revision momentum {consensus['momentum']:+.2f} • "
+                       f"{consensus['upgrades']:.0f} upgrades, {consensus['downgrades']:.0f} downgrades, "
+                       f"{consensus['target_raises']:.0f} target raises, {consensus['target_cuts']:.0f} cuts in 90 days")
+        else:
+            st.caption("No analyst coverage")
     
-    # AI Analysis (placeholder)
     st.subheader("🤖 AI Analysis")
-    st.info("""
-    Based on current market conditions and technical analysis, this stock shows:
-    - Strong momentum in the past 30 days
-    - Support levels holding well at $170-175 range
-    - Positive sentiment from recent earnings report
-    - Consider entry points near support levels for long-term positions
-    """)
+    analysis = sentiment_analysis(symbol)
+    if analysis:
+        st.info(analysis)
+    else:
+        st.info("""
+        Based on current market conditions and technical analysis, this stock shows:
+        - Strong momentum in the past 30 days
+        - Support levels holding well at $170-175 range
+        - Positive sentiment from recent earnings report
+        - Consider entry points near support levels for long-term positions
+        """)
     
     if st.button("Back to Discovery", use_container_width=True):
         del st.session_state.selected_stock
         st.experimental_rerun()
 
+def sentiment_analysis(symbol):
+    """Summary of a stock's news sentiment next to its sector's, or None before any news mentioned it"""
+    from analysis.sentiment import get_sentiment_tracker
+    from data.universe import load_universe
+    
+    tracker = get_sentiment_tracker()
+    sentiment = tracker.get(symbol)
+    if sentiment is None:
+        return None
+    updated = datetime.fromtimestamp(sentiment['updated']).strftime('%Y-%m-%d')
+    lines = [f"News sentiment is **{sentiment['label'].lower()}** ({sentiment['score']:+.2f}), from "
+             f"{sentiment['documents']} news and disclosure documents, the latest on {updated}. "
+             f"Recent documents weigh more."]
+    sectors = load_universe().set_index('Symbol')['Sector']
+    if symbol in sectors.index:
+        sector = tracker.get(sectors[symbol], kind="sector")
+        if sector is not None:
+            difference = sentiment['score'] - sector['score']
+            relation = "in line with" if abs(difference) < 0.05 else "above" if difference > 0 else "below"
+            lines.append(f"That is {relation} the {sectors[symbol]} sector average of {sector['score']:+.2f}.")
+    return "\n\n".join(lines)
+
+def create_candlestick_chart(symbol, range_label):
+    """Build the candlestick figure for a stock over a chart range"""
+    prices = get_chart_candles(symbol, range_label, session_id=current_session_id())
+    if prices is None:
+        dates = pd.date_range(start='2023-11-01', end='2024-05-03', freq='B')
+        prices = get_chart_candles(symbol, range_label, session_id=current_session_id(),
+                                   frame=generate_sample_price_data(symbol, dates))
+    
+    fig = go.Figure(data=[go.Candlestick(x=prices.index,
+                open=prices['Open'],
+                high=prices['High'],
+                low=prices['Low'],
+                close=prices['Close'])])
+    
+    fig.update_layout(
+        title=f'{symbol} Price Chart',
+        yaxis_title='Price (USD)',
+        xaxis_title='Date',
+        xaxis_rangeslider_visible=False,
+        height=500
+    )
+    return fig
+
 def generate_sample_price_data(symbol, dates):
     """Generate sample price data for visualization"""
     import numpy as np
@@ -203,48 +320,30 @@ def generate_sample_price_data(symbol, dates):
     
     return ohlc_data
 
-def generate_profile_matched_stocks(risk_profile):
-    """Generate stock recommendations based on risk profile"""
-    stock_recommendations = {
-        "Very Conservative": [
-            {"name": "Johnson & Johnson", "symbol": "JNJ", "reason": "Healthcare leader with stable dividends"},
-            {"name": "Procter & Gamble", "symbol": "PG", "reason": "Consumer staples with consistent growth"},
-            {"name": "Coca-Cola", "symbol": "KO", "reason": "Strong moat and reliable income"}
-        ],
-        "Conservative": [
-            {"name": "Microsoft", "symbol": "MSFT", "reason": "Tech leader with strong fundamentals"},
-            {"name": "Apple", "symbol": "AAPL", "reason": "Stable cash flows and innovation"},
-            {"name": "Visa", "symbol": "V", "reason": "Growing payment network"}
-        ],
-        "Moderate": [
-            {"name": "Amazon", "symbol": "AMZN", "reason": "Growth potential in cloud and retail"},
-            {"name": "Alphabet", "symbol": "GOOGL", "reason": "Dominant in search and emerging AI"},
-            {"name": "Meta", "symbol": "META", "reason": "Social media leader with metaverse potential"}
-        ],
-        "Aggressive": [
-            {"name": "NVIDIA", "symbol": "NVDA", "reason": "AI chip leader with growth potential"},
-            {"name": "Tesla", "symbol": "TSLA", "reason": "EV market leader and energy innovator"},
-            {"name": "Palantir", "symbol": "PLTR", "reason": "AI and data analytics growth story"}
-        ],
-        "Very Aggressive": [
-            {"name": "Advanced Micro Devices", "symbol": "AMD", "reason": "AI and processor market challenger"},
-            {"name": "MicroStrategy", "symbol": "MSTR", "reason": "Bitcoin treasury strategy"},
-            {"name": "Roblox", "symbol": "RBLX", "reason": "Metaverse and gaming platform"}
-        ]
-    }
-    
-    return stock_recommendations.get(risk_profile, stock_recommendations["Moderate"])
+@st.cache_resource
+def get_profile_matcher():
+    """Build the profile matcher once and share it across sessions"""
+    return ProfileMatcher()
 
-def create_sector_heatmap():
-    """Create a sector performance heatmap"""
-    sectors = ['Technology', 'Healthcare', 'Finance', 'Consumer Goods', 'Energy', 'Manufacturing', 'Real Estate', 'Utilities']
-    performance = [2.1, 1.5, 0.8, -0.3, -1.2, 0.5, 1.8, 0.3]
-    
+def generate_profile_matched_stocks(user_profile, k=5):
+    """Generate stock recommendations based on the full user profile"""
+    return get_profile_matcher().top_k(user_profile, k=k)
+
+def create_sector_heatmap(snapshot):
+    """Create a sector performance heatmap from the market overview snapshot"""
+    fig = cached("market_overview", "sector_heatmap",
+                 lambda: build_sector_heatmap(snapshot["sectors"]),
+                 version=(snapshot["as_of"], snapshot["version"]))
+    st.plotly_chart(fig, use_container_width=True)
+
+def build_sector_heatmap(sectors):
+    """Build the sector heatmap figure from per-sector returns"""
     fig = go.Figure(data=go.Heatmap(
-        z=[performance],
-        x=sectors,
+        z=[sectors['Return (%)'].round(2).tolist()],
+        x=sectors['Sector'].tolist(),
         y=['Performance (%)'],
         colorscale='RdYlGn',
+        zmid=0,
         showscale=True
     ))
     
@@ -252,35 +351,43 @@ def create_sector_heatmap():
         title='Sector Performance Today',
         height=300
     )
-    
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
-def show_market_news():
-    """Display market news feed"""
-    news_items = [
-        {
-            "title": "Fed Maintains Interest Rates at 5.25%",
-            "source": "Reuters",
-            "time": "2 hours ago",
-            "summary": "Federal Reserve keeps rates unchanged, signals data-dependent approach to future decisions."
-        },
-        {
-            "title": "Tech Giants Report Better-than-Expected Earnings",
-            "source": "CNBC",
-            "time": "4 hours ago",
-            "summary": "Apple, Microsoft, and Google exceed earnings forecasts, driving tech sector rally."
-        },
-        {
-            "title": "Global Markets React to Economic Data",
-            "source": "Bloomberg",
-            "time": "6 hours ago",
-            "summary": "Asian markets climb on positive economic indicators from China and Japan."
-        }
-    ]
+def show_market_news(limit=10):
+    """Display the market news feed, optionally only news about the user's holdings"""
+    from data.entity_linker import EntityPostings
+    from data.loaders.economic_loader import MACRO_SERIES, format_release, get_macro_store
+    from data.user_store import get_user_store
+    
+    # Latest policy rate, inflation and FX releases from the macro store
+    macro = get_macro_store()
+    releases = [release for release in (macro.latest(key) for key in MACRO_SERIES) if release is not None]
+    if releases:
+        label = "Sample macro data: " if macro.sample else ""
+        st.caption(label + " • ".join(format_release(release) for release in releases))
+    
+    user_id = st.session_state.get("user_id", "guest")
+    holdings = [holding["symbol"] for holding in get_user_store().load_user_state(user_id)["holdings"]]
+    options = ["All news"] + (["My holdings"] + holdings if holdings else [])
+    choice = st.selectbox("Show news about", options, key="news_filter")
+    
+    # Linked documents are looked up through the ticker postings
+    symbols = None if choice == "All news" else holdings if choice == "My holdings" else [choice]
+    news_items = [{"title": item["title"], "source": item["source"] or item["kind"],
+                   "time": (item["published"] or "")[:16].replace("T", " "), "summary": item["summary"],
+                   "symbols": item["symbols"]}
+                  for item in EntityPostings().documents(symbols, limit=limit)]
+    
+    if not news_items:
+        if symbols is not None:
+            st.info(f"No news linked to {', '.join(symbols)} yet.")
+            return
+        news_items = SAMPLE_NEWS
     
     for news in news_items:
         with st.container():
             st.markdown(f"**{news['title']}**")
-            st.caption(f"{news['source']} • {news['time']}")
+            tags = f" • {', '.join(news['symbols'][:5])}" if news.get("symbols") else ""
+            st.caption(f"{news['source']} • {news['time']}{tags}")
             st.markdown(news['summary'])
-            st.divider()
\ No newline at end of file
+            st.divider()
@@ -0,0 +1,83 @@
+# ui/startup_profile.py - Import-time report for the app's cold start
+#
+# Usage: python -m ui.startup_profile [--page Home] [--top 20]
+#
+# Imports ui.app and the selected pages in a fresh interpreter running with
+# "-X importtime", then reports the time spent importing each module.
+import os
+import sys
+import argparse
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_importtime(output):
+    """Parse "-X importtime" output into (module, self_us, cumulative_us, depth) rows"""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+def profile_startup(pages=("Home",)):
+    """Measure the import cost of ui.app and then of each page, in a cold interpreter.
+
+    Returns:
+        dict: Import rows per stage ("ui.app" and each page name)
+    """
+    # A marker line separates the stages in stderr
+    script = ["import sys", "import ui.app as app", "print('@@ui.app', file=sys.stderr, flush=True)"]
+    for page in pages:
+        # importlib.import_module bypasses the importtime log, __import__ does not
+        script.append(f"__import__(app.PAGES[{page!r}][0])")
+        script.append(f"app.load_page({page!r})")
+        script.append(f"print('@@' + {page!r}, file=sys.stderr, flush=True)")
+
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "\n".join(script)],
+                            cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Profiled startup failed:\n{result.stderr[-2000:]}")
+
+    stages = {}
+    lines = []
+    for line in result.stderr.splitlines():
+        if line.startswith("@@"):
+            stages[line[2:]] = parse_importtime("\n".join(lines))
+            lines = []
+        else:
+            lines.append(line)
+    return stages
+
+def print_report(stages, top=20):
+    for stage, rows in stages.items():
+        # Top-level rows cover every module imported during the stage exactly once
+        total_ms = sum(cumulative for _, _, cumulative, depth in rows if depth == 0) / 1000
+        print(f"\n== {stage}: {total_ms:.0f} ms, {len(rows)} modules")
+
+        by_package = {}
+        for name, self_us, _, _ in rows:
+            package = name.split(".")[0]
+            by_package[package] = by_package.get(package, 0) + self_us
+        print("  By package (self time):")
+        for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:10]:
+            print(f"    {self_us / 1000:8.1f} ms  {package}")
+
+        print(f"  Slowest {top} modules (self / cumulative):")
+        for name, self_us, cumulative_us, _ in sorted(rows, key=lambda row: -row[1])[:top]:
+            print(f"    {self_us / 1000:8.1f} ms  {cumulative_us / 1000:8.1f} ms  {name}")
+
+if __name__ == "__main__":
+    sys.path.append(PROJECT_ROOT)
+    from ui.app import PAGES
+
+    parser = argparse.ArgumentParser(description="Report import time per module at app startup")
+    parser.add_argument("--page", action="append", choices=list(PAGES),
+                        help="Page to load after startup (repeatable, defaults to Home)")
+    parser.add_argument("--top", type=int, default=20, help="Number of modules to list per stage")
+    args = parser.parse_args()
+
+    print_report(profile_startup(args.page or ["Home"]), top=args.top)